@@ -1,9 +1,13 @@
 import threading
 import time
 import os
+import hashlib
 from datetime import datetime, timedelta
 from app.data.fetcher import DataFetcher
 from app.data.cache import DataCache
+from app.context_sections import DATE_HEADER, SECTION_ORDER, SECTIONS_HEADER, ContextData, ContextSections, fetch_section_inputs
+from app.data.snapshot_store import SnapshotStore
+from app.shared_context import SharedContextReader, SharedContextWriter, default_shared_context_path
 from app.utils.logger import setup_logger
 from dotenv import load_dotenv
 
@@ -14,9 +18,45 @@ class SystemContextManager:
     """
     Менеджер системного контекста для LLM.
     Обновляет контекст каждые CACHE_TTL секунд автоматически.
+
+    CONTEXT_MODE:
+    - standalone (по умолчанию): процесс сам загружает данные и обновляет контекст;
+    - publisher: то же, плюс публикация каждой версии в общий файл (SHARED_CONTEXT_PATH);
+    - subscriber: процесс не загружает данные, а отображает опубликованный файл
+      только для чтения и подхватывает новые версии (воркеры uvicorn, реплики бота).
     """
 
-    def __init__(self):
+    def __init__(self, mode: str = None):
+        self.mode = (mode or os.getenv("CONTEXT_MODE") or "standalone").strip().lower()
+        shared_path = os.getenv("SHARED_CONTEXT_PATH") or default_shared_context_path()
+
+        self.system_context = ""
+        self.context_version = None
+        self.context_data = None  # ContextData of the published version
+        self.last_update = None
+        self.source = None  # snapshot / refresh / shared
+        self.refreshing = False
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._last_refresh_at = 0.0
+        self.sections = ContextSections()
+        self.update_interval = int(os.getenv("CACHE_TTL", 3600))  # секунды
+
+        if self.mode == "subscriber":
+            # Ни загрузчика данных, ни обновления: только опубликованный контекст
+            self.cache = None
+            self.fetcher = None
+            self._writer = None
+            self._snapshot = None
+            self.store = None
+            self._reader = SharedContextReader(shared_path)
+            self._read_shared_context()
+            if self.context_version is None:
+                logger.warning(f"No shared context published yet at {shared_path}, waiting for the publisher")
+            self._start_subscriber_thread(float(os.getenv("SHARED_CONTEXT_POLL_INTERVAL", 2)))
+            return
+
         self.cache = DataCache(ttl=int(os.getenv("CACHE_TTL", 3600)))
         self.fetcher = DataFetcher(
             news_api_key=os.getenv("NEWS_API_KEY", ""),
@@ -25,68 +65,263 @@ class SystemContextManager:
             telegram_api_id=int(os.getenv("TELEGRAM_API_ID", 0)) if os.getenv("TELEGRAM_API_ID") else None,
             telegram_api_hash=os.getenv("TELEGRAM_API_HASH", "")
         )
+        self._reader = None
+        self._writer = SharedContextWriter(shared_path) if self.mode == "publisher" else None
 
-        self.system_context = ""
-        self.last_update = None
-        self.update_interval = int(os.getenv("CACHE_TTL", 3600))  # секунды
+        # История исходных данных по моментам времени: из нее собирается любой прошлый контекст
+        store_path = os.getenv("SNAPSHOT_STORE_PATH", "app/data/cache/snapshots")
+        self.store = SnapshotStore(store_path) if store_path else None
+        self._seed_sections()
 
-        # Обновляем контекст при инициализации
-        self._update_context()
+        # Последний удачный контекст на диске: после перезапуска отдается сразу,
+        # пока в фоне идет обновление
+        snapshot_path = os.getenv("CONTEXT_SNAPSHOT_PATH", "app/data/cache/context_snapshot.bin")
+        self._snapshot = SharedContextWriter(snapshot_path) if snapshot_path else None
+        if snapshot_path:
+            self._load_snapshot(snapshot_path)
 
-        # Запускаем автоматическое обновление в фоне
+        # Обновляем контекст в фоне при инициализации и затем каждые CACHE_TTL секунд
         self._start_auto_update_thread()
 
+    def _seed_sections(self):
+        """
+        Восстановить секции из последних сохраненных входных данных, чтобы
+        источник, недоступный после перезапуска, сохранял прежнюю отрисовку,
+        а не заменялся заглушкой поверх удачного снимка.
+        """
+        if self.store is None:
+            return
+        now = datetime.now()
+        inputs = {}
+        for name in SECTION_ORDER:
+            try:
+                found = self.store.as_of(name, now)
+            except Exception as e:
+                logger.error(f"Failed to restore section '{name}' from the snapshot store: {e}")
+                continue
+            if found is not None:
+                inputs[name] = found[2]
+        if inputs:
+            self.sections.update(inputs)
+            logger.info(f"Restored context sections from the snapshot store: {', '.join(inputs)}")
+
+    def _load_snapshot(self, path: str):
+        """Загрузить сохраненный контекст предыдущего запуска."""
+        reader = SharedContextReader(path)
+        try:
+            if not reader.refresh():
+                return
+        except Exception as e:
+            logger.error(f"Failed to load context snapshot: {e}")
+            return
+        context, version, published_at = reader.get()
+        self._publish(context, version=version, published_at=published_at, source="snapshot",
+                      data=self._reader_data(reader))
+        logger.info(f"Loaded context snapshot version {version} from {published_at}")
+
     def _start_auto_update_thread(self):
         """Запускаем поток для автоматического обновления контекста."""
         def update_loop():
             while True:
-                time.sleep(self.update_interval)
                 try:
                     logger.info("Auto-updating system context...")
-                    self._update_context()
+                    self._refresh()
                     logger.info("System context updated successfully")
                 except Exception as e:
                     logger.error(f"Failed to auto-update context: {e}")
+                time.sleep(self.update_interval)
 
         thread = threading.Thread(target=update_loop, daemon=True)
         thread.start()
         logger.info(f"Started auto-update thread (interval: {self.update_interval}s)")
 
-    def _update_context(self):
-        """Обновляем системный контекст свежими данными."""
+    def _start_subscriber_thread(self, poll_interval: float):
+        """Следим за опубликованным файлом и подхватываем новые версии."""
+        def poll_loop():
+            while True:
+                time.sleep(poll_interval)
+                try:
+                    self._read_shared_context()
+                except Exception as e:
+                    logger.error(f"Failed to read shared context: {e}")
+
+        thread = threading.Thread(target=poll_loop, daemon=True)
+        thread.start()
+        logger.info(f"Subscribed to shared context {self._reader.path} (poll: {poll_interval}s)")
+
+    def _read_shared_context(self):
+        if self._reader.refresh():
+            context, version, published_at = self._reader.get()
+            self._publish(context, version=version, published_at=published_at, data=self._reader_data(self._reader))
+
+    @staticmethod
+    def _reader_data(reader: SharedContextReader):
+        """Structured data published with the file; None for files written without it."""
+        data = reader.get_data()
+        if data is None:
+            return None
         try:
-            # Получаем все данные
-            news_articles = self.fetcher.get_combined_data()
+            return ContextData.from_dict(data)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"Invalid structured data in {reader.path}: {e}")
+            return None
 
-            # Форматируем системный контекст
-            context_parts = []
+    def _refresh(self):
+        """Одно обновление за раз: параллельные вызовы ждут уже идущее обновление."""
+        started = time.monotonic()
+        with self._refresh_lock:
+            if self.last_update is not None and self._last_refresh_at > started:
+                return  # someone else refreshed while we were waiting
+            self.refreshing = True
+            try:
+                self._update_context()
+            finally:
+                self.refreshing = False
+                self._last_refresh_at = time.monotonic()
 
-            # Текущая дата и время
-            current_datetime_info = f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} (МСК, UTC+3)"
-            context_parts.append(f"=== ТЕКУЩАЯ ДАТА И ВРЕМЯ ===\n{current_datetime_info}")
+    def _update_context(self):
+        """Обновляем системный контекст свежими данными."""
+        if self._reader is not None:
+            self._read_shared_context()
+            return
 
-            # Новости и статьи (уже содержит экономические данные)
-            context_parts.append(f"=== НОВОСТИ И ЭКОНОМИЧЕСКИЕ ДАННЫЕ ===\n{news_articles}")
+        try:
+            inputs = fetch_section_inputs(self.fetcher)
+            changed = self.sections.update(inputs)
+            now = datetime.now()
+            self._store_inputs(inputs, changed, now)
 
-            # Обновляем контекст
-            self.system_context = "\n\n".join(context_parts)
-            self.last_update = datetime.now()
+            # Дата входит в версию, чтобы заголовок с текущей датой обновлялся
+            # хотя бы раз в сутки; времени нет ни в версии, ни в заголовке
+            version = self.sections.version(salt=now.strftime("%Y-%m-%d"))
+            if version == self.context_version:
+                with self._lock:
+                    self.last_update = now
+                    self.source = "refresh"
+                logger.info("Context sections unchanged, keeping version "
+                            f"{version} (fetched: {', '.join(sorted(inputs)) or 'none'})")
+                return
+            if changed:
+                logger.info(f"Context sections changed: {', '.join(changed)}")
 
-            logger.info(f"System context updated at {self.last_update}")
+            context, data = self._render(self.sections, now)
+            self._publish(context, version=version, published_at=now, data=data)
 
         except Exception as e:
             logger.error(f"Error updating system context: {e}")
             # Если обновление не удалось, оставляем старый контекст
 
+    @staticmethod
+    def _render(sections: ContextSections, now: datetime) -> tuple:
+        """(контекст, ContextData) с границами секций в тексте."""
+        header = f"{DATE_HEADER}\n{now.strftime('%Y-%m-%d')} (МСК, UTC+3)"
+        prefix = f"{header}\n\n{SECTIONS_HEADER}\n"
+        body, spans = sections.render_with_spans(now.date())
+        spans = {"header": (0, len(header)),
+                 **{name: (len(prefix) + start, len(prefix) + end) for name, (start, end) in spans.items()}}
+        return prefix + body, sections.data(spans)
+
+    def _store_inputs(self, inputs: dict, changed: list, fetched_at: datetime):
+        """Сохранить изменившиеся исходные данные в хранилище снимков."""
+        if self.store is None:
+            return
+        for name in changed:
+            try:
+                self.store.put(name, inputs.get(name) or "", fetched_at=fetched_at)
+            except Exception as e:
+                logger.error(f"Failed to store snapshot of '{name}': {e}")
+
+    def context_as_of(self, when: datetime):
+        """Собрать контекст (контекст, версия, ContextData) из данных, действовавших в момент `when`; None без истории."""
+        if self.store is None:
+            return None
+        return context_from_store(self.store, when)
+
+    def _publish(self, context: str, version: str = None, published_at: datetime = None, source: str = None,
+                 data: ContextData = None):
+        """Опубликовать новый контекст и уведомить подписчиков, если изменилась версия."""
+        version = version or hashlib.sha256(context.encode("utf-8")).hexdigest()[:16]
+        source = source or ("shared" if self._reader is not None else "refresh")
+        # Files written before the structured data was published: parsed once here, not by every consumer
+        data = data if data is not None else ContextData.from_context(context)
+
+        with self._lock:
+            changed = version != self.context_version
+            self.system_context = context
+            self.context_version = version
+            self.context_data = data
+            self.last_update = published_at or datetime.now()
+            self.source = source
+
+        logger.info(f"System context updated at {self.last_update} (version {version})")
+
+        writers = [self._writer] + ([self._snapshot] if source == "refresh" else [])
+        for writer in writers:
+            if writer is None:
+                continue
+            try:
+                writer.write(context, version, self.last_update.timestamp(), data.to_dict())
+            except Exception as e:
+                logger.error(f"Failed to write context to {writer.path}: {e}")
+
+        if not changed:
+            return
+
+        for listener in list(self._listeners):
+            try:
+                listener(version)
+            except Exception as e:
+                logger.error(f"Context listener failed: {e}")
+
+    def add_listener(self, callback):
+        """Подписаться на публикацию новой версии контекста (callback(version))."""
+        self._listeners.append(callback)
+
+    def _ensure_context(self, force_update: bool = False):
+        """Без контекста ждем обновления; устаревший контекст отдаем, обновляя его в фоне."""
+        if force_update or self.context_version is None:
+            self._refresh()
+        elif self._needs_update() and not self.refreshing:
+            threading.Thread(target=self._refresh, daemon=True).start()
+
     def get_context(self, force_update: bool = False) -> str:
         """Получить актуальный системный контекст."""
-        if force_update or self._needs_update():
-            self._update_context()
-
+        self._ensure_context(force_update)
         return self.system_context
 
+    def get_versioned_context(self, force_update: bool = False) -> tuple:
+        """Получить пару (контекст, версия) из одного и того же обновления."""
+        self._ensure_context(force_update)
+        with self._lock:
+            return self.system_context, self.context_version
+
+    def get_versioned_data(self, force_update: bool = False) -> tuple:
+        """(контекст, версия, ContextData) из одного и того же обновления."""
+        self._ensure_context(force_update)
+        with self._lock:
+            return self.system_context, self.context_version, self.context_data
+
+    def readiness(self) -> dict:
+        """Готовность и свежесть контекста для /ready."""
+        with self._lock:
+            age = (datetime.now() - self.last_update).total_seconds() if self.last_update else None
+            return {
+                "ready": self.context_version is not None,
+                "mode": self.mode,
+                "source": self.source,
+                "context_version": self.context_version,
+                "last_update": self.last_update.isoformat(timespec="seconds") if self.last_update else None,
+                "age_s": round(age, 1) if age is not None else None,
+                "fresh": age is not None and age < self.update_interval,
+                "refreshing": self.refreshing,
+                "sections": dict(self.sections.hashes),
+            }
+
     def _needs_update(self) -> bool:
         """Проверить, нужно ли обновлять контекст."""
+        if self._reader is not None:
+            # Подписчик получает новые версии из потока опроса
+            return self.context_version is None
         if self.last_update is None:
             return True
 
@@ -96,7 +331,21 @@ class SystemContextManager:
     def force_update(self):
         """Принудительно обновить контекст."""
         logger.info("Forced context update requested")
-        self._update_context()
+        self._refresh()
+
+def context_from_store(store: SnapshotStore, when: datetime):
+    """(контекст, версия, ContextData) из исходных данных хранилища на момент `when`; None без истории."""
+    inputs = {}
+    for name in SECTION_ORDER:
+        found = store.as_of(name, when)
+        if found is not None:
+            inputs[name] = found[2]
+    if not inputs:
+        return None
+    sections = ContextSections()
+    sections.update(inputs)
+    context, data = SystemContextManager._render(sections, when)
+    return context, sections.version(salt=when.strftime("%Y-%m-%d")), data
 
 # Глобальный экземпляр
 context_manager = None
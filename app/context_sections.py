@@ -0,0 +1,235 @@
+import hashlib
+import re
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from app.data.key_rates import KeyRateSeries
+from app.data.meetings import CALENDAR_MARKER, MeetingCalendar
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Порядок секций в контексте
+SECTION_ORDER = ("news", "key_rates", "inflation", "gdp", "meetings", "articles")
+
+# Заголовок блока секций в системном контексте
+SECTIONS_HEADER = "=== НОВОСТИ И ЭКОНОМИЧЕСКИЕ ДАННЫЕ ==="
+# Заголовок с датой: только дата, без времени — версия меняется раз в сутки,
+# поэтому время в заголовке устаревало бы до следующей новой версии
+DATE_HEADER = "=== ТЕКУЩАЯ ДАТА ==="
+
+# The first template line marks the section start in contexts published without structured data
+_TEMPLATES = {
+    "news": "ПОСЛЕДНИЕ НОВОСТИ:\n{}",
+    "key_rates": "ИСТОРИЧЕСКИЕ ЭКОНОМИЧЕСКИЕ ДАННЫЕ:\n\nИсторические данные ЦБ РФ:\n{}",
+    "inflation": "Инфляция (история):\n{}",
+    "gdp": "ВВП (если доступно):\n{}",
+    "meetings": CALENDAR_MARKER + "\n{}",
+    "articles": "НАУЧНЫЕ СТАТЬИ:\n{}",
+}
+
+_EMPTY = {
+    "news": "Нет новостных данных",
+    "key_rates": "Нет исторических данных",
+    "inflation": "Нет исторических данных",
+    "gdp": "Нет исторических данных",
+    "meetings": "Календарь заседаний недоступен",
+    "articles": "Нет статей (загрузите в папку articles/)",
+}
+
+# Fetch stamps ("Обновлено: 2024-01-01 12:00:00") change on every download
+# of the same data and must not produce a new version
+_TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
+
+
+# Годовые значения вида "- 2023: 7.4%" / "- 2023: +3.6%"
+_YEAR_VALUE = re.compile(r"^- (\d{4}): ([+-]?\d+(?:[.,]\d+)?)%", re.MULTILINE)
+GDP_GROWTH_MARKER = "Темпы роста ВВП Г/Г (%):"
+
+
+def parse_yearly_values(text: str) -> List[Tuple[int, float]]:
+    """Sorted (year, value) pairs from the "- YYYY: X%" lines of a text."""
+    return sorted({int(year): float(value.replace(",", ".")) for year, value in _YEAR_VALUE.findall(text)}.items())
+
+
+def parse_section_input(name: str, raw: Optional[str]):
+    """Structured data of a section input (rate series, calendar, yearly values); None for text-only sections."""
+    raw = raw or ""
+    if name == "key_rates":
+        return KeyRateSeries.from_history_text(raw)
+    if name == "inflation":
+        return parse_yearly_values(raw)
+    if name == "gdp":
+        start = raw.find(GDP_GROWTH_MARKER)
+        return parse_yearly_values(raw[start:]) if start >= 0 else []
+    if name == "meetings":
+        return MeetingCalendar.from_input(raw)
+    return None
+
+
+class ContextData:
+    """
+    Структурированные данные версии контекста: ряд ключевой ставки, полный
+    календарь заседаний, годовые ряды инфляции и роста ВВП и границы секций в
+    тексте. Разбираются один раз из входных данных секций и передаются вместе
+    с версией (в общем файле и снимке), поэтому потребителям не нужно разбирать
+    отрисованный текст — он только вывод.
+    """
+
+    def __init__(self, key_rates: Optional[KeyRateSeries] = None, calendar: Optional[MeetingCalendar] = None,
+                 inflation=(), gdp_growth=(), spans: Optional[Dict[str, Tuple[int, int]]] = None):
+        self.key_rates = key_rates or KeyRateSeries()
+        self.calendar = calendar or MeetingCalendar()
+        self.inflation: List[Tuple[int, float]] = sorted(inflation)
+        self.gdp_growth: List[Tuple[int, float]] = sorted(gdp_growth)
+        # "header" and section name -> (start, end) in the context text
+        self.spans: Dict[str, Tuple[int, int]] = spans or {}
+
+    @classmethod
+    def from_parsed(cls, parsed: Dict[str, object], spans: Optional[Dict[str, Tuple[int, int]]] = None) -> "ContextData":
+        return cls(parsed.get("key_rates"), parsed.get("meetings"), parsed.get("inflation") or (),
+                   parsed.get("gdp") or (), spans)
+
+    @classmethod
+    def from_context(cls, system_context: str) -> "ContextData":
+        """Fallback for a context published without structured data: locate the sections by their markers."""
+        spans = {}
+        header_end = system_context.find(SECTIONS_HEADER)
+        if header_end > 0:
+            spans["header"] = (0, len(system_context[:header_end].rstrip()))
+        starts = []
+        cursor = max(header_end, 0)
+        for name in SECTION_ORDER:
+            start = _find_line(system_context, _TEMPLATES[name].split("\n", 1)[0], cursor)
+            if start >= 0:
+                starts.append((name, start))
+                cursor = start + 1
+        for i, (name, start) in enumerate(starts):
+            end = starts[i + 1][1] if i + 1 < len(starts) else len(system_context)
+            spans[name] = (start, start + len(system_context[start:end].rstrip()))
+        parsed = {name: parse_section_input(name, system_context[start:end]) for name, (start, end) in spans.items()
+                  if name != "header"}
+        return cls.from_parsed(parsed, spans)
+
+    def section(self, system_context: str, name: str) -> str:
+        """Text of one section (or the header) of the context this data belongs to; "" if absent."""
+        span = self.spans.get(name)
+        return system_context[span[0]:span[1]] if span else ""
+
+    def to_dict(self) -> Dict:
+        return {
+            "key_rates": [[day.isoformat(), rate] for day, rate in zip(self.key_rates.dates, self.key_rates.rates)],
+            "meetings": [day.isoformat() for day in self.calendar.dates],
+            "meetings_source": self.calendar.source,
+            "inflation": [list(pair) for pair in self.inflation],
+            "gdp_growth": [list(pair) for pair in self.gdp_growth],
+            "spans": {name: list(span) for name, span in self.spans.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ContextData":
+        return cls(
+            KeyRateSeries((date.fromisoformat(day), float(rate)) for day, rate in data.get("key_rates", [])),
+            MeetingCalendar((date.fromisoformat(day) for day in data.get("meetings", [])),
+                            source=data.get("meetings_source", "")),
+            [(int(year), float(value)) for year, value in data.get("inflation", [])],
+            [(int(year), float(value)) for year, value in data.get("gdp_growth", [])],
+            {name: (int(start), int(end)) for name, (start, end) in data.get("spans", {}).items()},
+        )
+
+
+def _find_line(text: str, marker: str, start: int = 0) -> int:
+    """Position of a line starting with marker, at or after start; -1 if none."""
+    if text.startswith(marker, start):
+        return start
+    pos = text.find("\n" + marker, start)
+    return pos + 1 if pos >= 0 else -1
+
+
+def section_hash(raw: str) -> str:
+    """Content hash of a section input, ignoring fetch timestamps."""
+    return hashlib.sha256(_TIMESTAMP.sub("", raw).strip().encode("utf-8")).hexdigest()[:16]
+
+
+def render_section(name: str, raw: Optional[str]) -> str:
+    body = raw.strip() if raw and raw.strip() else _EMPTY[name]
+    return _TEMPLATES[name].format(body)
+
+
+class ContextSections:
+    """
+    Системный контекст из независимых секций (новости, ключевая ставка,
+    инфляция, ВВП, календарь заседаний, статьи), у каждой свой хеш содержимого.
+
+    update() перерисовывает только секции с изменившимися входными данными;
+    версия контекста считается по хешам секций, поэтому без изменений в
+    источниках она остается прежней и кеши, привязанные к версии, не сбрасываются.
+    """
+
+    def __init__(self):
+        self.hashes: Dict[str, str] = {}
+        self._rendered: Dict[str, str] = {}
+        self._parsed: Dict[str, object] = {}
+
+    def update(self, inputs: Dict[str, Optional[str]]) -> List[str]:
+        """Apply fresh section inputs; returns the names of sections that changed."""
+        changed = []
+        for name in SECTION_ORDER:
+            if name not in inputs:
+                continue  # not fetched this round: keep the previous rendering
+            raw = inputs[name] or ""
+            digest = section_hash(raw)
+            if self.hashes.get(name) == digest:
+                continue
+            self.hashes[name] = digest
+            self._rendered[name] = render_section(name, raw)
+            self._parsed[name] = parse_section_input(name, raw)
+            changed.append(name)
+        return changed
+
+    def version(self, salt: str = "") -> str:
+        """Context version from the section hashes (plus an optional salt such as the date)."""
+        joined = salt + "|" + "|".join(f"{name}:{self.hashes.get(name, '')}" for name in SECTION_ORDER)
+        return hashlib.sha256(joined.encode("utf-8")).hexdigest()[:16]
+
+    def _render_one(self, name: str, today: date) -> str:
+        if name == "meetings" and self._parsed.get("meetings") is not None:
+            # The calendar input holds every date; next/upcoming/past are rendered for the day
+            return render_section(name, self._parsed["meetings"].render(today))
+        return self._rendered.get(name) or render_section(name, None)
+
+    def render_with_spans(self, today: Optional[date] = None) -> Tuple[str, Dict[str, Tuple[int, int]]]:
+        """Body of the '=== НОВОСТИ И ЭКОНОМИЧЕСКИЕ ДАННЫЕ ===' block and (start, end) of every section in it."""
+        today = today or datetime.now().date()
+        parts, spans, offset = [], {}, 0
+        for name in SECTION_ORDER:
+            text = self._render_one(name, today)
+            spans[name] = (offset, offset + len(text))
+            parts.append(text)
+            offset += len(text) + 2
+        return "\n\n".join(parts), spans
+
+    def render(self, today: Optional[date] = None) -> str:
+        return self.render_with_spans(today)[0]
+
+    def data(self, spans: Optional[Dict[str, Tuple[int, int]]] = None) -> ContextData:
+        """Structured data of the current section inputs."""
+        return ContextData.from_parsed(self._parsed, spans)
+
+
+def fetch_section_inputs(fetcher) -> Dict[str, Optional[str]]:
+    """Raw inputs of every section; a failed source is left out and keeps its last rendering."""
+    sources: Dict[str, Callable[[], Optional[str]]] = {
+        "news": fetcher.fetch_news_data,
+        "key_rates": fetcher._fetch_cbr_key_rates_history,
+        "inflation": fetcher._fetch_inflation_history,
+        "gdp": fetcher._fetch_gdp_history,
+        "meetings": lambda: fetcher.fetch_meeting_calendar().dump(),
+        "articles": fetcher.fetch_scientific_articles,
+    }
+    inputs = {}
+    for name, fetch in sources.items():
+        try:
+            inputs[name] = fetch()
+        except Exception as e:
+            logger.error(f"Failed to fetch context section '{name}': {e}")
+    return inputs
@@ -1,26 +1,35 @@
 import requests
-from bs4 import BeautifulSoup
-import pandas as pd
 import json
 import os
 import re
+import threading
 from datetime import datetime, timedelta
 from typing import Dict, Optional, List
 from app.utils.logger import setup_logger
 from .cache import DataCache
+from .meetings import MeetingCalendar, load_calendar_file, parse_calendar_page
+from .post_log import PostLog, normalize_post
+from .news_digest import create_news_digest_from_env
 
 # Для парсинга данных ЦБ РФ
 import urllib.parse
-# Для получения данных из Telegram
-try:
-    from telethon.sync import TelegramClient
-    from telethon.tl.types import Message
-except ImportError:
-    TelegramClient = None
-    Message = None
-
 logger = setup_logger(__name__)
 
+# bs4 and telethon are imported on first use: they are only needed when a refresh scrapes
+# the sources, not for starting the bot or serving a persisted context
+
+def _parse_html(content):
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(content, 'html.parser')
+
+def _telegram_client_class():
+    """telethon's TelegramClient, or None if the library is missing."""
+    try:
+        from telethon.sync import TelegramClient
+    except ImportError:
+        return None
+    return TelegramClient
+
 class DataFetcher:
     def __init__(self, news_api_key: str, economic_api_key: str, cache: DataCache, telegram_api_id: Optional[int] = None, telegram_api_hash: Optional[str] = None):
         self.news_api_key = news_api_key
@@ -39,10 +48,24 @@ class DataFetcher:
         # Scientific articles folder
         self.articles_folder = os.path.join(os.path.dirname(__file__), "../../articles")
 
+        # Telegram channel posts: append-only log, the context shows the last TELEGRAM_NEWS_DAYS days
+        self.post_log = PostLog(os.getenv("POST_LOG_PATH", os.path.join(os.path.dirname(__file__), "cache", "telegram_posts")))
+        self.post_log_retention_days = int(os.getenv("POST_LOG_RETENTION_DAYS", 365))
+        # The context refresh and the bot's scheduled update share this fetcher: one Telethon session at a time
+        self._telegram_lock = threading.Lock()
+        self.telegram_news_days = int(os.getenv("TELEGRAM_NEWS_DAYS", 45))
+        # Per-post and daily/weekly summaries in place of the full posts (None: full posts)
+        self.news_digest = create_news_digest_from_env()
+
+        # Board meeting calendar: published once a year, so it is cached much longer than the rest
+        self.meeting_calendar_url = os.getenv("MEETING_CALENDAR_URL", "https://www.cbr.ru/dkp/cal_mp/")
+        self.meeting_calendar_file = os.getenv("MEETING_CALENDAR_FILE", os.path.join(os.path.dirname(__file__), "meeting_calendar.txt"))
+        self.meeting_calendar_cache = DataCache(ttl=int(os.getenv("MEETING_CALENDAR_TTL", 7 * 24 * 3600)))
+
     def fetch_news_data(self, keywords: str = "Россия РФ экономика политика") -> Optional[str]:
-        """Fetch news from CBR Telegram channel @centralbank_russia for the last 2 months."""
+        """Fetch news from CBR Telegram channel @centralbank_russia for the last TELEGRAM_NEWS_DAYS days."""
         # First try Telegram approach
-        if TelegramClient and self.telegram_api_id and self.telegram_api_hash:
+        if self.telegram_api_id and self.telegram_api_hash and _telegram_client_class():
             try:
                 return self._fetch_news_from_telegram()
             except Exception as e:
@@ -53,13 +76,14 @@ class DataFetcher:
         return self._fetch_news_from_newsapi(keywords)
 
     def _fetch_news_from_telegram(self) -> Optional[str]:
-        """Fetch posts from @centralbank_russia Telegram channel for the last 2 months."""
+        """Fetch posts from @centralbank_russia Telegram channel for the last TELEGRAM_NEWS_DAYS days (read from the post log)."""
         cache_key = {"type": "cbr_telegram_news"}
         cached_data = self.cache.get(cache_key)
         if cached_data:
             logger.info("Using cached Telegram news data")
             return cached_data
 
+        TelegramClient = _telegram_client_class()
         if not TelegramClient:
             logger.warning("TelegramClient not available, telethon library missing")
             return None
@@ -72,95 +96,81 @@ class DataFetcher:
             logger.info("Using Telegram API to fetch from @centralbank_russia")
             import asyncio
 
-            async def fetch_messages():
+            since = datetime.now() - timedelta(days=self.telegram_news_days)
+
+            async def ingest_messages() -> int:
+                """Stream new channel posts into the post log; returns how many were appended."""
                 # Use session file specifically for user account with full path
                 session_path = os.path.join(os.path.dirname(__file__), "telegram_user_session")
-
+                if not os.path.exists(session_path + '.session'):
+                    logger.warning("No session file found. Run first time authentication manually.")
+                    logger.info("For now, using fallback news source.")
+                    return 0
+
+                logger.info("Found existing session file, connecting...")
+                client = TelegramClient(session_path, self.telegram_api_id, self.telegram_api_hash)
+                await client.connect()
                 try:
-                    # Check if session already exists
-                    if os.path.exists(session_path + '.session'):
-                        logger.info("Found existing session file, connecting...")
-                        client = TelegramClient(session_path, self.telegram_api_id, self.telegram_api_hash)
-                        await client.connect()
-
-                        # Check if authorized
-                        if not await client.is_user_authorized():
-                            logger.warning("Session exists but not authorized")
-                            return []
-
-                        logger.info("Successfully connected to Telegram")
-                    else:
-                        logger.warning("No session file found. Run first time authentication manually.")
-                        logger.info("For now, using fallback news source.")
-                        return []
-
-                    # Calculate date range: last 2 months
-                    two_months_ago = datetime.now() - timedelta(days=60)
-                    one_and_a_half_month_ago = datetime.now() - timedelta(days=45)
-                    one_month_ago = datetime.now() - timedelta(days=30)
-
-                    # Get the channel entity
-                    channel = await client.get_entity("centralbank_russia")
+                    # Check if authorized
+                    if not await client.is_user_authorized():
+                        logger.warning("Session exists but not authorized")
+                        return 0
+                    logger.info("Successfully connected to Telegram")
 
-                    # Get messages from the channel starting from 2 months ago
-                    messages = []
-                    count = 0
-                    async for message in client.iter_messages(channel, offset_date=one_and_a_half_month_ago, reverse=True):
-                        if message.text and len(message.text.strip()) > 0 and count < 1000:
-                            messages.append(message)
-                            count += 1
-                        if count >= 1000:
-                            break
-
-                    logger.info(f"Retrieved {len(messages)} messages from CBR Telegram channel")
-                    return messages
+                    channel = await client.get_entity("centralbank_russia")
 
+                    # Only posts newer than the log (or the whole window on the first run),
+                    # each one normalized and appended as it arrives
+                    appended = 0
+                    async for message in client.iter_messages(channel, min_id=self.post_log.max_id(),
+                                                              offset_date=since, reverse=True):
+                        post = normalize_post(message.id, message.date, message.text)
+                        if post is not None and self.post_log.append(post):
+                            appended += 1
+                    return appended
                 except Exception as e:
                     logger.error(f"Error getting messages: {e}")
-                    return []
-
+                    return 0
                 finally:
-                    if 'client' in locals():
-                        await client.disconnect()
+                    self.post_log.flush()
+                    await client.disconnect()
 
             # Try to run the async function; if event loop running, skip
             try:
                 logger.info("No running event loop, using Telegram API")
-                messages = asyncio.run(fetch_messages())
+                with self._telegram_lock:
+                    appended = asyncio.run(ingest_messages())
             except RuntimeError:
                 logger.info("Already in event loop, skipping Telegram API (use NewsAPI instead)")
                 return None  # Will fallback to NewsAPI
+            logger.info(f"Appended {appended} new posts to the Telegram post log")
+            self.post_log.prune(self.post_log_retention_days)
 
-            if not messages:
-                logger.warning("No messages retrieved from Telegram")
-                return None
-
-            # Process and format messages
-            news_text = ""
-            for msg in messages:  # Limit to 400 most recent messages
-                # Extract date and clean text
-                msg_date = msg.date.strftime("%d.%m.%Y %H:%M")
-                clean_text = msg.text.strip()[:9000]  # Limit text length to 9000 characters
-                # Replace newlines with spaces for better formatting
-                clean_text = clean_text.replace('\n', ' ').replace('\r', ' ')
-                # Remove extra spaces
-                clean_text = re.sub(r'\s+', ' ', clean_text)
-
-                if clean_text:
-                    news_text += f"- {msg_date} | {clean_text}\n"
-
-            if not news_text:
+            # Format the window straight from the log segments
+            if self.news_digest is not None:
+                count = self.post_log.count(since=since.date())
+                news_text = self.news_digest.render(self.post_log.scan(since=since.date()))
+            else:
+                lines = []
+                for post in self.post_log.scan(since=since.date()):
+                    if len(lines) >= 1000:
+                        break
+                    posted_at = datetime.fromisoformat(post["date"])
+                    lines.append(f"- {posted_at.strftime('%d.%m.%Y %H:%M')} | {post['text']}\n")
+                count, news_text = len(lines), "".join(lines)
+
+            if not count:
                 logger.warning("No valid messages found")
                 return None
 
-            result = f"НОВОСТИ ПО РОССИИ (из Telegram канала ЦБ РФ @centralbank_russia):\n\n{news_text}\n"
-            result += f"Всего получено постов: {len(messages)}\n"
+            result = f"НОВОСТИ ПО РОССИИ (из Telegram канала ЦБ РФ @centralbank_russia):\n\n{news_text.rstrip()}\n\n"
+            result += f"Всего получено постов: {count}\n"
             result += f"Источник: Telegram канал @centralbank_russia\n"
-            result += f"Период: последние 2 месяца\n"
+            result += f"Период: {since.strftime('%d.%m.%Y')}–{datetime.now().strftime('%d.%m.%Y')} (последние {self.telegram_news_days} дн.)\n"
             result += f"Обновлено: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
 
             self.cache.set(cache_key, result)
-            logger.info(f"Successfully processed {len(messages)} CB RF Telegram posts")
+            logger.info(f"Successfully processed {count} CB RF Telegram posts")
 
             return result
 
@@ -182,7 +192,7 @@ class DataFetcher:
             response = requests.get(url, headers=headers, timeout=10)
             response.raise_for_status()
 
-            soup = BeautifulSoup(response.content, 'html.parser')
+            soup = _parse_html(response.content)
 
             # Find news items on CBR website
             news_items = []
@@ -356,7 +366,7 @@ class DataFetcher:
 
             response = requests.get(url, headers=headers, timeout=10)
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
+            soup = _parse_html(response.content)
 
             logger.info("Successfully loaded CBR key rates page, parsing chart data...")
 
@@ -677,6 +687,42 @@ class DataFetcher:
             fallback_text = """ """
             return fallback_text
 
+    def fetch_meeting_calendar(self) -> MeetingCalendar:
+        """
+        Bank of Russia board meeting dates: local override file, otherwise the cbr.ru calendar page.
+        Raises on a failed fetch or parse, so the calendar section keeps its last good rendering.
+        """
+        override = load_calendar_file(self.meeting_calendar_file)
+        if override is not None:
+            logger.info(f"Using meeting calendar from {self.meeting_calendar_file} ({len(override)} dates)")
+            return override
+
+        cache_key = {"type": "cbr_meeting_calendar"}
+        cached_data = self.meeting_calendar_cache.get(cache_key)
+        if cached_data:
+            logger.info("Using cached CBR meeting calendar")
+            return MeetingCalendar((datetime.strptime(day, "%Y-%m-%d").date() for day in cached_data),
+                                   source="календарь Банка России (cbr.ru)")
+
+        try:
+            headers = {
+                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+            }
+            response = requests.get(self.meeting_calendar_url, headers=headers, timeout=10)
+            response.raise_for_status()
+            text = _parse_html(response.content).get_text(" ")
+            dates = parse_calendar_page(text)
+            if not dates:
+                raise ValueError("no meeting dates found on the calendar page")
+
+            calendar = MeetingCalendar(dates, source="календарь Банка России (cbr.ru)")
+            self.meeting_calendar_cache.set(cache_key, [day.isoformat() for day in calendar.dates])
+            logger.info(f"Parsed {len(calendar)} board meeting dates from {self.meeting_calendar_url}")
+            return calendar
+        except Exception as e:
+            logger.error(f"Error fetching CBR meeting calendar: {e}")
+            raise
+
     def fetch_scientific_articles(self) -> str:
         """Load scientific articles from the articles folder."""
         if not os.path.exists(self.articles_folder):
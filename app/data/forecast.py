@@ -0,0 +1,173 @@
+import math
+import os
+import threading
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from app.context_sections import ContextData
+from app.data.key_rates import KeyRateSeries
+from app.utils.logger import setup_logger
+
+load_dotenv()
+logger = setup_logger(__name__)
+
+
+def _yearly_arrays(pairs: List[Tuple[int, float]]):
+    """Sorted (years, values) numpy arrays of a yearly series."""
+    import numpy as np
+    return np.array([year for year, _ in pairs], dtype=np.int64), np.array([value for _, value in pairs], dtype=float)
+
+
+def _softmax(logits):
+    import numpy as np
+    exp = np.exp(logits - logits.max())
+    return exp / exp.sum()
+
+
+class BaselineForecaster:
+    """
+    Количественный базовый прогноз ключевой ставки без LLM.
+
+    По рядам ключевой ставки, инфляции и роста ВВП из контекста считает оценку
+    по правилу Тейлора, сигналы тренда (последние изменения ставки) и инерции
+    (сколько ставка не менялась) и переводит их в вероятности повышения,
+    сохранения и снижения на ближайшем заседании. Считается один раз на
+    версию контекста; результат — несколько чисел для промптов и /forecast.
+    """
+
+    def __init__(self, inflation_target: float = 4.0, neutral_real_rate: float = 2.5,
+                 inflation_weight: float = 0.5, output_weight: float = 0.5, gap_scale: float = 2.0):
+        self.inflation_target = inflation_target
+        self.neutral_real_rate = neutral_real_rate
+        self.inflation_weight = inflation_weight
+        self.output_weight = output_weight
+        self.gap_scale = gap_scale
+        self._lock = threading.Lock()
+        self._version = None
+        self._forecast: Optional[Dict] = None
+
+    def get(self, system_context: str, version: str, data: Optional[ContextData] = None) -> Optional[Dict]:
+        """Baseline for the context version, computed once per version; None without a rate series."""
+        with self._lock:
+            if version != self._version:
+                self._forecast = self.compute(system_context, date.today(), data)
+                self._version = version
+                if self._forecast:
+                    logger.info(f"Baseline forecast for version {version}: {self._forecast['probabilities']}")
+            return self._forecast
+
+    def compute(self, system_context: str, today: date, data: Optional[ContextData] = None) -> Optional[Dict]:
+        import numpy as np
+
+        data = data or ContextData.from_context(system_context)
+        series = data.key_rates
+        if len(series) == 0:
+            return None
+        rates = np.array(series.rates, dtype=float)
+        days = np.array([day.toordinal() for day in series.dates], dtype=np.int64)
+        current_rate = float(rates[-1])
+
+        # Trend: rate changes over the last 12 months, and the direction of the latest move
+        steps = np.diff(rates)
+        step_days = days[1:]
+        recent = steps[step_days >= today.toordinal() - 365]
+        last_step = float(steps[-1]) if steps.size else 0.0
+        days_since_change = int(today.toordinal() - days[-1])
+        momentum = float(np.sign(last_step) * math.exp(-days_since_change / 180.0)) if last_step else 0.0
+
+        # Taylor rule: neutral real rate + inflation + weights * (inflation gap, output gap)
+        inflation_years, inflation = _yearly_arrays(data.inflation)
+        growth_years, growth = _yearly_arrays(data.gdp_growth)
+        latest_inflation = float(inflation[-1]) if inflation.size else None
+        output_gap = float(growth[-1] - growth[-10:].mean()) if growth.size >= 3 else 0.0
+
+        taylor_rate = None
+        taylor_gap = 0.0
+        if latest_inflation is not None:
+            taylor_rate = (self.neutral_real_rate + latest_inflation
+                           + self.inflation_weight * (latest_inflation - self.inflation_target)
+                           + self.output_weight * output_gap)
+            taylor_gap = taylor_rate - current_rate
+
+        # Pressure towards a move: recent momentum plus the (bounded) Taylor gap, which gets less weight
+        # because the inflation series is annual and lags; inertia favours a hold, more so the longer
+        # the rate has not changed
+        pressure = 0.5 * math.tanh(taylor_gap / self.gap_scale) + momentum
+        inertia = 1.0 + min(days_since_change, 365) / 365.0 - 0.3 * min(len(recent), 3)
+        probabilities = _softmax(np.array([2.0 * pressure, inertia, -2.0 * pressure]))
+        hike, hold, cut = (round(float(p), 3) for p in probabilities)
+
+        typical_step = float(np.abs(recent).mean()) if recent.size else 1.0
+        expected_rate = current_rate + typical_step * (hike - cut)
+        next_meeting = data.calendar.next(today)
+
+        return {
+            "as_of": today.isoformat(),
+            "current_rate": current_rate,
+            "rate_since": series.dates[-1].isoformat(),
+            "days_since_change": days_since_change,
+            "last_change_pp": round(last_step, 2),
+            "changes_last_12m": int(recent.size),
+            "inflation": latest_inflation,
+            "inflation_year": int(inflation_years[-1]) if inflation_years.size else None,
+            "output_gap_pp": round(output_gap, 2),
+            "taylor_rate": round(taylor_rate, 2) if taylor_rate is not None else None,
+            "taylor_gap_pp": round(taylor_gap, 2),
+            "momentum": round(momentum, 3),
+            "probabilities": {"hike": hike, "hold": hold, "cut": cut},
+            "expected_rate": round(expected_rate, 2),
+            "next_meeting": next_meeting.isoformat() if next_meeting else None,
+        }
+
+
+def render_forecast(forecast: Optional[Dict]) -> str:
+    """A few prompt lines with the baseline signals."""
+    if not forecast:
+        return "БАЗОВАЯ КОЛИЧЕСТВЕННАЯ МОДЕЛЬ: нет данных"
+    p = forecast["probabilities"]
+    taylor = (f"{forecast['taylor_rate']:.2f}% (разрыв {forecast['taylor_gap_pp']:+.2f} п.п.)"
+              if forecast["taylor_rate"] is not None else "нет данных по инфляции")
+    inflation = (f"{forecast['inflation']:.1f}% ({forecast['inflation_year']})"
+                 if forecast["inflation"] is not None else "нет данных")
+    return "\n".join([
+        "БАЗОВАЯ КОЛИЧЕСТВЕННАЯ МОДЕЛЬ:",
+        f"- Ключевая ставка: {forecast['current_rate']:.2f}% с {forecast['rate_since']} "
+        f"({forecast['days_since_change']} дн. без изменений, последнее изменение {forecast['last_change_pp']:+.2f} п.п.)",
+        f"- Инфляция: {inflation}; разрыв выпуска: {forecast['output_gap_pp']:+.2f} п.п.",
+        f"- Правило Тейлора: {taylor}; импульс: {forecast['momentum']:+.2f}",
+        f"- Вероятности: повышение {p['hike']:.0%}, сохранение {p['hold']:.0%}, снижение {p['cut']:.0%}; "
+        f"ожидаемая ставка {forecast['expected_rate']:.2f}%",
+    ])
+
+
+def compact_report_context(system_context: str, forecast: Optional[Dict], data: Optional[ContextData] = None) -> str:
+    """Report context with the baseline lines in place of the long key-rate/inflation/GDP histories."""
+    data = data or ContextData.from_context(system_context)
+    history = [data.spans[name] for name in ("key_rates", "inflation", "gdp") if name in data.spans]
+    if not history:
+        return render_forecast(forecast) + "\n\n" + system_context
+    return system_context[:history[0][0]] + render_forecast(forecast) + system_context[history[-1][1]:]
+
+
+def recent_decisions(series: KeyRateSeries, limit: int = 6) -> str:
+    """Last key rate changes as short lines for the next-meeting prompt."""
+    lines = [f"{day.strftime('%d.%m.%Y')}: {rate:.2f}%" for day, rate in zip(series.dates[-limit:], series.rates[-limit:])]
+    return "; ".join(lines) if lines else "См. историю ключевых ставок в данных"
+
+
+def create_forecaster_from_env() -> BaselineForecaster:
+    """FORECAST_* settings of the Taylor rule."""
+    return BaselineForecaster(
+        inflation_target=float(os.getenv("FORECAST_INFLATION_TARGET", 4.0)),
+        neutral_real_rate=float(os.getenv("FORECAST_NEUTRAL_REAL_RATE", 2.5)),
+    )
+
+# Глобальный экземпляр
+forecaster = None
+
+def get_baseline_forecaster() -> BaselineForecaster:
+    """Получить глобальный базовый прогноз."""
+    global forecaster
+    if forecaster is None:
+        forecaster = create_forecaster_from_env()
+    return forecaster
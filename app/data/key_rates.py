@@ -0,0 +1,66 @@
+import re
+from bisect import bisect_right
+from datetime import date, datetime
+from typing import Iterable, List, Optional, Tuple
+
+DATE_FORMATS = ("%d.%m.%Y", "%Y-%m-%d", "%d/%m/%Y")
+
+# "- 18.12.2023: 16.00%" lines of the history block rendered by DataFetcher._fetch_cbr_key_rates_history
+_HISTORY_LINE = re.compile(r"^- (\d{1,2}[./]\d{1,2}[./]\d{4}|\d{4}-\d{2}-\d{2}): (\d+(?:[.,]\d+)?)%", re.MULTILINE)
+HISTORY_MARKER = "ИСТОРИЯ ИЗМЕНЕНИЙ КЛЮЧЕВОЙ СТАВКИ"
+
+
+def parse_date(value: str) -> Optional[date]:
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+class KeyRateSeries:
+    """
+    История ключевой ставки как отсортированные массивы дат изменения и ставок.
+    Ставка на дату ищется бинарным поиском (as-of: последнее изменение не позже даты).
+    """
+
+    def __init__(self, pairs: Iterable[Tuple[date, float]] = ()):
+        pairs = sorted(pairs)
+        self.dates: List[date] = [day for day, _ in pairs]
+        self.rates: List[float] = [rate for _, rate in pairs]
+
+    @classmethod
+    def from_pairs(cls, pairs: Iterable[Tuple[str, float]]) -> "KeyRateSeries":
+        """Build from (date string, rate) pairs as parsed from the cbr.ru chart; unparsable dates are skipped."""
+        parsed = []
+        for value, rate in pairs:
+            day = parse_date(value)
+            if day is not None:
+                parsed.append((day, float(rate)))
+        return cls(parsed)
+
+    @classmethod
+    def from_history_text(cls, text: str) -> "KeyRateSeries":
+        """Build from the rendered key-rate history (a cached section or the system context)."""
+        start = text.find(HISTORY_MARKER)
+        if start < 0:
+            return cls()
+        end = text.find("Источник:", start)
+        block = text[start:end if end > 0 else None]
+        return cls.from_pairs((value, rate.replace(",", ".")) for value, rate in _HISTORY_LINE.findall(block))
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def as_of(self, day: date) -> Optional[Tuple[date, float]]:
+        """(date of the change in effect, rate) on the given day; None before the first known change."""
+        i = bisect_right(self.dates, day)
+        if i == 0:
+            return None
+        return self.dates[i - 1], self.rates[i - 1]
+
+    def latest(self) -> Optional[Tuple[date, float]]:
+        if not self.dates:
+            return None
+        return self.dates[-1], self.rates[-1]
@@ -0,0 +1,161 @@
+import os
+import re
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.data.key_rates import parse_date
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+MONTHS = {
+    "января": 1, "февраля": 2, "марта": 3, "апреля": 4, "мая": 5, "июня": 6,
+    "июля": 7, "августа": 8, "сентября": 9, "октября": 10, "ноября": 11, "декабря": 12,
+}
+
+TEXT_DATE = re.compile(r"\b(\d{1,2})\s+(" + "|".join(MONTHS) + r")\s+(\d{4})")
+NUMERIC_DATE = re.compile(r"\b(\d{1,2})\.(\d{1,2})\.(\d{4})\b")
+
+# Заголовок секции календаря в системном контексте
+CALENDAR_MARKER = "ЗАСЕДАНИЯ СОВЕТА ДИРЕКТОРОВ ПО КЛЮЧЕВОЙ СТАВКЕ:"
+
+
+# Строка календаря cbr.ru о заседании по ключевой ставке (а не о публикации резюме, прогноза и т.п.)
+MEETING_ROW = re.compile(r"заседани\w*\s+совета\s+директоров|заседани\w*\s+по\s+ключев", re.IGNORECASE)
+
+
+def _dated_spans(text: str) -> List[Tuple[date, int, int]]:
+    """Every full date in a text with its position: (date, start, end), in text order."""
+    found = []
+    for match in TEXT_DATE.finditer(text):
+        day, month, year = match.groups()
+        try:
+            found.append((date(int(year), MONTHS[month], int(day)), match.start(), match.end()))
+        except ValueError:
+            continue
+    for match in NUMERIC_DATE.finditer(text):
+        day, month, year = match.groups()
+        try:
+            found.append((date(int(year), int(month), int(day)), match.start(), match.end()))
+        except ValueError:
+            continue
+    return sorted(found, key=lambda span: span[1])
+
+
+def find_dates(text: str) -> List[date]:
+    """All full dates in a text ("14 февраля 2025", "14.02.2025")."""
+    return [day for day, _, _ in _dated_spans(text)]
+
+
+class MeetingCalendar:
+    """
+    Календарь заседаний Совета директоров Банка России по ключевой ставке.
+    Даты хранятся отсортированными; следующее, предстоящие и прошедшие
+    заседания считаются относительно переданной даты.
+    """
+
+    def __init__(self, dates: Iterable[date] = (), source: str = ""):
+        self.dates: List[date] = sorted(set(dates))
+        self.source = source
+
+    @classmethod
+    def from_input(cls, text: str) -> "MeetingCalendar":
+        """Calendar from its section input (dump()), or from an older rendered section."""
+        dates, source = [], ""
+        for line in (text or "").splitlines():
+            line = line.strip()
+            if line.startswith("Источник:"):
+                source = line[len("Источник:"):].strip()
+                continue
+            day = parse_date(line) if line else None
+            if day is not None:
+                dates.append(day)
+            else:
+                dates.extend(find_dates(line))
+        return cls(dates, source=source)
+
+    def dump(self) -> str:
+        """Section input: every known date (not only the rendered window), one per line."""
+        if not self.dates:
+            return ""
+        lines = [day.isoformat() for day in self.dates]
+        if self.source:
+            lines.append(f"Источник: {self.source}")
+        return "\n".join(lines)
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def next(self, today: date) -> Optional[date]:
+        """Next meeting on or after today."""
+        i = bisect_left(self.dates, today)
+        return self.dates[i] if i < len(self.dates) else None
+
+    def upcoming(self, today: date, limit: int = 8) -> List[date]:
+        i = bisect_left(self.dates, today)
+        return self.dates[i:i + limit]
+
+    def past(self, today: date, limit: int = 8) -> List[date]:
+        """Most recent meetings first."""
+        i = bisect_left(self.dates, today)
+        return list(reversed(self.dates[max(0, i - limit):i]))
+
+    def as_dict(self, today: date) -> Dict:
+        """Structured dates in the shape LLMAnalyzer expects for meeting_dates."""
+        next_meeting = self.next(today)
+        return {
+            "next": next_meeting.strftime("%d.%m.%Y") if next_meeting else None,
+            "upcoming": [day.strftime("%d.%m.%Y") for day in self.upcoming(today)],
+            "past": [day.strftime("%d.%m.%Y") for day in self.past(today)],
+        }
+
+    def render(self, today: date) -> str:
+        """Section text for the system context."""
+        if not self.dates:
+            return ""
+        dates = self.as_dict(today)
+        lines = [
+            f"Следующее заседание: {dates['next'] or 'не объявлено'}",
+            f"Предстоящие: {', '.join(dates['upcoming']) or 'нет данных'}",
+            f"Прошедшие: {', '.join(dates['past']) or 'нет данных'}",
+        ]
+        if self.source:
+            lines.append(f"Источник: {self.source}")
+        return "\n".join(lines)
+
+
+def load_calendar_file(path: str) -> Optional[MeetingCalendar]:
+    """Local override: one date per line (dd.mm.yyyy or yyyy-mm-dd), '#' starts a comment."""
+    if not path or not os.path.exists(path):
+        return None
+    dates = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            day = parse_date(line)
+            if day is None:
+                logger.warning(f"Skipping unparsable meeting date in {path}: {line!r}")
+                continue
+            dates.append(day)
+    if not dates:
+        return None
+    return MeetingCalendar(dates, source=f"локальный календарь ({os.path.basename(path)})")
+
+
+def parse_calendar_page(text: str, today: Optional[date] = None) -> List[date]:
+    """
+    Key rate meeting dates from the cbr.ru calendar page text: a date counts only
+    if the row it starts (the text up to the next date) is a board meeting, and
+    only within a plausible window around today.
+    """
+    today = today or datetime.now().date()
+    low, high = today - timedelta(days=2 * 366), today + timedelta(days=2 * 366)
+    spans = _dated_spans(text)
+    dates = []
+    for i, (day, _, end) in enumerate(spans):
+        row = text[end:spans[i + 1][1] if i + 1 < len(spans) else None]
+        if low <= day <= high and MEETING_ROW.search(row):
+            dates.append(day)
+    return dates
@@ -0,0 +1,274 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import deque
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+from app.utils.logger import setup_logger
+
+load_dotenv()
+logger = setup_logger(__name__)
+
+# summarize(text, kind) -> summary; kind is "post", "day" or "week".
+# None: no summary (the extractive one is kept); PENDING: still being computed
+Summarizer = Callable[[str, str], Optional[str]]
+PENDING = "__pending__"
+
+# Ограничение длины сводок по уровням
+SUMMARY_LIMITS = {"post": 300, "day": 600, "week": 900}
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def _digest_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _cap(text: str, limit: int) -> str:
+    text = text.strip()
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def extractive_summary(text: str, kind: str) -> str:
+    """Summary without a model: the first sentence of every line (post or digest), capped per level."""
+    leads = [_SENTENCE_END.split(line.strip(), 1)[0].rstrip(".") for line in text.splitlines() if line.strip()]
+    return _cap("; ".join(leads), SUMMARY_LIMITS.get(kind, SUMMARY_LIMITS["post"]))
+
+
+class NewsDigest:
+    """
+    Иерархические сводки постов канала: пост -> день -> неделя.
+
+    Каждый пост резюмируется один раз по ключу (id, хеш текста), сводки
+    дописываются в post_summaries.jsonl. Дневная сводка строится из сводок
+    постов дня, недельная — из дневных; обе хранятся в digests.json вместе с
+    хешем входа и пересчитываются, только если в их окне появились новые посты.
+    В контекст идут недельные сводки за прошлые недели, дневные за последние
+    дни и несколько последних постов целиком.
+    """
+
+    def __init__(self, root: str, summarize: Summarizer = extractive_summary,
+                 daily_days: int = 7, recent_posts: int = 5):
+        self.root = root
+        self.summarize = summarize
+        self.daily_days = daily_days
+        self.recent_posts = recent_posts
+        self.summaries_path = os.path.join(root, "post_summaries.jsonl")
+        self.digests_path = os.path.join(root, "digests.json")
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._summaries: Dict[str, str] = self._load_summaries()
+        self._digests: Dict[str, Dict] = self._load_digests()
+        self._computed = 0
+
+    def _load_summaries(self) -> Dict[str, str]:
+        summaries = {}
+        if os.path.exists(self.summaries_path):
+            with open(self.summaries_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        summaries[record["key"]] = record["summary"]
+                    except (json.JSONDecodeError, KeyError):
+                        continue  # a line cut short by a crash
+        return summaries
+
+    def _load_digests(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.digests_path):
+            return {}
+        try:
+            with open(self.digests_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.error(f"News digests unreadable, recomputing: {e}")
+            return {}
+
+    def _summarize(self, text: str, kind: str) -> Tuple[str, bool]:
+        """(summary, final); a pending summary is stood in for by the extractive one and asked for again later."""
+        self._computed += 1
+        try:
+            summary = self.summarize(text, kind)
+        except Exception as e:
+            logger.warning(f"News summarizer failed ({kind}), using the extractive summary: {e}")
+            summary = None
+        if summary == PENDING:
+            return extractive_summary(text, kind), False
+        return (_cap(summary, SUMMARY_LIMITS[kind]) if summary and summary.strip() else extractive_summary(text, kind)), True
+
+    def summarize_post(self, post: Dict) -> str:
+        """Summary of one post, computed once per (id, text)."""
+        key = f"{post['id']}:{_digest_key(post['text'])}"
+        with self._lock:
+            cached = self._summaries.get(key)
+        if cached is not None:
+            return cached
+        summary, final = self._summarize(post["text"], "post")
+        if not final:
+            return summary
+        with self._lock:
+            self._summaries[key] = summary
+            with open(self.summaries_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "summary": summary}, ensure_ascii=False) + "\n")
+        return summary
+
+    def _rollup(self, key: str, parts: List[str], kind: str) -> str:
+        """Digest of the parts, recomputed only when they changed since the stored one."""
+        text = "\n".join(parts)
+        input_hash = _digest_key(text)
+        with self._lock:
+            stored = self._digests.get(key)
+        if stored is not None and stored["input"] == input_hash and stored.get("final", True):
+            return stored["summary"]
+        summary, final = self._summarize(text, kind) if len(parts) > 1 else (parts[0], True)
+        with self._lock:
+            self._digests[key] = {"input": input_hash, "summary": summary, "final": final}
+        return summary
+
+    def _save_digests(self, keep: Iterable[str]) -> None:
+        keep = set(keep)
+        with self._lock:
+            # Digests of windows that left the scanned range are dropped
+            self._digests = {key: value for key, value in self._digests.items() if key in keep}
+            tmp_path = self.digests_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._digests, f, ensure_ascii=False)
+            os.replace(tmp_path, self.digests_path)
+
+    def render(self, posts: Iterable[Dict], today: Optional[date] = None) -> str:
+        """
+        News section body from chronologically ordered posts (streamed, e.g.
+        PostLog.scan): weekly digests, daily digests for the last daily_days,
+        then the latest posts in full.
+        """
+        today = today or datetime.now().date()
+        daily_since = today - timedelta(days=self.daily_days - 1)
+        self._computed = 0
+
+        recent = deque(maxlen=self.recent_posts)
+        days: List[tuple] = []  # (day, post count, daily digest)
+        current_day, parts = None, []
+
+        def close_day():
+            if parts:
+                days.append((current_day, len(parts), self._rollup(f"day:{current_day.isoformat()}", parts, "day")))
+
+        for post in posts:
+            recent.append(post)
+            posted_on = date.fromisoformat(post["date"][:10])
+            if posted_on != current_day:
+                close_day()
+                current_day, parts = posted_on, []
+            parts.append(self.summarize_post(post))
+        close_day()
+
+        weeks: Dict[tuple, List[tuple]] = {}
+        for day, count, summary in days:
+            if day < daily_since:
+                weeks.setdefault(tuple(day.isocalendar())[:2], []).append((day, count, summary))
+
+        lines, keys = [], [f"day:{day.isoformat()}" for day, _, _ in days]
+        if weeks:
+            lines.append("Сводки по неделям:")
+            for (year, week), week_days in weeks.items():
+                key = f"week:{year}-W{week:02d}"
+                keys.append(key)
+                summary = self._rollup(key, [summary for _, _, summary in week_days], "week")
+                first, last = week_days[0][0], week_days[-1][0]
+                count = sum(count for _, count, _ in week_days)
+                lines.append(f"- {first.strftime('%d.%m.%Y')}–{last.strftime('%d.%m.%Y')} ({count} пост.): {summary}")
+        daily = [(day, count, summary) for day, count, summary in days if day >= daily_since]
+        if daily:
+            lines.append("\nСводки по дням:")
+            lines.extend(f"- {day.strftime('%d.%m.%Y')} ({count} пост.): {summary}" for day, count, summary in daily)
+        if recent:
+            lines.append("\nПоследние посты:")
+            for post in recent:
+                posted_at = datetime.fromisoformat(post["date"])
+                lines.append(f"- {posted_at.strftime('%d.%m.%Y %H:%M')} | {post['text']}")
+
+        self._save_digests(keys)
+        logger.info(f"News digest: {len(days)} days, {len(weeks)} weeks, {self._computed} summaries computed")
+        return "\n".join(lines)
+
+    @property
+    def uses_llm(self) -> bool:
+        return isinstance(self.summarize, LLMSummarizer)
+
+    def attach_llm(self, analyzer, submit) -> None:
+        """Give an LLM summarizer (NEWS_SUMMARIZER=llm) the shared analyzer and scheduler of the process."""
+        if self.uses_llm:
+            self.summarize.attach(analyzer, submit)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"post_summaries": len(self._summaries), "digests": len(self._digests)}
+
+
+class LLMSummarizer:
+    """
+    Сводки через общий LLMAnalyzer процесса (маленькая модель, если настроена)
+    с фоновым приоритетом его планировщика. Обновление контекста сводок не
+    ждет: пока сводка считается, возвращается PENDING и в контекст идет
+    извлекающая, а готовая сводка подхватывается при следующем обновлении.
+    До подключения анализатора (attach) сводки тоже временно извлекающие.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._analyzer = None
+        self._submit = None
+        self._pending: Dict[tuple, object] = {}
+        self._done: Dict[tuple, Optional[str]] = {}
+
+    def attach(self, analyzer, submit) -> None:
+        """analyzer.summarize_news runs as submit(fn, *args, priority=BACKGROUND) (LLMScheduler.submit)."""
+        with self._lock:
+            self._analyzer, self._submit = analyzer, submit
+
+    def __call__(self, text: str, kind: str) -> Optional[str]:
+        from app.llm.scheduler import BACKGROUND
+        key = (kind, _digest_key(text))
+        with self._lock:
+            if key in self._done:
+                return self._done.pop(key)
+            if self._analyzer is None:
+                return PENDING
+            if key in self._pending:
+                return PENDING
+            future = self._pending[key] = self._submit(self._analyzer.summarize_news, text, kind, priority=BACKGROUND)
+        # Outside the lock: a future that is already done runs the callback right away
+        future.add_done_callback(lambda done, key=key: self._finish(key, done))
+        return PENDING
+
+    def _finish(self, key: tuple, future) -> None:
+        try:
+            summary = future.result()
+        except Exception as e:
+            logger.warning(f"LLM news summary failed ({key[0]}): {e}")
+            summary = None
+        with self._lock:
+            self._pending.pop(key, None)
+            self._done[key] = summary
+            # Summaries of inputs that changed meanwhile are never asked for again
+            while len(self._done) > 1000:
+                del self._done[next(iter(self._done))]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"attached": self._analyzer is not None, "pending": len(self._pending), "ready": len(self._done)}
+
+
+def create_news_digest_from_env() -> Optional[NewsDigest]:
+    """NEWS_DIGEST_* settings; None when NEWS_DIGEST_ENABLED is off (posts go into the context in full)."""
+    if (os.getenv("NEWS_DIGEST_ENABLED") or "true").lower() not in ("true", "1", "yes", "on"):
+        return None
+    summarizer = os.getenv("NEWS_SUMMARIZER", "extractive").lower()
+    return NewsDigest(
+        os.getenv("NEWS_DIGEST_PATH", os.path.join(os.path.dirname(__file__), "cache", "news_digest")),
+        summarize=LLMSummarizer() if summarizer == "llm" else extractive_summary,
+        daily_days=int(os.getenv("NEWS_DIGEST_DAILY_DAYS", 7)),
+        recent_posts=int(os.getenv("NEWS_DIGEST_RECENT_POSTS", 5)),
+    )
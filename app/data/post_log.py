@@ -0,0 +1,177 @@
+import json
+import os
+import re
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, Optional
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Каждые N записей сегмента в индексе запоминается смещение (разреженный индекс по id)
+INDEX_EVERY = 64
+MAX_TEXT_LENGTH = 9000
+
+
+def normalize_post(message_id: int, posted_at: datetime, text: str) -> Optional[Dict]:
+    """Compact record of one channel post: whitespace collapsed, length capped; None for empty posts."""
+    clean = re.sub(r"\s+", " ", (text or "").strip()[:MAX_TEXT_LENGTH]).strip()
+    if not clean:
+        return None
+    return {"id": int(message_id), "date": posted_at.isoformat(), "text": clean}
+
+
+class PostLog:
+    """
+    Журнал постов канала: только дозапись, сегменты по дням (YYYY-MM-DD.jsonl).
+
+    Для каждого сегмента в index.json хранятся диапазон id, число записей и
+    смещения каждой INDEX_EVERY-й записи. Чтение за период открывает только
+    сегменты нужных дней и идет построчно, поэтому память не зависит ни от
+    объема канала, ни от срока хранения.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.index_path = os.path.join(root, "index.json")
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._index: Dict[str, Dict] = {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    self._index = json.load(f)
+            except (json.JSONDecodeError, OSError) as e:
+                logger.error(f"Post log index unreadable, rebuilding: {e}")
+                self._rebuild_index()
+        if not self._index_matches_segments():
+            # Appends after the last flush (crash): the segments are the source of truth
+            logger.warning("Post log index is behind its segments, rebuilding")
+            self._rebuild_index()
+
+    def _index_matches_segments(self) -> bool:
+        segments = {name[:-len(".jsonl")] for name in os.listdir(self.root) if name.endswith(".jsonl")}
+        if segments != set(self._index):
+            return False
+        return all(os.path.getsize(self._segment_path(day)) == meta.get("bytes") for day, meta in self._index.items())
+
+    def _segment_path(self, day: str) -> str:
+        return os.path.join(self.root, f"{day}.jsonl")
+
+    def _rebuild_index(self) -> None:
+        self._index = {}
+        for name in sorted(os.listdir(self.root)):
+            if not name.endswith(".jsonl"):
+                continue
+            day = name[:-len(".jsonl")]
+            with open(self._segment_path(day), "rb") as f:
+                offset = 0
+                for line in f:
+                    try:
+                        self._record(day, json.loads(line)["id"], offset, len(line))
+                    except (json.JSONDecodeError, KeyError):
+                        pass
+                    offset += len(line)
+
+    def _record(self, day: str, message_id: int, offset: int, length: int) -> None:
+        meta = self._index.setdefault(day, {"min_id": message_id, "max_id": message_id, "count": 0, "sparse": []})
+        meta["bytes"] = offset + length
+        if meta["count"] % INDEX_EVERY == 0:
+            meta["sparse"].append([message_id, offset])
+        meta["min_id"] = min(meta["min_id"], message_id)
+        meta["max_id"] = max(meta["max_id"], message_id)
+        meta["count"] += 1
+
+    def max_id(self) -> int:
+        """Newest stored message id (0 if empty): ingestion resumes after it."""
+        with self._lock:
+            return max((meta["max_id"] for meta in self._index.values()), default=0)
+
+    def append(self, post: Dict) -> bool:
+        """Append one normalized post to its day segment; False if that id is already stored."""
+        day = post["date"][:10]
+        line = (json.dumps(post, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            meta = self._index.get(day)
+            if meta is not None and meta["min_id"] <= post["id"] <= meta["max_id"] and self._contains(day, post["id"]):
+                return False
+            path = self._segment_path(day)
+            offset = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(path, "ab") as f:
+                f.write(line)
+            self._record(day, post["id"], offset, len(line))
+        return True
+
+    def _contains(self, day: str, message_id: int) -> bool:
+        # Seek to the sparse entry before the id, then read at most one block
+        start = 0
+        for sparse_id, offset in self._index[day]["sparse"]:
+            if sparse_id > message_id:
+                break
+            start = offset
+        with open(self._segment_path(day), "rb") as f:
+            f.seek(start)
+            for _ in range(INDEX_EVERY * 2):
+                line = f.readline()
+                if not line:
+                    break
+                try:
+                    if json.loads(line)["id"] == message_id:
+                        return True
+                except (json.JSONDecodeError, KeyError):
+                    continue
+        return False
+
+    def flush(self) -> None:
+        """Persist the index (atomically) after an ingestion batch."""
+        with self._lock:
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, self.index_path)
+
+    def scan(self, since: Optional[date] = None, until: Optional[date] = None) -> Iterator[Dict]:
+        """Posts in [since, until] in chronological order, read segment by segment."""
+        with self._lock:
+            days = sorted(day for day in self._index
+                          if (since is None or day >= since.isoformat()) and (until is None or day <= until.isoformat()))
+        for day in days:
+            path = self._segment_path(day)
+            if not os.path.exists(path):
+                continue
+            # Streamed line by line; ingestion appends in chronological order
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+
+    def count(self, since: Optional[date] = None, until: Optional[date] = None) -> int:
+        """Number of posts in [since, until], from the index alone."""
+        with self._lock:
+            return sum(meta["count"] for day, meta in self._index.items()
+                       if (since is None or day >= since.isoformat()) and (until is None or day <= until.isoformat()))
+
+    def prune(self, keep_days: int) -> int:
+        """Delete segments older than keep_days; returns the number removed."""
+        cutoff = (datetime.now().date() - timedelta(days=keep_days)).isoformat()
+        removed = 0
+        with self._lock:
+            for day in [day for day in self._index if day < cutoff]:
+                path = self._segment_path(day)
+                if os.path.exists(path):
+                    os.remove(path)
+                del self._index[day]
+                removed += 1
+        if removed:
+            self.flush()
+        return removed
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "segments": len(self._index),
+                "posts": sum(meta["count"] for meta in self._index.values()),
+                "max_id": max((meta["max_id"] for meta in self._index.values()), default=0),
+            }
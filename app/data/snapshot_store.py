@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import zlib
+from bisect import bisect_right
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class SnapshotStore:
+    """
+    Хранилище исходных данных по моментам времени с адресацией по содержимому.
+
+    Каждая загрузка источника сохраняется как сжатый blob по sha256 содержимого
+    (одинаковые данные хранятся один раз), а в manifest.jsonl дописывается
+    строка (source, fetched_at, hash) — только если содержимое изменилось.
+    Запрос as_of(source, t) находит бинарным поиском версию, действовавшую в момент t,
+    поэтому любой прошлый контекст собирается без повторной загрузки.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.blob_dir = os.path.join(root, "blobs")
+        self.manifest_path = os.path.join(root, "manifest.jsonl")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._index: Dict[str, Tuple[List[float], List[str]]] = {}  # source -> (fetched_at list, hash list)
+        self._load_manifest()
+
+    def _load_manifest(self) -> None:
+        if not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    self._add(entry["source"], float(entry["fetched_at"]), entry["hash"])
+                except (json.JSONDecodeError, KeyError, ValueError):
+                    continue  # a line cut short by a crash
+
+    def _add(self, source: str, fetched_at: float, digest: str) -> None:
+        times, hashes = self._index.setdefault(source, ([], []))
+        position = bisect_right(times, fetched_at)
+        times.insert(position, fetched_at)
+        hashes.insert(position, digest)
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], digest[2:])
+
+    def put(self, source: str, payload: str, fetched_at: Optional[datetime] = None) -> str:
+        """Store a fetched payload; returns its hash. Unchanged payloads add neither a blob nor a manifest entry."""
+        data = payload.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        timestamp = (fetched_at or datetime.now()).timestamp()
+
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".blob-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(zlib.compress(data, 6))
+                os.replace(tmp_path, path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+        with self._lock:
+            times, hashes = self._index.get(source, ([], []))
+            position = bisect_right(times, timestamp)
+            if position > 0 and hashes[position - 1] == digest:
+                return digest  # same content as the version in effect
+            self._add(source, timestamp, digest)
+            with open(self.manifest_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"source": source, "fetched_at": timestamp, "hash": digest}) + "\n")
+        return digest
+
+    def get(self, digest: str) -> str:
+        with open(self._blob_path(digest), "rb") as f:
+            return zlib.decompress(f.read()).decode("utf-8")
+
+    def as_of(self, source: str, when: datetime) -> Optional[Tuple[datetime, str, str]]:
+        """(fetched_at, hash, payload) of the source version in effect at `when`; None if it was not fetched yet."""
+        with self._lock:
+            times, hashes = self._index.get(source, ([], []))
+            position = bisect_right(times, when.timestamp())
+            if position == 0:
+                return None
+            fetched_at, digest = times[position - 1], hashes[position - 1]
+        return datetime.fromtimestamp(fetched_at), digest, self.get(digest)
+
+    def sources(self) -> List[str]:
+        with self._lock:
+            return sorted(self._index)
+
+    def history(self, source: str) -> List[Tuple[datetime, str]]:
+        """All stored versions of a source: (fetched_at, hash), oldest first."""
+        with self._lock:
+            times, hashes = self._index.get(source, ([], []))
+            return [(datetime.fromtimestamp(t), h) for t, h in zip(times, hashes)]
+
+    def stats(self) -> Dict:
+        blobs = 0
+        size = 0
+        for directory, _, files in os.walk(self.blob_dir):
+            for name in files:
+                if not name.startswith("."):
+                    blobs += 1
+                    size += os.path.getsize(os.path.join(directory, name))
+        with self._lock:
+            versions = {source: len(times) for source, (times, _) in self._index.items()}
+        return {"blobs": blobs, "blob_bytes": size, "versions": versions}
@@ -1,112 +1,124 @@
-import ollama
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 import os
 from dotenv import load_dotenv
 
-# Optional DeepSeek support
-try:
-    from openai import OpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
-    print("Warning: openai library not available. DeepSeek support disabled.")
-
 from app.utils.logger import setup_logger
-from .prompts import ANALYZE_KEY_RATE_PROMPT_RU, RATE_CHANGE_PROMPT_RU, NEXT_MEETING_PREDICTION_PROMPT_RU, GENERAL_QA_PROMPT_RU, COMPREHENSIVE_QA_PROMPT_RU, SYSTEM_QA_PROMPT_RU
+from app.utils.deadline import Deadline, DeadlineExceeded
+from .prompts import ANALYZE_KEY_RATE_PROMPT_RU, RATE_CHANGE_PROMPT_RU, NEXT_MEETING_PREDICTION_PROMPT_RU, GENERAL_QA_PROMPT_RU, COMPREHENSIVE_QA_PROMPT_RU, SYSTEM_QA_QUESTION_PROMPT_RU, SYSTEM_QA_PASSAGES_PROMPT_RU, NEWS_SUMMARY_PROMPT_RU, NEWS_SUMMARY_KINDS_RU
+from .prompt_cache import SystemPromptCache, PrefixCacheStats
+from .providers import LLMProvider, OllamaProvider, OpenAICompatibleProvider
+from .router import LLMRouter
+from .ollama_pool import create_ollama_pool_from_env
 
 load_dotenv()
 
 logger = setup_logger(__name__)
 
+def _env_flag(name: str) -> bool:
+    return (os.getenv(name) or "false").lower() in ("true", "1", "yes", "on")
+
+def _api_key(name: str) -> Optional[str]:
+    api_key = os.getenv(name)
+    if not api_key or api_key.startswith("your_"):
+        return None
+    return api_key
+
 class LLMAnalyzer:
     def __init__(self, model: str = None, host: str = None):
-        # Determine which model provider to use
-        # Priority: OpenRouter > DeepSeek > Ollama
-        use_openrouter_env = os.getenv("USE_OPENROUTER")
-        self.use_openrouter = use_openrouter_env.lower()
-
-        if self.use_openrouter:
-            # Use OpenRouter cloud model ( FREE! )
-            if not OPENAI_AVAILABLE:
-                raise ValueError("OpenRouter support requested but openai library not available")
-
-            api_key = os.getenv("OPENROUTER_API_KEY")
-            if not api_key or api_key == "your_openrouter_api_key_here":
-                logger.warning("OpenRouter API key not set, falling back to Ollama")
-                self.use_openrouter = False
-            else:
-                base_url = os.getenv("OPENROUTER_BASE_URL")
-                self.api_key = api_key
-                self.base_url = base_url
-                self.model = os.getenv("OPENROUTER_MODEL")
-                self.provider = "OpenRouter"
-                logger.info(f"Initialized OpenRouter analyzer with model: {self.model}")
-                return
-
-        use_deepseek_env = os.getenv("USE_DEEPSEEK") or "false"
-        self.use_deepseek = use_deepseek_env.lower() == "true"
-
-        if self.use_deepseek:
-            # Use DeepSeek cloud model
-            if not OPENAI_AVAILABLE:
-                raise ValueError("DeepSeek support requested but openai library not available")
-
-            api_key = os.getenv("DEEPSEEK_API_KEY")
-            base_url = os.getenv("DEEPSEEK_BASE_URL")
-
-            if not api_key:
-                raise ValueError("DEEPSEEK_API_KEY not set in environment")
-
-            self.client = OpenAI(api_key=api_key, base_url=base_url)
-            self.model = os.getenv("DEEPSEEK_MODEL")
-            self.provider = "DeepSeek"
-            logger.info(f"Initialized DeepSeek analyzer with model: {self.model}")
-        else:
-            # Initialize Ollama as fallback
-            self.client = ollama.Client(host=host or os.getenv("OLLAMA_HOST"))
-            self.model = model or os.getenv("OLLAMA_MODEL")
-            self.provider = "Ollama"
-            logger.info(f"Initialized Ollama analyzer with model: {self.model}")
-
-    def setup_openrouter_if_needed(self):
-        """Initialize OpenRouter client if not already set up"""
-        if self.use_openrouter and not hasattr(self, 'client'):
-            self.client = OpenAI(api_key=self.api_key, base_url=self.base_url)
-        else:
-            # Use local Ollama model
-            self.client = ollama.Client(host=host or os.getenv("OLLAMA_HOST"))
-            self.model = model or os.getenv("OLLAMA_MODEL")
-            self.provider = "Ollama"
-            logger.info(f"Initialized Ollama analyzer with model: {self.model}")
-
-    def _chat_completion(self, messages: list) -> str:
-        """Unified method for getting completions from different providers."""
-        if self.use_openrouter:
-            # Initialize client if needed for OpenRouter
-            if not hasattr(self, 'client') or not self.client:
-                self.setup_openrouter_if_needed()
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=2048,
-                temperature=0.7
-            )
-            return response.choices[0].message.content
-        elif self.use_deepseek:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=2048,
-                temperature=0.7
-            )
-            return response.choices[0].message.content
-        else:
-            # Ollama fallback
-            response = self.client.chat(
-                model=self.model,
-                messages=messages
-            )
-            return response["message"]["content"]
+        """
+        model/host override OLLAMA_MODEL/OLLAMA_HOSTS for the Ollama provider.
+        Cloud providers are configured with USE_OPENROUTER/USE_DEEPSEEK and their *_MODEL variables.
+        """
+        # Stable system-message prefix (rendered once per context version) and its cache metrics
+        self.system_prompts = SystemPromptCache()
+        self.prefix_stats = PrefixCacheStats()
+
+        providers = self._build_providers(model, host)
+        self.router = LLMRouter(
+            providers,
+            hedge=_env_flag("LLM_HEDGE"),
+            hedge_min_delay=float(os.getenv("LLM_HEDGE_MIN_DELAY", 2.0)),
+        )
+
+        # Optional small fast model for simple factual questions (see complexity.py)
+        self.small_router = None
+        small_model = os.getenv("SMALL_LLM_MODEL")
+        if small_model:
+            pools = [provider.pool for provider in providers if isinstance(provider, OllamaProvider)]
+            self.small_router = LLMRouter([OllamaProvider(
+                pool=pools[0] if pools else create_ollama_pool_from_env(host),
+                model=small_model,
+                keep_alive=os.getenv("OLLAMA_KEEP_ALIVE") or None,
+                num_ctx=int(os.getenv("OLLAMA_NUM_CTX")) if os.getenv("OLLAMA_NUM_CTX") else None
+            )])
+            logger.info(f"Small model for simple questions: {small_model}")
+
+        # Primary provider (kept for logging and backward compatibility)
+        self.provider = providers[0].name
+        self.model = providers[0].model
+        logger.info(f"Initialized LLM router with providers: {providers}")
+
+    def _build_providers(self, model: str = None, host: str = None) -> List[LLMProvider]:
+        """
+        Build providers in priority order: OpenRouter > DeepSeek > Ollama,
+        or in the order given by LLM_PROVIDERS (e.g. "ollama,openrouter").
+        """
+        order = [name.strip().lower() for name in (os.getenv("LLM_PROVIDERS") or "").split(",") if name.strip()]
+        explicit = bool(order)
+        if not explicit:
+            order = ["openrouter", "deepseek", "ollama"]
+
+        providers = []
+        for name in order:
+            if name == "openrouter" and (explicit or _env_flag("USE_OPENROUTER")):
+                api_key = _api_key("OPENROUTER_API_KEY")
+                if not api_key:
+                    logger.warning("OpenRouter API key not set, skipping OpenRouter")
+                    continue
+                providers.append(OpenAICompatibleProvider(
+                    "OpenRouter", api_key,
+                    os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"),
+                    os.getenv("OPENROUTER_MODEL", "mistralai/mistral-7b-instruct:free"),
+                    request_timeout=float(os.getenv("LLM_REQUEST_TIMEOUT", 120))
+                ))
+            elif name == "deepseek" and (explicit or _env_flag("USE_DEEPSEEK")):
+                api_key = _api_key("DEEPSEEK_API_KEY")
+                if not api_key:
+                    logger.warning("DEEPSEEK_API_KEY not set, skipping DeepSeek")
+                    continue
+                providers.append(OpenAICompatibleProvider(
+                    "DeepSeek", api_key,
+                    os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com/v1"),
+                    os.getenv("DEEPSEEK_MODEL", "deepseek-chat"),
+                    request_timeout=float(os.getenv("LLM_REQUEST_TIMEOUT", 120))
+                ))
+            elif name == "ollama":
+                providers.append(OllamaProvider(
+                    # OLLAMA_HOSTS balances over several servers, OLLAMA_HOST is a single one
+                    pool=create_ollama_pool_from_env(host),
+                    model=model or os.getenv("OLLAMA_MODEL", "llama3.2:1b"),
+                    # Optional pinning so the model and its KV cache for the context prefix stay loaded
+                    keep_alive=os.getenv("OLLAMA_KEEP_ALIVE") or None,
+                    num_ctx=int(os.getenv("OLLAMA_NUM_CTX")) if os.getenv("OLLAMA_NUM_CTX") else None
+                ))
+            elif name not in ("openrouter", "deepseek"):
+                logger.warning(f"Unknown LLM provider in LLM_PROVIDERS: {name}")
+
+        if not providers:
+            raise ValueError("No LLM provider configured (check LLM_PROVIDERS and API keys)")
+        return providers
+
+    def _chat_completion(self, messages: list, prefix_key: Optional[str] = None, router: Optional[LLMRouter] = None,
+                         deadline: Optional[Deadline] = None) -> str:
+        """Unified method for getting completions: routed to the fastest healthy provider with failover."""
+        result = (router or self.router).complete(messages, deadline=deadline)
+        self.prefix_stats.record(
+            prefix_key,
+            prompt_eval_ms=result.get("prompt_eval_ms"),
+            prompt_tokens=result.get("prompt_tokens"),
+            cached_tokens=result.get("cached_tokens"),
+        )
+        return result["content"]
 
     def analyze_key_rate(self, data_text: str, news_data: str = "", economic_data: str = "") -> Optional[str]:
         """Analyze the key interest rate using LLM (Russian)."""
@@ -134,8 +146,9 @@ class LLMAnalyzer:
             logger.error(f"Error predicting rate change: {e}")
             return None
 
-    def predict_next_meeting_rate(self, data_text: str, next_meeting_date: str, upcoming_dates: list, historical_decisions: str) -> Optional[str]:
-        """Predict the key rate after the next CBR meeting (Russian)."""
+    def predict_next_meeting_rate(self, data_text: str, next_meeting_date: str, upcoming_dates: list, historical_decisions: str,
+                                  raise_errors: bool = False) -> Optional[str]:
+        """Predict the key rate after the next CBR meeting (Russian); raise_errors passes provider failures on (backtest)."""
         try:
             prompt = NEXT_MEETING_PREDICTION_PROMPT_RU.format(
                 next_meeting_date=next_meeting_date,
@@ -147,6 +160,8 @@ class LLMAnalyzer:
             logger.info("Next meeting rate prediction completed")
             return prediction
         except Exception as e:
+            if raise_errors:
+                raise
             logger.error(f"Error predicting next meeting rate: {e}")
             return None
 
@@ -210,25 +225,66 @@ class LLMAnalyzer:
             logger.error(f"Error answering question with full context: {e}")
             return None
 
-    def answer_with_system_context(self, system_context: str, user_question: str) -> Optional[str]:
-        """Answer user's question using system context (efficient approach)."""
+    def answer_with_system_context(self, system_context: str, user_question: str, context_version: Optional[str] = None,
+                                   fast: bool = False, deadline: Optional[Deadline] = None,
+                                   passages: Optional[str] = None) -> Optional[str]:
+        """Answer user's question using system context (efficient approach).
+
+        The context goes into a byte-identical system message rendered once per
+        context version, the question is appended last, so providers can reuse
+        their prompt/KV cache for the prefix. fast=True uses the small model
+        (SMALL_LLM_MODEL) when it is configured, falling back to the main
+        router when the small model is unavailable or fails. passages
+        (retrieved context fragments) go into the question message, so the
+        prefix stays cacheable.
+        Raises DeadlineExceeded when the
+        request deadline passes or the generation is cancelled.
+        """
         try:
-            # Use simple question prompt with system context
-            prompt = SYSTEM_QA_PROMPT_RU.format(
-                system_context=system_context,
-                user_question=user_question
-            )
+            system_prompt = self.system_prompts.render(system_context, context_version)
+            if passages:
+                question_prompt = SYSTEM_QA_PASSAGES_PROMPT_RU.format(passages=passages, user_question=user_question)
+            else:
+                question_prompt = SYSTEM_QA_QUESTION_PROMPT_RU.format(user_question=user_question)
 
             # Save prompt to file if enabled
-            self._save_prompt_if_enabled(prompt, "system_context")
-
-            answer = self._chat_completion([{"role": "user", "content": prompt}])
+            self._save_prompt_if_enabled(system_prompt + "\n" + question_prompt, "system_context")
+
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": question_prompt},
+            ]
+            prefix_key = context_version or str(hash(system_prompt))
+            small = self.small_router if fast and self.small_router is not None and self.small_router.available() else None
+            answer = None
+            if small is not None:
+                try:
+                    answer = self._chat_completion(messages, prefix_key=prefix_key, router=small, deadline=deadline)
+                except DeadlineExceeded:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Small model failed, falling back to the main model: {e}")
+            if not answer:
+                # Small model not configured, cooling down, failed or empty: the main router answers
+                answer = self._chat_completion(messages, prefix_key=prefix_key, deadline=deadline)
             logger.info("Question answered using system context")
             return answer
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error answering with system context: {e}")
             return None
 
+    def summarize_news(self, text: str, kind: str = "post") -> Optional[str]:
+        """Summary of a channel post or of a day/week of summaries (the small model if configured)."""
+        try:
+            what, length = NEWS_SUMMARY_KINDS_RU[kind]
+            prompt = NEWS_SUMMARY_PROMPT_RU.format(what=what, length=length, text=text)
+            return self._chat_completion([{"role": "user", "content": prompt}], router=self.small_router)
+        except Exception as e:
+            logger.error(f"Error summarizing news ({kind}): {e}")
+            return None
+
     def _save_prompt_if_enabled(self, prompt: str, prompt_type: str = "unknown"):
         """Save prompt to file if SAVE_PROMPTS environment variable is set."""
         import os
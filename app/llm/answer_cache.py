@@ -0,0 +1,139 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+from dotenv import load_dotenv
+from app.data.cache import DataCache
+from app.utils.logger import setup_logger
+
+load_dotenv()
+logger = setup_logger(__name__)
+
+
+def normalize_question(question: str) -> str:
+    """Normalize question text so trivially different phrasings share a cache key."""
+    text = question.lower().replace("ё", "е")
+    text = re.sub(r"[^\w%.,]+", " ", text)
+    text = re.sub(r"[.,]+(\s|$)", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class AnswerCache:
+    """
+    Кэш ответов LLM, привязанный к версии системного контекста.
+
+    Ключ = нормализованный вопрос + хэш контекста. При публикации новой версии
+    контекста все записи старых версий удаляются из памяти.
+    """
+
+    def __init__(self, maxsize: int = 1000, persist: bool = False, ttl: int = 86400):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bypass_chats = set()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        # Optional persisted tier (survives restarts while the context version stays the same)
+        self.persistent = DataCache(maxsize=maxsize, ttl=ttl, cache_dir="answers") if persist else None
+
+    def _key(self, question: str, context_version: str) -> tuple:
+        return (context_version, normalize_question(question))
+
+    def get(self, question: str, context_version: str, chat_id: Optional[int] = None) -> Optional[str]:
+        """Return a cached answer or None (also None for bypassed chats)."""
+        if context_version is None:
+            return None
+        if chat_id is not None and chat_id in self._bypass_chats:
+            with self._lock:
+                self.bypassed += 1
+            return None
+
+        key = self._key(question, context_version)
+        with self._lock:
+            answer = self._entries.get(key)
+            if answer is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return answer
+
+        if self.persistent is not None:
+            answer = self.persistent.get({"type": "llm_answer", "version": key[0], "question": key[1]})
+            if answer is not None:
+                with self._lock:
+                    self._store(key, answer)
+                    self.hits += 1
+                return answer
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def contains(self, question: str, context_version: str) -> bool:
+        """Check the in-memory tier without touching hit-rate metrics."""
+        with self._lock:
+            return self._key(question, context_version) in self._entries
+
+    def set(self, question: str, context_version: str, answer: str) -> None:
+        """Store an answer for the given context version."""
+        if context_version is None or not answer:
+            return
+
+        key = self._key(question, context_version)
+        with self._lock:
+            self._store(key, answer)
+
+        if self.persistent is not None:
+            self.persistent.set({"type": "llm_answer", "version": key[0], "question": key[1]}, answer)
+
+    def _store(self, key: tuple, answer: str) -> None:
+        self._entries[key] = answer
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, current_version: Optional[str] = None) -> None:
+        """Drop entries that do not belong to current_version (all entries if None)."""
+        with self._lock:
+            stale = [key for key in self._entries if key[0] != current_version]
+            for key in stale:
+                del self._entries[key]
+        logger.info(f"Answer cache invalidated: {len(stale)} entries dropped (version {current_version})")
+
+    def set_bypass(self, chat_id: int, enabled: bool = True) -> None:
+        """Enable or disable cache bypass for a chat."""
+        if enabled:
+            self._bypass_chats.add(chat_id)
+        else:
+            self._bypass_chats.discard(chat_id)
+
+    def is_bypassed(self, chat_id: int) -> bool:
+        return chat_id in self._bypass_chats
+
+    def stats(self) -> Dict:
+        """Hit-rate metrics."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "persistent": self.persistent is not None,
+            }
+
+
+def create_answer_cache_from_env() -> AnswerCache:
+    """Build the answer cache from ANSWER_CACHE_* environment variables."""
+    persist = (os.getenv("ANSWER_CACHE_PERSIST") or "false").lower() in ("true", "1", "yes", "on")
+    cache = AnswerCache(
+        maxsize=int(os.getenv("ANSWER_CACHE_SIZE", 1000)),
+        persist=persist,
+        ttl=int(os.getenv("ANSWER_CACHE_TTL", 86400)),
+    )
+    for chat_id in (os.getenv("ANSWER_CACHE_BYPASS_CHATS") or "").split(","):
+        if chat_id.strip():
+            cache.set_bypass(int(chat_id.strip()))
+    return cache
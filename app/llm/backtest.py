@@ -0,0 +1,284 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+from app.context_sections import ContextData
+from app.data.forecast import BaselineForecaster, compact_report_context, recent_decisions
+from app.data.meetings import CALENDAR_MARKER, NUMERIC_DATE
+from app.llm.prompts import NEXT_MEETING_PREDICTION_PROMPT_RU
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Решение вступает в силу со следующего рабочего дня после заседания
+DECISION_EFFECTIVE_DAYS = 4
+
+_YEAR_LINE = re.compile(r"^- (\d{4}):")
+_PREDICTED_RATE = re.compile(r"Прогнозная ставка[^:\n]*:\s*\**\s*(\d+(?:[.,]\d+)?)\s*%")
+
+# provider(data_text, next_meeting_date, upcoming_dates, historical_decisions) -> answer text
+Provider = Callable[[str, str, List[str], str], Optional[str]]
+
+# history(moment) -> (context, version, ContextData) rebuilt from the stored source inputs; None without history
+History = Callable[[datetime], Optional[Tuple[str, str, ContextData]]]
+
+
+def context_as_of(system_context: str, day: date, data: Optional[ContextData] = None) -> str:
+    """
+    The current context cut back to how it could have looked before `day`
+    (fallback when the snapshot store has no inputs that old): dated list lines
+    (rate changes, news, yearly inflation/GDP) from `day` on are dropped, the
+    current-rate line and the calendar are recomputed for that day.
+    """
+    data = data or ContextData.from_context(system_context)
+    series, calendar = data.key_rates, data.calendar
+    lines = []
+    skip_timestamp = in_calendar = False
+    for line in system_context.splitlines():
+        if skip_timestamp:
+            skip_timestamp = False
+            lines.append(f"{day.isoformat()} (МСК, UTC+3)")
+            continue
+        if in_calendar:
+            if line.strip():
+                continue  # replaced by the calendar rendered for that day
+            in_calendar = False
+        if line.startswith("=== ТЕКУЩАЯ ДАТА"):  # also "... И ВРЕМЯ ===" of older stored contexts
+            skip_timestamp = True
+        elif line.startswith(CALENDAR_MARKER):
+            in_calendar = True
+            lines.append(line)
+            lines.extend(calendar.render(day).splitlines())
+            continue
+        elif line.startswith("ТЕКУЩАЯ СТАВКА:"):
+            found = series.as_of(day - timedelta(days=1))
+            if found:
+                lines.append(f"ТЕКУЩАЯ СТАВКА: {found[1]:.2f}% ({found[0].strftime('%d.%m.%Y')})")
+            continue
+        elif line.startswith("- "):
+            year = _YEAR_LINE.match(line)
+            if year and int(year.group(1)) >= day.year:
+                continue
+            dated = NUMERIC_DATE.search(line[:24])
+            if dated:
+                try:
+                    if date(int(dated.group(3)), int(dated.group(2)), int(dated.group(1))) >= day:
+                        continue
+                except ValueError:
+                    pass
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def parse_predicted_rate(answer: Optional[str]) -> Optional[float]:
+    """Rate from '1. Прогнозная ставка после заседания: 16%'; None (unparsed) for any other answer."""
+    if not answer:
+        return None
+    match = _PREDICTED_RATE.search(answer)
+    return float(match.group(1).replace(",", ".")) if match else None
+
+
+def decision(before: float, after: float) -> str:
+    if after > before:
+        return "hike"
+    if after < before:
+        return "cut"
+    return "hold"
+
+
+def replay_meetings(system_context: str, since: Optional[date] = None, until: Optional[date] = None,
+                    today: Optional[date] = None, data: Optional[ContextData] = None) -> List[Dict]:
+    """
+    Past meetings with the realized decision: every date of the full calendar
+    (the structured data of the context), otherwise the rate change dates
+    (changes only, so hold decisions are missed).
+    """
+    data = data or ContextData.from_context(system_context)
+    series, calendar = data.key_rates, data.calendar
+    if len(series) < 2:
+        return []
+    today = today or date.today()
+    if calendar.dates:
+        days = [day for day in calendar.dates if day + timedelta(days=DECISION_EFFECTIVE_DAYS) <= today]
+        effective = DECISION_EFFECTIVE_DAYS
+    else:
+        logger.warning("No meeting calendar: replaying rate change dates only, hold decisions are missed")
+        days = series.dates[1:]
+        effective = 0
+
+    meetings = []
+    for day in days:
+        if (since and day < since) or (until and day > until):
+            continue
+        before = series.as_of(day - timedelta(days=1))
+        after = series.as_of(day + timedelta(days=effective))
+        if before is None or after is None:
+            continue
+        meetings.append({"date": day, "rate_before": before[1], "rate_after": after[1]})
+    return meetings
+
+
+class BacktestRunner:
+    """
+    Прогон прогноза predict_next_meeting_rate по прошлым заседаниям ЦБ.
+
+    Для каждого заседания контекст собирается из исходных данных, сохраненных
+    до заседания (history, хранилище снимков), а если их нет — из текущего
+    контекста с отброшенными более поздними данными. Промпт собирается так же,
+    как для отчета (базовая модель + сокращенный контекст), предстоящие
+    заседания берутся из полного календаря, запросы к провайдеру идут
+    параллельно. Результаты пишутся в JSONL по ключу (провайдер, модель и его
+    настройки, шаблон промпта, входные данные): повторный запуск пропускает
+    готовые прогоны, а прерванный продолжается с места остановки.
+    """
+
+    def __init__(self, provider: Provider, provider_name: str, results_path: str, workers: int = 4,
+                 provider_config=None, history: Optional[History] = None):
+        self.provider = provider
+        self.provider_name = provider_name
+        self.provider_config = provider_config
+        self.history = history
+        self.results_path = results_path
+        self.workers = max(1, workers)
+        self._lock = threading.Lock()
+        self._results: Dict[str, Dict] = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        results = {}
+        if os.path.exists(self.results_path):
+            with open(self.results_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        results[record["key"]] = record
+                    except (json.JSONDecodeError, KeyError):
+                        continue  # a line cut short by an interrupted run
+        return results
+
+    def _append(self, record: Dict) -> None:
+        with self._lock:
+            self._results[record["key"]] = record
+            os.makedirs(os.path.dirname(self.results_path) or ".", exist_ok=True)
+            with open(self.results_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _as_of(self, system_context: str, day: date, data: ContextData) -> Tuple[str, ContextData, str]:
+        """(context, data, how it was built) as of the start of the meeting day."""
+        rebuilt = self.history(datetime.combine(day, datetime.min.time())) if self.history else None
+        if rebuilt is not None and len(rebuilt[2].key_rates):
+            return rebuilt[0], rebuilt[2], "history"
+        as_of = context_as_of(system_context, day, data)
+        return as_of, ContextData.from_context(as_of), "trimmed"
+
+    def prepare(self, system_context: str, meeting: Dict, data: Optional[ContextData] = None) -> Dict:
+        """Prompt inputs for one meeting, as the report would have built them before it."""
+        data = data or ContextData.from_context(system_context)
+        day = meeting["date"]
+        as_of, as_of_data, source = self._as_of(system_context, day, data)
+        forecast = BaselineForecaster().compute(as_of, day - timedelta(days=1), as_of_data)
+        inputs = {
+            "data_text": compact_report_context(as_of, forecast, as_of_data),
+            "next_meeting_date": day.strftime("%d.%m.%Y"),
+            "upcoming_dates": data.calendar.as_dict(day)["upcoming"],
+            "historical_decisions": recent_decisions(as_of_data.key_rates),
+        }
+        digest = hashlib.sha256(json.dumps(
+            [self.provider_name, self.provider_config, NEXT_MEETING_PREDICTION_PROMPT_RU, inputs],
+            ensure_ascii=False, sort_keys=True
+        ).encode("utf-8")).hexdigest()[:16]
+        return {"key": digest, "inputs": inputs, "forecast": forecast, "context": source}
+
+    def _run_one(self, key: str, meeting: Dict, inputs: Dict, source: str) -> Dict:
+        started = time.monotonic()
+        try:
+            answer = self.provider(inputs["data_text"], inputs["next_meeting_date"], inputs["upcoming_dates"],
+                                   inputs["historical_decisions"])
+            # No answer at all is a failed run (retried on resume), not an unparsed prediction
+            error = None if answer and answer.strip() else "empty answer"
+        except Exception as e:
+            answer, error = None, str(e)
+        predicted = parse_predicted_rate(answer)
+        record = {
+            "key": key,
+            "provider": self.provider_name,
+            "date": meeting["date"].isoformat(),
+            "context": source,
+            "rate_before": meeting["rate_before"],
+            "rate_after": meeting["rate_after"],
+            "predicted_rate": predicted,
+            "latency_s": round(time.monotonic() - started, 3),
+            "error": error,
+        }
+        self._append(record)
+        return record
+
+    def run(self, system_context: str, meetings: List[Dict], data: Optional[ContextData] = None) -> Dict:
+        """Replay the meetings; returns the score and throughput report."""
+        started = time.monotonic()
+        data = data or ContextData.from_context(system_context)
+        records, pending = [], []
+        for meeting in meetings:
+            prepared = self.prepare(system_context, meeting, data)
+            cached = self._results.get(prepared["key"])
+            if cached is not None and cached.get("error") is None:
+                records.append(cached)
+            else:
+                pending.append((prepared["key"], meeting, prepared["inputs"], prepared["context"]))
+
+        logger.info(f"Backtest: {len(meetings)} meetings, {len(records)} cached, {len(pending)} to run "
+                    f"with {self.workers} workers")
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(self._run_one, *job) for job in pending]
+            for done, future in enumerate(as_completed(futures), 1):
+                records.append(future.result())
+                if done % 10 == 0:
+                    logger.info(f"Backtest progress: {done}/{len(pending)}")
+
+        return self.report(records, cached=len(meetings) - len(pending), elapsed=time.monotonic() - started)
+
+    @staticmethod
+    def report(records: List[Dict], cached: int = 0, elapsed: float = 0.0) -> Dict:
+        scored = [r for r in records if r["predicted_rate"] is not None]
+        errors = [abs(r["predicted_rate"] - r["rate_after"]) for r in scored]
+        direction_hits = sum(
+            decision(r["rate_before"], r["predicted_rate"]) == decision(r["rate_before"], r["rate_after"]) for r in scored
+        )
+        latencies = sorted(r["latency_s"] for r in records if r.get("error") is None)
+        run = len(records) - cached
+        return {
+            "meetings": len(records),
+            "cached": cached,
+            "run": run,
+            "errors": sum(r.get("error") is not None for r in records),
+            "unparsed": sum(r.get("error") is None and r["predicted_rate"] is None for r in records),
+            "from_history": sum(r.get("context") == "history" for r in records),
+            "mae_pp": round(sum(errors) / len(errors), 3) if errors else None,
+            "exact": sum(error < 0.01 for error in errors),
+            "direction_accuracy": round(direction_hits / len(scored), 3) if scored else None,
+            "elapsed_s": round(elapsed, 2),
+            "runs_per_s": round(run / elapsed, 2) if elapsed > 0 and run else None,
+            "latency_p50_s": latencies[len(latencies) // 2] if latencies else None,
+            "latency_p95_s": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else None,
+        }
+
+
+def hold_provider(data_text: str, next_meeting_date: str, upcoming_dates: List[str], historical_decisions: str) -> str:
+    """Local stub: the rate stays where it is (the persistence baseline)."""
+    rate = float(re.search(r"Ключевая ставка: (\d+(?:\.\d+)?)%", data_text).group(1))
+    return f"1. Прогнозная ставка после заседания: {rate:.2f}%\n2. Вероятность изменений: стабильность"
+
+
+def baseline_provider(data_text: str, next_meeting_date: str, upcoming_dates: List[str], historical_decisions: str) -> str:
+    """Local stub: the most likely decision of the baseline model, rounded to 0.25 p.p."""
+    rate = float(re.search(r"Ключевая ставка: (\d+(?:\.\d+)?)%", data_text).group(1))
+    p = {name: float(value) / 100 for name, value in
+         re.findall(r"(повышение|сохранение|снижение) (\d+)%", data_text)}
+    expected = float(re.search(r"ожидаемая ставка (\d+(?:\.\d+)?)%", data_text).group(1))
+    if max(p, key=p.get, default="сохранение") != "сохранение":
+        rate = round(expected * 4) / 4
+    return f"1. Прогнозная ставка после заседания: {rate:.2f}%"
@@ -0,0 +1,128 @@
+import os
+import re
+import threading
+from collections import deque
+from typing import Dict, Optional, Tuple
+from dotenv import load_dotenv
+from app.context_sections import ContextData
+from app.utils.logger import setup_logger
+
+load_dotenv()
+logger = setup_logger(__name__)
+
+SIMPLE = "simple"
+ANALYTICAL = "analytical"
+
+# Маркеры вопросов, требующих рассуждения (прогнозы, причины, сравнения)
+ANALYTICAL_PATTERNS = [
+    r"прогноз", r"спрогноз", r"предскаж", r"ожида", r"будет", r"изменит",
+    r"почему", r"объясн", r"анализ", r"проанализ", r"сравн", r"влия", r"повлия",
+    r"с уч[её]том", r"сценари", r"риск", r"оцени", r"стоит ли", r"перспектив", r"причин",
+]
+
+# Маркеры коротких фактических вопросов
+SIMPLE_PATTERNS = [
+    r"^(какая|какой|какое|какие|когда|сколько|где|кто)\b", r"текущ", r"сейчас", r"дата", r"последн",
+]
+
+MAX_SIMPLE_WORDS = 12
+
+
+def classify_question(question: str) -> Tuple[str, str]:
+    """Rule-based complexity classifier: returns (route, reason)."""
+    text = question.lower().replace("ё", "е").strip()
+
+    for pattern in ANALYTICAL_PATTERNS:
+        if re.search(pattern, text):
+            return ANALYTICAL, f"analytical marker '{pattern}'"
+
+    words = len(text.split())
+    if words > MAX_SIMPLE_WORDS:
+        return ANALYTICAL, f"long question ({words} words)"
+
+    for pattern in SIMPLE_PATTERNS:
+        if re.search(pattern, text):
+            return SIMPLE, f"factual marker '{pattern}'"
+
+    return ANALYTICAL, "no factual marker"
+
+
+def trim_context(system_context: str, max_chars: int = 12000, news_lines: int = 15,
+                 data: Optional[ContextData] = None) -> str:
+    """
+    Trimmed context for simple factual questions: date header, historical
+    economic data (key rates, inflation, GDP, meetings) and the most recent news lines.
+    Deterministic, so the same context always gives a byte-identical result.
+    """
+    data = data or ContextData.from_context(system_context)
+    header = data.section(system_context, "header").strip()
+
+    history = ""
+    spans = [data.spans[name] for name in ("key_rates", "inflation", "gdp", "meetings") if name in data.spans]
+    if spans:
+        history = system_context[spans[0][0]:spans[-1][1]].strip()
+
+    news = [line for line in data.section(system_context, "news").splitlines() if line.startswith("- ")]
+    # Telegram posts are in chronological order: the latest ones are at the end
+    recent_news = "\n".join(news[-news_lines:])
+
+    parts = [part for part in (header, history, f"ПОСЛЕДНИЕ НОВОСТИ (сокращено):\n{recent_news}" if recent_news else "") if part]
+    trimmed = "\n\n".join(parts)
+    return trimmed[:max_chars]
+
+
+class ComplexityRouter:
+    """
+    Выбирает маршрут для вопроса: простые фактические вопросы идут в маленькую
+    быструю модель с сокращенным контекстом, аналитические — в основную модель
+    с полным контекстом. Решения и задержки по маршрутам логируются.
+    """
+
+    def __init__(self, enabled: bool = True, simple_context_chars: int = 12000):
+        self.enabled = enabled
+        self.simple_context_chars = simple_context_chars
+        self._trimmed = {}
+        self._lock = threading.Lock()
+        self._latencies = {SIMPLE: deque(maxlen=200), ANALYTICAL: deque(maxlen=200)}
+        self._counts = {SIMPLE: 0, ANALYTICAL: 0}
+
+    def route(self, question: str) -> str:
+        if not self.enabled:
+            return ANALYTICAL
+        route, reason = classify_question(question)
+        logger.info(f"Routing question to '{route}' ({reason})")
+        return route
+
+    def simple_context(self, system_context: str, context_version: str, data: Optional[ContextData] = None) -> str:
+        """Trimmed context, computed once per context version."""
+        with self._lock:
+            trimmed = self._trimmed.get(context_version)
+            if trimmed is None:
+                trimmed = trim_context(system_context, self.simple_context_chars, data=data)
+                self._trimmed = {context_version: trimmed}
+            return trimmed
+
+    def record(self, route: str, latency: float) -> None:
+        with self._lock:
+            self._counts[route] += 1
+            self._latencies[route].append(latency)
+        logger.info(f"Route '{route}' answered in {latency:.2f}s")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            result = {}
+            for route, latencies in self._latencies.items():
+                ordered = sorted(latencies)
+                result[route] = {
+                    "requests": self._counts[route],
+                    "p50_s": round(ordered[len(ordered) // 2], 3) if ordered else None,
+                    "p95_s": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 3) if ordered else None,
+                }
+            return result
+
+
+def create_complexity_router_from_env() -> ComplexityRouter:
+    return ComplexityRouter(
+        enabled=(os.getenv("COMPLEXITY_ROUTING") or "true").lower() in ("true", "1", "yes", "on"),
+        simple_context_chars=int(os.getenv("SIMPLE_CONTEXT_CHARS", 12000)),
+    )
@@ -0,0 +1,159 @@
+import os
+import re
+import threading
+from datetime import date
+from typing import Dict, Optional
+from dotenv import load_dotenv
+from app.context_sections import ContextData
+from app.data.key_rates import KeyRateSeries
+from app.data.meetings import MONTHS, NUMERIC_DATE, TEXT_DATE, MeetingCalendar
+from app.llm.complexity import ANALYTICAL_PATTERNS
+from app.utils.logger import setup_logger
+
+load_dotenv()
+logger = setup_logger(__name__)
+
+_ISO_DATE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+
+# Вопросы о других ставках и показателях оставляем LLM
+OTHER_TOPICS = [r"ипотек", r"депозит", r"вклад", r"кредит", r"инфляц", r"ввп", r"фрс", r"ецб", r"доходност"]
+CURRENT_MARKERS = [r"текущ", r"сейчас", r"сегодня", r"действующ", r"на данный момент"]
+# "когда следующее заседание?" — но не "какое решение примут на следующем заседании"
+MEETING_WHEN = [r"когда", r"дата", r"дату", r"какого числа"]
+MEETING_NEXT = [r"следующ", r"ближайш", r"очередн", r"предстоящ"]
+MEETING_SCHEDULE = [r"график", r"календар", r"расписани"]
+MEETING_EXCLUDE = [r"прогноз", r"ожида", r"почему", r"решени", r"повыс", r"сниз", r"сохран", r"измен", r"будет ставк"]
+_PLAIN_CURRENT = re.compile(r"^(какая|какой|каков[ао]?)\s+(ключевая\s+)?ставка(\s+(цб|цб рф|банка россии))?\??$")
+
+MAX_WORDS = 15
+
+
+def find_date(text: str) -> Optional[date]:
+    """Exact date mentioned in the question ("1 марта 2024", "01.03.2024", "2024-03-01")."""
+    try:
+        match = TEXT_DATE.search(text)
+        if match:
+            return date(int(match.group(3)), MONTHS[match.group(2)], int(match.group(1)))
+        match = NUMERIC_DATE.search(text)
+        if match:
+            return date(int(match.group(3)), int(match.group(2)), int(match.group(1)))
+        match = _ISO_DATE.search(text)
+        if match:
+            return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    except ValueError:
+        return None
+    return None
+
+
+class DirectAnswerEngine:
+    """
+    Ответы без LLM на фактические вопросы о ключевой ставке
+    ("какая текущая ключевая ставка?", "какая ставка была 1 марта 2024?")
+    и о заседаниях ЦБ ("когда следующее заседание?").
+
+    Ряд ставок и календарь заседаний берутся из структурированных данных
+    версии контекста, ответ — бинарный поиск по датам. Все, в чем нет уверенности (прогнозы,
+    другие ставки, неполные даты, даты вне ряда), возвращает None и уходит в LLM.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._version = None
+        self._series = KeyRateSeries()
+        self._calendar = MeetingCalendar()
+        self.hits = 0
+        self.misses = 0
+
+    def _parse(self, system_context: str, version: str, data: Optional[ContextData] = None) -> None:
+        with self._lock:
+            if version != self._version:
+                data = data or ContextData.from_context(system_context)
+                self._series = data.key_rates
+                self._calendar = data.calendar
+                self._version = version
+                logger.info(f"Direct answer data for version {version}: {len(self._series)} rate changes, "
+                            f"{len(self._calendar)} meeting dates")
+
+    def series(self, system_context: str, version: str) -> KeyRateSeries:
+        self._parse(system_context, version)
+        return self._series
+
+    def calendar(self, system_context: str, version: str) -> MeetingCalendar:
+        self._parse(system_context, version)
+        return self._calendar
+
+    def answer(self, question: str, system_context: str, version: str, today: Optional[date] = None,
+               data: Optional[ContextData] = None) -> Optional[str]:
+        """Direct answer, or None if the question should go to the LLM."""
+        if not self.enabled:
+            return None
+        self._parse(system_context, version, data)
+        result = self._answer(question.lower().replace("ё", "е").strip(), system_context, version,
+                              today or date.today())
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            logger.info("Answered factual question directly, without the LLM")
+        return result
+
+    def _answer(self, text: str, system_context: str, version: str, today: date) -> Optional[str]:
+        if "заседан" in text:
+            return self._answer_meeting(text, system_context, version, today)
+        return self._answer_rate(text, system_context, version, today)
+
+    def _answer_meeting(self, text: str, system_context: str, version: str, today: date) -> Optional[str]:
+        if len(text.split()) > MAX_WORDS or any(re.search(p, text) for p in MEETING_EXCLUDE):
+            return None
+        schedule = any(re.search(p, text) for p in MEETING_SCHEDULE)
+        when_next = any(re.search(p, text) for p in MEETING_WHEN) and any(re.search(p, text) for p in MEETING_NEXT)
+        if not (schedule or when_next):
+            return None
+
+        calendar = self.calendar(system_context, version)
+        upcoming = calendar.upcoming(today)
+        if not upcoming:
+            return None
+        dates = [day.strftime("%d.%m.%Y") for day in upcoming]
+        if schedule:
+            return "Предстоящие заседания Совета директоров Банка России по ключевой ставке: " + ", ".join(dates) + "."
+        answer = f"Следующее заседание Совета директоров Банка России по ключевой ставке — {dates[0]}."
+        if len(dates) > 1:
+            answer += f" Далее: {', '.join(dates[1:4])}."
+        return answer
+
+    def _answer_rate(self, text: str, system_context: str, version: str, today: date) -> Optional[str]:
+        if "ставк" not in text or len(text.split()) > MAX_WORDS:
+            return None
+        if any(re.search(pattern, text) for pattern in ANALYTICAL_PATTERNS + OTHER_TOPICS):
+            return None
+
+        day = find_date(text)
+        if day is None and not (any(re.search(p, text) for p in CURRENT_MARKERS) or _PLAIN_CURRENT.match(text)):
+            return None
+
+        series = self.series(system_context, version)
+        if not series:
+            return None
+
+        if day is None:
+            changed_at, rate = series.latest()
+            return (f"Текущая ключевая ставка Банка России — {rate:.2f}% "
+                    f"(действует с {changed_at.strftime('%d.%m.%Y')}).")
+
+        if day > today:
+            return None  # future date: a forecast, not a fact
+        found = series.as_of(day)
+        if found is None:
+            return None
+        changed_at, rate = found
+        return (f"Ключевая ставка Банка России на {day.strftime('%d.%m.%Y')} составляла {rate:.2f}% "
+                f"(установлена с {changed_at.strftime('%d.%m.%Y')}).")
+
+    def stats(self) -> Dict:
+        return {"enabled": self.enabled, "hits": self.hits, "fell_through": self.misses, "data_version": self._version}
+
+
+def create_direct_answer_engine_from_env() -> DirectAnswerEngine:
+    return DirectAnswerEngine(enabled=(os.getenv("DIRECT_ANSWERS_ENABLED") or "true").lower() in ("true", "1", "yes", "on"))
@@ -0,0 +1,220 @@
+import itertools
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class NoHealthyOllamaHostError(ConnectionError):
+    """No Ollama host is available for the requested model."""
+
+
+class OllamaHost:
+    """One Ollama endpoint with its load and health state."""
+
+    def __init__(self, url: str, health_timeout: float = 5.0, request_timeout: float = 120.0):
+        self.url = url
+        self.health_timeout = health_timeout
+        self.request_timeout = request_timeout
+        self._client = None
+        self._health_client = None
+        self._transport = None
+        self._client_lock = threading.Lock()
+        self.outstanding = 0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.completed = 0
+
+    def _make_clients(self) -> None:
+        # ollama (and httpx) is imported on first use, not at startup
+        import httpx
+        import ollama
+        with self._client_lock:
+            if self._client is None:
+                # One connection pool for the default client and the per-request ones (client_for)
+                self._transport = httpx.HTTPTransport()
+                # Read timeout between streamed chunks: a hung server fails instead of holding a worker forever
+                self._client = ollama.Client(host=self.url, timeout=self.request_timeout, transport=self._transport)
+                self._health_client = ollama.Client(host=self.url, timeout=self.health_timeout)
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._make_clients()
+        return self._client
+
+    def client_for(self, timeout: Optional[float]):
+        """
+        Client whose read timeout is at most `timeout` (the rest of the request
+        deadline): the wait for the first chunk (prompt eval) is bounded by it too.
+        Shares the connection pool of the default client and is not closed on its own.
+        """
+        client = self.client
+        if timeout is None or timeout >= self.request_timeout or self._transport is None:
+            return client
+        import ollama
+        return ollama.Client(host=self.url, timeout=max(timeout, 0.001), transport=self._transport)
+
+    @property
+    def health_client(self):
+        if self._health_client is None:
+            self._make_clients()
+        return self._health_client
+
+    def snapshot(self) -> Dict:
+        return {
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "completed": self.completed,
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+
+class OllamaPool:
+    """
+    Пул серверов Ollama с балансировкой по наименьшему числу активных запросов.
+
+    Хосты с ошибками исключаются из пула и возвращаются после успешной
+    проверки здоровья. Для модели можно задать affinity — список хостов,
+    на которых она должна оставаться загруженной.
+    """
+
+    def __init__(self, urls: List[str], affinity: Optional[Dict[str, List[str]]] = None,
+                 failure_threshold: int = 2, health_interval: float = 15.0, request_timeout: float = 120.0):
+        if not urls:
+            raise ValueError("OllamaPool needs at least one host")
+        self.hosts = [OllamaHost(url.rstrip("/"), request_timeout=request_timeout) for url in urls]
+        self.affinity = {model: [url.rstrip("/") for url in model_urls] for model, model_urls in (affinity or {}).items()}
+        self.failure_threshold = failure_threshold
+        self.health_interval = health_interval
+        self._lock = threading.Lock()
+        self._tiebreak = itertools.count()
+        self._health_thread = None
+
+    def _candidates(self, model: str) -> List[OllamaHost]:
+        healthy = [host for host in self.hosts if host.healthy]
+        preferred = self.affinity.get(model)
+        if preferred:
+            pinned = [host for host in healthy if host.url in preferred]
+            if pinned:
+                return pinned
+        return healthy
+
+    def acquire(self, model: str) -> OllamaHost:
+        """Pick the host with the least outstanding requests for this model."""
+        self.start_health_checks()
+        host = self._pick(model)
+        if host is None:
+            # Everything is evicted: probe right away instead of waiting for the next health check
+            self.check_health()
+            host = self._pick(model)
+        if host is None:
+            raise NoHealthyOllamaHostError(f"No healthy Ollama host for model {model}")
+        return host
+
+    def acquire_host(self, host: OllamaHost) -> OllamaHost:
+        """Count a request against a specific host (warm-up of every host); pair with release()."""
+        with self._lock:
+            host.outstanding += 1
+        return host
+
+    def _pick(self, model: str) -> Optional[OllamaHost]:
+        with self._lock:
+            candidates = self._candidates(model)
+            if not candidates:
+                return None
+            # Rotate the start so equally loaded hosts share requests
+            offset = next(self._tiebreak) % len(candidates)
+            rotated = candidates[offset:] + candidates[:offset]
+            host = min(rotated, key=lambda h: h.outstanding)
+            host.outstanding += 1
+            return host
+
+    def release(self, host: OllamaHost, success: bool) -> None:
+        with self._lock:
+            host.outstanding -= 1
+            if success:
+                host.completed += 1
+                host.consecutive_failures = 0
+                return
+            host.consecutive_failures += 1
+            if host.healthy and host.consecutive_failures >= self.failure_threshold:
+                host.healthy = False
+                logger.warning(f"Evicted Ollama host {host.url} after {host.consecutive_failures} failures")
+
+    def hosts_for(self, model: str) -> List[OllamaHost]:
+        """Healthy hosts that should serve the model (affinity hosts if configured)."""
+        with self._lock:
+            return list(self._candidates(model))
+
+    def check_health(self) -> None:
+        """Probe every host; evict dead ones and re-admit recovered ones."""
+        for host in self.hosts:
+            try:
+                host.health_client.list()
+                ok = True
+            except Exception as e:
+                ok = False
+                error = e
+            with self._lock:
+                if ok and not host.healthy:
+                    host.healthy = True
+                    host.consecutive_failures = 0
+                    logger.info(f"Re-admitted Ollama host {host.url}")
+                elif not ok and host.healthy:
+                    host.healthy = False
+                    logger.warning(f"Evicted Ollama host {host.url}: health check failed: {error}")
+
+    def start_health_checks(self) -> None:
+        """Start the background health-check thread (only useful with several hosts)."""
+        if self._health_thread is not None or len(self.hosts) < 2 or self.health_interval <= 0:
+            return
+        with self._lock:
+            if self._health_thread is not None:
+                return
+
+            def health_loop():
+                while True:
+                    time.sleep(self.health_interval)
+                    try:
+                        self.check_health()
+                    except Exception as e:
+                        logger.error(f"Ollama health check failed: {e}")
+
+            self._health_thread = threading.Thread(target=health_loop, daemon=True, name="ollama-health")
+            self._health_thread.start()
+        logger.info(f"Started Ollama health checks for {len(self.hosts)} hosts (interval: {self.health_interval}s)")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {host.url: host.snapshot() for host in self.hosts}
+
+
+def parse_affinity(value: str) -> Dict[str, List[str]]:
+    """Parse OLLAMA_MODEL_AFFINITY: "model1=http://h1:11434|http://h2:11434;model2=http://h3:11434"."""
+    affinity = {}
+    for entry in (value or "").split(";"):
+        if "=" not in entry:
+            continue
+        model, urls = entry.split("=", 1)
+        affinity[model.strip()] = [url.strip() for url in urls.split("|") if url.strip()]
+    return affinity
+
+
+def create_ollama_pool_from_env(host: str = None) -> OllamaPool:
+    """Build the pool from OLLAMA_HOSTS (comma-separated) or OLLAMA_HOST."""
+    if host:
+        urls = [host]
+    else:
+        urls = [url.strip() for url in (os.getenv("OLLAMA_HOSTS") or "").split(",") if url.strip()]
+        if not urls:
+            urls = [os.getenv("OLLAMA_HOST", "http://localhost:11434")]
+    return OllamaPool(
+        urls,
+        affinity=parse_affinity(os.getenv("OLLAMA_MODEL_AFFINITY", "")),
+        health_interval=float(os.getenv("OLLAMA_HEALTH_INTERVAL", 15)),
+        request_timeout=float(os.getenv("LLM_REQUEST_TIMEOUT", 120)),
+    )
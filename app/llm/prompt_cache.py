@@ -0,0 +1,86 @@
+import threading
+from typing import Dict, Optional
+from .prompts import SYSTEM_QA_SYSTEM_PROMPT_RU
+
+
+class SystemPromptCache:
+    """
+    Pre-rendered system messages, one per context version.
+
+    Providers (Ollama KV cache, OpenRouter/DeepSeek prompt caching) only reuse
+    a prefix that is byte-identical, so the system message is rendered once and
+    the same string is sent with every question for that context.
+    """
+
+    def __init__(self, template: str = SYSTEM_QA_SYSTEM_PROMPT_RU, maxsize: int = 4):
+        self.template = template
+        self.maxsize = maxsize
+        self._rendered = {}
+        self._lock = threading.Lock()
+
+    def render(self, system_context: str, context_version: Optional[str] = None) -> str:
+        key = context_version or system_context
+        with self._lock:
+            rendered = self._rendered.get(key)
+            if rendered is None:
+                rendered = self.template.format(system_context=system_context)
+                self._rendered[key] = rendered
+                while len(self._rendered) > self.maxsize:
+                    self._rendered.pop(next(iter(self._rendered)))
+            return rendered
+
+
+class PrefixCacheStats:
+    """
+    Prompt-eval measurements per system prefix.
+
+    The first request for a prefix is the cold one; later requests should hit the
+    provider's prefix cache. The difference between cold and warm prompt-eval time
+    (Ollama) or the count of cached prompt tokens (OpenAI-compatible APIs) shows
+    what the stable prefix saves.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seen_prefixes = set()
+        self.cold_requests = 0
+        self.warm_requests = 0
+        self.cold_eval_ms = 0.0
+        self.warm_eval_ms = 0.0
+        self.prompt_tokens = 0
+        self.cached_prompt_tokens = 0
+
+    def record(self, prefix_key: Optional[str], prompt_eval_ms: Optional[float] = None,
+               prompt_tokens: Optional[int] = None, cached_tokens: Optional[int] = None) -> None:
+        with self._lock:
+            cold = prefix_key not in self._seen_prefixes
+            if prefix_key is not None:
+                self._seen_prefixes.add(prefix_key)
+                if len(self._seen_prefixes) > 64:
+                    self._seen_prefixes = {prefix_key}
+
+            if prompt_eval_ms is not None:
+                if cold:
+                    self.cold_requests += 1
+                    self.cold_eval_ms += prompt_eval_ms
+                else:
+                    self.warm_requests += 1
+                    self.warm_eval_ms += prompt_eval_ms
+
+            self.prompt_tokens += prompt_tokens or 0
+            self.cached_prompt_tokens += cached_tokens or 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            cold_avg = self.cold_eval_ms / self.cold_requests if self.cold_requests else None
+            warm_avg = self.warm_eval_ms / self.warm_requests if self.warm_requests else None
+            saved_ms = (cold_avg - warm_avg) * self.warm_requests if cold_avg is not None and warm_avg is not None else 0.0
+            return {
+                "cold_requests": self.cold_requests,
+                "warm_requests": self.warm_requests,
+                "avg_cold_prompt_eval_ms": round(cold_avg, 1) if cold_avg is not None else None,
+                "avg_warm_prompt_eval_ms": round(warm_avg, 1) if warm_avg is not None else None,
+                "prompt_eval_ms_saved": round(max(saved_ms, 0.0), 1),
+                "prompt_tokens": self.prompt_tokens,
+                "cached_prompt_tokens": self.cached_prompt_tokens,
+            }
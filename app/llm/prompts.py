@@ -99,17 +99,41 @@ COMPREHENSIVE_QA_PROMPT_RU = """
 Помните: вы имеете доступ ко всей макроэкономической информации в одном месте!
 """
 
-SYSTEM_QA_PROMPT_RU = """
+# Системное сообщение с контекстом: рендерится один раз на версию контекста и
+# отправляется побайтно одинаковым, чтобы провайдер мог переиспользовать кэш префикса
+SYSTEM_QA_SYSTEM_PROMPT_RU = """
 Ты - ведущий финансовый аналитик и эксперт по монетарной политике Центрального банка России.
 
 {system_context}
 
 Используй эту информацию для ответа на вопрос пользователя. Отвечай обоснованно, точно и на русском языке.
+"""
+
+# Вопрос идет последним отдельным сообщением после неизменного префикса
+SYSTEM_QA_QUESTION_PROMPT_RU = """Вопрос пользователя: {user_question}
+
+Ответ:"""
+
+# Тот же вопрос с найденными по смыслу фрагментами данных (RETRIEVAL_ENABLED)
+SYSTEM_QA_PASSAGES_PROMPT_RU = """Наиболее релевантные вопросу фрагменты данных:
+{passages}
 
 Вопрос пользователя: {user_question}
 
-Ответ:
-"""
+Ответ:"""
+
+# Сводки новостей канала ЦБ: пост, день (из сводок постов), неделя (из дневных сводок)
+NEWS_SUMMARY_PROMPT_RU = """Кратко перескажи {what} Telegram канала Банка России для аналитика денежно-кредитной политики.
+Сохрани решения, цифры, даты и сигналы о ключевой ставке и инфляции, опусти общие слова.
+Ответ — {length} на русском языке, без вступления.
+
+{text}"""
+
+NEWS_SUMMARY_KINDS_RU = {
+    "post": ("этот пост", "одно-два предложения"),
+    "day": ("сводки постов за один день", "не более трех предложений"),
+    "week": ("дневные сводки за неделю", "не более пяти предложений"),
+}
 
 # English versions for compatibility
 ANALYZE_KEY_RATE_PROMPT = ANALYZE_KEY_RATE_PROMPT_RU
@@ -0,0 +1,179 @@
+import importlib.util
+from abc import ABC, abstractmethod
+import threading
+from typing import Dict, List, Optional
+from app.utils.deadline import Deadline, DeadlineExceeded
+from .ollama_pool import OllamaPool
+
+# Optional DeepSeek/OpenRouter support; the openai package itself is imported on first request
+OPENAI_AVAILABLE = importlib.util.find_spec("openai") is not None
+
+
+def parse_keep_alive(value):
+    """Ollama keep_alive: plain numbers are seconds (-1 keeps the model loaded), otherwise a duration like "30m"."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+class LLMProvider(ABC):
+    """
+    One chat-completion backend. chat() returns a dict with the answer text
+    ("content") and prompt metrics when the backend reports them.
+
+    Responses are streamed so that generation is aborted (the connection is
+    closed and the server stops generating) as soon as the deadline passes.
+    """
+
+    name = "base"
+
+    def __init__(self, model: str):
+        self.model = model
+
+    @abstractmethod
+    def chat(self, messages: List[Dict], deadline: Optional[Deadline] = None) -> Dict:
+        """Run one chat completion; raises DeadlineExceeded once the deadline passes."""
+
+    def config(self) -> Dict:
+        """Settings that change the answers (backtest cache keys); no credentials."""
+        return {"provider": self.name, "model": self.model}
+
+    def __repr__(self):
+        return f"{self.name}({self.model})"
+
+
+class OllamaProvider(LLMProvider):
+    """Ollama servers, balanced through an OllamaPool (one or several hosts)."""
+
+    name = "Ollama"
+
+    def __init__(self, pool: OllamaPool, model: str, keep_alive: Optional[str] = None, num_ctx: Optional[int] = None):
+        super().__init__(model)
+        self.pool = pool
+        self.keep_alive = parse_keep_alive(keep_alive)
+        self.num_ctx = num_ctx
+
+    def config(self) -> Dict:
+        return {**super().config(), "num_ctx": self.num_ctx}
+
+    def chat(self, messages: List[Dict], deadline: Optional[Deadline] = None) -> Dict:
+        deadline = deadline or Deadline()
+        deadline.check()
+        options = {"num_ctx": self.num_ctx} if self.num_ctx else None
+        host = self.pool.acquire(self.model)
+        content = []
+        final = None
+        stream = None
+        try:
+            # Every read, including the one before the first chunk, ends with the deadline
+            stream = host.client_for(deadline.timeout(cap=host.request_timeout)).chat(
+                model=self.model,
+                messages=messages,
+                options=options,
+                keep_alive=self.keep_alive,
+                stream=True
+            )
+            for chunk in stream:
+                deadline.check()
+                content.append(chunk["message"]["content"])
+                if chunk.get("done"):
+                    final = chunk
+        except DeadlineExceeded:
+            # Not the host's fault: free the slot without counting a failure
+            self.pool.release(host, success=True)
+            raise
+        except Exception as e:
+            if deadline.expired:
+                # The read timed out because the request deadline did
+                self.pool.release(host, success=True)
+                raise DeadlineExceeded("Request deadline exceeded") from e
+            self.pool.release(host, success=False)
+            raise
+        finally:
+            if stream is not None:
+                stream.close()  # closes the connection, Ollama stops generating
+        self.pool.release(host, success=True)
+
+        prompt_eval_duration = final.get("prompt_eval_duration") if final else None
+        return {
+            "content": "".join(content),
+            "prompt_eval_ms": prompt_eval_duration / 1e6 if prompt_eval_duration is not None else None,
+            "prompt_tokens": final.get("prompt_eval_count") if final else None,
+            "cached_tokens": None,
+        }
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """OpenAI-compatible cloud API (OpenRouter, DeepSeek)."""
+
+    temperature = 0.7
+    max_tokens = 2048
+
+    def __init__(self, name: str, api_key: str, base_url: Optional[str], model: str, request_timeout: float = 120.0):
+        if not OPENAI_AVAILABLE:
+            raise ValueError(f"{name} support requested but openai library not available")
+        super().__init__(model)
+        self.name = name
+        self.request_timeout = request_timeout
+        self._api_key = api_key
+        self._base_url = base_url
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    def config(self) -> Dict:
+        return {**super().config(), "base_url": self._base_url, "temperature": self.temperature,
+                "max_tokens": self.max_tokens}
+
+    @property
+    def client(self):
+        """OpenAI client, created on first request."""
+        if self._client is None:
+            from openai import OpenAI
+            with self._client_lock:
+                if self._client is None:
+                    # Retries are handled by LLMRouter (retry budget + jittered backoff)
+                    self._client = OpenAI(api_key=self._api_key, base_url=self._base_url, max_retries=0)
+        return self._client
+
+    def chat(self, messages: List[Dict], deadline: Optional[Deadline] = None) -> Dict:
+        deadline = deadline or Deadline()
+        stream = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=self.max_tokens,
+            temperature=self.temperature,
+            stream=True,
+            stream_options={"include_usage": True},
+            timeout=deadline.timeout(cap=self.request_timeout)
+        )
+
+        content = []
+        usage = None
+        try:
+            for chunk in stream:
+                deadline.check()
+                if chunk.choices and chunk.choices[0].delta.content:
+                    content.append(chunk.choices[0].delta.content)
+                if getattr(chunk, "usage", None) is not None:
+                    usage = chunk.usage
+        finally:
+            stream.close()  # abandoning the stream stops the generation upstream
+
+        prompt_tokens = cached_tokens = None
+        if usage is not None:
+            prompt_tokens = usage.prompt_tokens
+            details = getattr(usage, "prompt_tokens_details", None)
+            cached_tokens = getattr(details, "cached_tokens", None) if details is not None else None
+            if cached_tokens is None:
+                # DeepSeek reports context caching separately
+                cached_tokens = getattr(usage, "prompt_cache_hit_tokens", None)
+
+        return {
+            "content": "".join(content),
+            "prompt_eval_ms": None,
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+        }
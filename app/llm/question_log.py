@@ -0,0 +1,100 @@
+import json
+import os
+import threading
+from collections import Counter
+from typing import List
+from app.llm.answer_cache import normalize_question
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class QuestionLog:
+    """
+    Журнал входящих вопросов: считает частоту нормализованных вопросов
+    и хранит исходную формулировку для прогрева ответов. record() только
+    считает (его вызывают из обработчиков на event loop), а файл каждые
+    save_every вопросов записывается в фоновом потоке.
+    """
+
+    def __init__(self, path: str = None, max_entries: int = 500, save_every: int = 20):
+        self.path = path or os.path.join(os.path.dirname(__file__), "../data/cache/question_log.json")
+        self.max_entries = max_entries
+        self.save_every = save_every
+        self._counts = Counter()
+        self._texts = {}
+        self._unsaved = 0
+        self._saving = False
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # one writer of the file at a time
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for key, entry in data.items():
+                self._counts[key] = entry["count"]
+                self._texts[key] = entry["text"]
+        except (json.JSONDecodeError, KeyError, OSError) as e:
+            logger.warning(f"Could not load question log {self.path}: {e}")
+
+    def record(self, question: str) -> None:
+        """Count an incoming question."""
+        key = normalize_question(question)
+        if not key:
+            return
+
+        with self._lock:
+            self._counts[key] += 1
+            self._texts.setdefault(key, question.strip())
+            if len(self._counts) > self.max_entries * 2:
+                self._prune()
+            self._unsaved += 1
+            should_save = self._unsaved >= self.save_every
+
+        if should_save:
+            self._save_in_background()
+
+    def _save_in_background(self) -> None:
+        with self._lock:
+            if self._saving:
+                return  # the running save picks up these counts or the next one will
+            self._saving = True
+
+        def run():
+            try:
+                self.save()
+            finally:
+                with self._lock:
+                    self._saving = False
+
+        threading.Thread(target=run, daemon=True, name="question-log-save").start()
+
+    def _prune(self):
+        keep = dict(self._counts.most_common(self.max_entries))
+        self._counts = Counter(keep)
+        self._texts = {key: self._texts[key] for key in keep}
+
+    def top(self, n: int) -> List[str]:
+        """Most frequent questions, in their original wording."""
+        with self._lock:
+            return [self._texts[key] for key, _ in self._counts.most_common(n)]
+
+    def save(self) -> None:
+        """Write the log now (blocking: shutdown, or the background writer)."""
+        with self._save_lock:
+            with self._lock:
+                data = {key: {"count": count, "text": self._texts[key]}
+                        for key, count in self._counts.most_common(self.max_entries)}
+                self._unsaved = 0
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning(f"Could not save question log {self.path}: {e}")
@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+from dotenv import load_dotenv
+from app.utils.logger import setup_logger
+from .prompts import SYSTEM_QA_QUESTION_PROMPT_RU
+from .providers import parse_keep_alive
+from .scheduler import BACKGROUND
+
+load_dotenv()
+logger = setup_logger(__name__)
+
+# Rough size of a token for Russian text in Ollama models
+CHARS_PER_TOKEN = 3
+# Room for the question and the answer on top of the system prefix
+NUM_CTX_RESERVE = 3072
+NUM_CTX_STEP = 2048
+
+
+def estimate_num_ctx(context_chars: int, max_num_ctx: int = 32768) -> int:
+    """Context window that fits the system prefix plus a question and an answer, in NUM_CTX_STEP buckets."""
+    needed = context_chars // CHARS_PER_TOKEN + NUM_CTX_RESERVE
+    buckets = -(-needed // NUM_CTX_STEP)
+    return min(max(buckets, 1) * NUM_CTX_STEP, max_num_ctx)
+
+
+class ModelResidencyManager:
+    """
+    Держит модели Ollama загруженными, чтобы пользователи не ждали холодного старта.
+
+    Прогревает модели на всех хостах пула при запуске и после каждого обновления
+    контекста коротким запросом с тем же системным префиксом, что и у реальных
+    вопросов (заодно заполняется KV-кэш префикса), задает keep_alive и подбирает
+    num_ctx по фактической длине контекста. Запросы прогрева идут через пул
+    (учет нагрузки и здоровья хостов) и, если задан submit планировщика, как
+    фоновые задачи, чтобы не вытеснять вопросы пользователей.
+    """
+
+    def __init__(self, analyzer, keep_alive: str = "-1", max_num_ctx: int = 32768,
+                 submit: Optional[Callable] = None):
+        self.analyzer = analyzer
+        self.submit = submit
+        self.keep_alive = parse_keep_alive(keep_alive)
+        self.max_num_ctx = max_num_ctx
+        self.last_warmup: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+        for provider in self.ollama_providers():
+            if provider.keep_alive is None:
+                provider.keep_alive = self.keep_alive
+
+    def ollama_providers(self, small: Optional[bool] = None) -> List:
+        """Ollama providers of the main router and, if configured, of the small-model router."""
+        providers = []
+        if small is not True:
+            providers += [p for p in self.analyzer.router.providers if hasattr(p, "pool")]
+        if small is not False and self.analyzer.small_router is not None:
+            providers += [p for p in self.analyzer.small_router.providers if hasattr(p, "pool")]
+        return providers
+
+    def _size_context(self, provider, system_prompt: str) -> None:
+        if os.getenv("OLLAMA_NUM_CTX"):
+            return  # pinned explicitly
+        num_ctx = estimate_num_ctx(len(system_prompt), self.max_num_ctx)
+        if num_ctx != provider.num_ctx:
+            logger.info(f"Sizing num_ctx for {provider.model}: {provider.num_ctx} -> {num_ctx}")
+            provider.num_ctx = num_ctx
+
+    def warm(self, system_context: Optional[str] = None, context_version: Optional[str] = None,
+             simple_context: Optional[str] = None) -> None:
+        """Load every Ollama model on its hosts and prime the context prefix.
+
+        simple_context is the trimmed context sent to the small model (see complexity.py).
+        """
+        for provider in self.ollama_providers(small=False):
+            self._warm_provider(provider, system_context, context_version)
+        for provider in self.ollama_providers(small=True):
+            self._warm_provider(provider, simple_context or system_context,
+                                f"{context_version}:simple" if simple_context else context_version)
+
+    def _warm_provider(self, provider, system_context: Optional[str], context_version: Optional[str]) -> None:
+        system_prompt = None
+        if system_context:
+            system_prompt = self.analyzer.system_prompts.render(system_context, context_version)
+
+        if system_prompt:
+            self._size_context(provider, system_prompt)
+        options = {"num_ctx": provider.num_ctx, "num_predict": 1} if provider.num_ctx else {"num_predict": 1}
+
+        hosts = provider.pool.hosts_for(provider.model)
+        if self.submit is None:
+            for host in hosts:
+                self._warm_host(provider, host, system_prompt, options, context_version)
+            return
+        futures = [self.submit(self._warm_host, provider, host, system_prompt, options, context_version,
+                               priority=BACKGROUND) for host in hosts]
+        for future in futures:
+            future.result()
+
+    def _warm_host(self, provider, host, system_prompt: Optional[str], options: Dict,
+                   context_version: Optional[str]) -> None:
+        started = time.monotonic()
+        provider.pool.acquire_host(host)
+        try:
+            if system_prompt:
+                host.client.chat(
+                    model=provider.model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": SYSTEM_QA_QUESTION_PROMPT_RU.format(user_question="Готов?")},
+                    ],
+                    options=options,
+                    keep_alive=provider.keep_alive
+                )
+            else:
+                # Empty prompt only loads the model into memory
+                host.client.generate(model=provider.model, prompt="", keep_alive=provider.keep_alive)
+        except Exception as e:
+            provider.pool.release(host, success=False)
+            logger.warning(f"Failed to warm {provider.model} on {host.url}: {e}")
+            return
+        provider.pool.release(host, success=True)
+
+        elapsed = time.monotonic() - started
+        logger.info(f"Warmed {provider.model} on {host.url} in {elapsed:.1f}s")
+        with self._lock:
+            self.last_warmup[f"{provider.model}@{host.url}"] = {
+                "version": context_version,
+                "seconds": round(elapsed, 2),
+                "num_ctx": provider.num_ctx,
+                "at": time.time(),
+            }
+
+    def warm_in_background(self, system_context: Optional[str] = None, context_version: Optional[str] = None,
+                           simple_context: Optional[str] = None) -> None:
+        thread = threading.Thread(target=self.warm, args=(system_context, context_version, simple_context),
+                                  daemon=True, name="ollama-residency")
+        thread.start()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self.last_warmup)
+
+
+def create_residency_manager_from_env(analyzer, submit: Optional[Callable] = None) -> Optional[ModelResidencyManager]:
+    """OLLAMA_RESIDENCY=false disables warm-up of Ollama models; submit is LLMScheduler.submit."""
+    if (os.getenv("OLLAMA_RESIDENCY") or "true").lower() not in ("true", "1", "yes", "on"):
+        return None
+    manager = ModelResidencyManager(
+        analyzer,
+        keep_alive=os.getenv("OLLAMA_KEEP_ALIVE") or "-1",
+        max_num_ctx=int(os.getenv("OLLAMA_MAX_NUM_CTX", 32768)),
+        submit=submit,
+    )
+    if not manager.ollama_providers():
+        return None
+    return manager
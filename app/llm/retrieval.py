@@ -0,0 +1,205 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from app.context_sections import ContextData
+from app.utils.deadline import Deadline
+from app.utils.logger import setup_logger
+from .vector_index import HashingEmbedder, OllamaEmbedder, VectorIndex
+
+load_dotenv()
+logger = setup_logger(__name__)
+
+_ARTICLE_HEADER = re.compile(r"^=== (.+?) ===$", re.MULTILINE)
+MAX_POST_CHARS = 1500
+
+
+def _passage_id(kind: str, text: str) -> str:
+    return f"{kind}:{hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]}"
+
+
+def _chunks(text: str, max_chars: int) -> List[str]:
+    """Paragraph-aligned chunks of at most max_chars (longer paragraphs are cut)."""
+    chunks, current = [], ""
+    for paragraph in (p.strip() for p in re.split(r"\n\s*\n", text)):
+        if not paragraph:
+            continue
+        for start in range(0, len(paragraph), max_chars):
+            piece = paragraph[start:start + max_chars]
+            if current and len(current) + len(piece) + 1 > max_chars:
+                chunks.append(current)
+                current = ""
+            current = f"{current}\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def context_passages(system_context: str, chunk_chars: int = 800, data: Optional[ContextData] = None) -> Dict[str, str]:
+    """Passages of the context worth retrieving: news lines (posts, digests) and article chunks."""
+    data = data or ContextData.from_context(system_context)
+    passages = {}
+    for line in data.section(system_context, "news").splitlines():
+        if line.startswith("- "):
+            text = line[2:].strip()
+            passages[_passage_id("news", text)] = text
+
+    articles = data.section(system_context, "articles").split("\n", 1)
+    if len(articles) == 2:
+        articles = articles[1]
+        headers = list(_ARTICLE_HEADER.finditer(articles))
+        for i, header in enumerate(headers):
+            body = articles[header.end():headers[i + 1].start() if i + 1 < len(headers) else None]
+            for chunk in _chunks(body, chunk_chars):
+                text = f"[{header.group(1)}] {chunk}"
+                passages[_passage_id("article", text)] = text
+    return passages
+
+
+def post_passages(post_log, days: int) -> Dict[str, str]:
+    """Every retained channel post (not only the ones the context shows in full)."""
+    passages = {}
+    for post in post_log.scan(since=(datetime.now() - timedelta(days=days)).date()):
+        posted_at = datetime.fromisoformat(post["date"])
+        text = f"{posted_at.strftime('%d.%m.%Y %H:%M')} | {post['text'][:MAX_POST_CHARS]}"
+        passages[f"post:{post['id']}:{hashlib.sha256(text.encode('utf-8')).hexdigest()[:8]}"] = text
+    return passages
+
+
+class ContextRetriever:
+    """
+    Поиск наиболее релевантных фрагментов данных для вопроса.
+
+    После публикации версии контекста в фоне синхронизирует векторный индекс:
+    новости (посты и сводки), фрагменты статей и все хранимые посты канала из
+    журнала (если он есть в этом процессе). Эмбеддятся только новые фрагменты.
+    Для вопроса возвращает top-k фрагментов, которые идут в сообщение с
+    вопросом, а неизменный системный префикс остается прежним. Эмбеддинг
+    вопроса ограничен временем (RETRIEVAL_TIMEOUT и дедлайн запроса): если
+    модель эмбеддингов медленная или недоступна, вопрос уходит без фрагментов.
+    Синхронизации идут по одной, версия, которую уже сменила более новая,
+    пропускается.
+    """
+
+    def __init__(self, index: VectorIndex, top_k: int = 5, min_score: float = 0.3,
+                 post_log=None, post_days: int = 365, timeout: float = 2.0, workers: int = 2):
+        self.index = index
+        self.top_k = top_k
+        self.min_score = min_score
+        self.post_log = post_log
+        self.post_days = post_days
+        self.timeout = timeout
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._sync_lock = threading.RLock()
+        self._synced_version = None
+        self._wanted_version = None
+        self._executor = None
+        self._running = 0
+        self._searches = 0
+        self._search_s = 0.0
+        self._skipped = 0
+
+    def sync(self, system_context: str, version: str, data: Optional[ContextData] = None) -> int:
+        """Bring the index up to the context version; returns the number of newly embedded passages."""
+        with self._sync_lock:
+            if version == self._synced_version:
+                return 0
+            passages = context_passages(system_context, data=data)
+            if self.post_log is not None:
+                passages.update(post_passages(self.post_log, self.post_days))
+            embedded = self.index.sync(passages)
+            self._synced_version = version
+            return embedded
+
+    def sync_in_background(self, system_context: str, version: str, data: Optional[ContextData] = None) -> None:
+        with self._lock:
+            if self._wanted_version == version:
+                return
+            self._wanted_version = version
+
+        def run():
+            try:
+                with self._sync_lock:
+                    with self._lock:
+                        stale = self._wanted_version != version
+                    if stale:
+                        logger.info(f"Vector index sync for version {version} skipped: a newer version is pending")
+                        return
+                    self.sync(system_context, version, data)
+            except Exception as e:
+                logger.error(f"Vector index sync failed for version {version}: {e}")
+                with self._lock:
+                    if self._wanted_version == version:
+                        self._wanted_version = None  # the next publication retries
+
+        threading.Thread(target=run, daemon=True, name="vector-index-sync").start()
+
+    def passages(self, question: str, deadline: Optional[Deadline] = None) -> Optional[str]:
+        """The most relevant passages as prompt lines; None if the index is empty, slow or unavailable."""
+        timeout = deadline.timeout(cap=self.timeout) if deadline is not None else self.timeout
+        with self._lock:
+            if self._running >= self.workers or (timeout is not None and timeout <= 0):
+                # Every worker is stuck on the embedder (or no time is left): answer without passages
+                self._skipped += 1
+                return None
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="retrieval")
+            self._running += 1
+        started = time.monotonic()
+        future = self._executor.submit(self.index.search, question, self.top_k)
+        future.add_done_callback(self._search_done)
+        try:
+            found = future.result(timeout=timeout)
+        except FutureTimeout:
+            logger.warning(f"Passage retrieval took longer than {timeout:.1f}s, answering without passages")
+            with self._lock:
+                self._skipped += 1
+            return None
+        except Exception as e:
+            logger.warning(f"Passage retrieval failed: {e}")
+            return None
+        with self._lock:
+            self._searches += 1
+            self._search_s += time.monotonic() - started
+        lines = [f"- {text}" for score, _, text in found if score >= self.min_score]
+        return "\n".join(lines) if lines else None
+
+    def _search_done(self, future) -> None:
+        with self._lock:
+            self._running -= 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self.index.stats(),
+                "synced_version": self._synced_version,
+                "searches": self._searches,
+                "skipped": self._skipped,
+                "avg_search_ms": round(1000 * self._search_s / self._searches, 2) if self._searches else None,
+            }
+
+
+def create_retriever_from_env(post_log=None) -> Optional[ContextRetriever]:
+    """RETRIEVAL_* / EMBEDDING_* settings; None when RETRIEVAL_ENABLED is off."""
+    if (os.getenv("RETRIEVAL_ENABLED") or "false").lower() not in ("true", "1", "yes", "on"):
+        return None
+    if os.getenv("EMBEDDING_PROVIDER", "ollama").lower() == "hashing":
+        embedder = HashingEmbedder()
+    else:
+        from .ollama_pool import create_ollama_pool_from_env
+        embedder = OllamaEmbedder(create_ollama_pool_from_env(), os.getenv("EMBEDDING_MODEL", "nomic-embed-text"))
+    index = VectorIndex(os.getenv("VECTOR_INDEX_PATH", "app/data/cache/vector_index"), embedder)
+    return ContextRetriever(
+        index,
+        top_k=int(os.getenv("RETRIEVAL_TOP_K", 5)),
+        min_score=float(os.getenv("RETRIEVAL_MIN_SCORE", 0.3)),
+        post_log=post_log,
+        post_days=int(os.getenv("POST_LOG_RETENTION_DAYS", 365)),
+        timeout=float(os.getenv("RETRIEVAL_TIMEOUT", 2.0)),
+    )
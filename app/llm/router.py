@@ -0,0 +1,231 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Optional
+from app.utils.logger import setup_logger
+from app.utils.deadline import Deadline, DeadlineExceeded
+from app.utils.retry import RetryBudget, is_transient_error, jittered_backoff
+from .providers import LLMProvider
+
+logger = setup_logger(__name__)
+
+
+class NoHealthyProviderError(RuntimeError):
+    """All providers failed or are cooling down."""
+
+
+class ProviderHealth:
+    """Rolling latency and error statistics for one provider."""
+
+    def __init__(self, window: int = 50, failure_threshold: int = 3, cooldown: float = 30.0):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self._lock = threading.Lock()
+
+    def record_success(self, latency: float) -> None:
+        with self._lock:
+            self.latencies.append(latency)
+            self.outcomes.append(True)
+            self.consecutive_failures = 0
+            self.cooldown_until = 0.0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.outcomes.append(False)
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.failure_threshold:
+                # Back off; after the cooldown one request probes the provider again
+                self.cooldown_until = time.monotonic() + self.cooldown
+
+    def is_healthy(self) -> bool:
+        with self._lock:
+            return time.monotonic() >= self.cooldown_until
+
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self.outcomes:
+                return 0.0
+            return 1.0 - sum(self.outcomes) / len(self.outcomes)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if not self.latencies:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self) -> Dict:
+        p50 = self.percentile(0.5)
+        p95 = self.percentile(0.95)
+        return {
+            "healthy": self.is_healthy(),
+            "error_rate": round(self.error_rate(), 3),
+            "p50_s": round(p50, 3) if p50 is not None else None,
+            "p95_s": round(p95, 3) if p95 is not None else None,
+            "samples": len(self.latencies),
+        }
+
+
+class LLMRouter:
+    """
+    Routes chat completions over several providers (Ollama, OpenRouter, DeepSeek).
+
+    Each request goes to the fastest healthy provider (by rolling median latency,
+    providers without samples are tried in configured order), fails over to the
+    next one on errors and, with hedging enabled, starts a second provider when
+    the first has not answered within its p95 latency. When every provider failed
+    with a transient error, the round is retried after a jittered backoff while the
+    retry budget and the request deadline allow it.
+    """
+
+    def __init__(self, providers: List[LLMProvider], hedge: bool = False, hedge_min_delay: float = 2.0,
+                 max_error_rate: float = 0.5, max_attempts: int = 3, backoff_base: float = 0.5,
+                 retry_budget: Optional[RetryBudget] = None):
+        if not providers:
+            raise ValueError("LLMRouter needs at least one provider")
+        self.providers = providers
+        self.health = {id(p): ProviderHealth() for p in providers}
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.max_error_rate = max_error_rate
+        self.hedged_requests = 0
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.retry_budget = retry_budget or RetryBudget()
+        self._executor = ThreadPoolExecutor(max_workers=max(4, 2 * len(providers)), thread_name_prefix="llm-router")
+
+    def ranked_providers(self) -> List[LLMProvider]:
+        """
+        Healthy providers first, fastest first; providers without latency samples
+        follow the sampled ones in configured order; unhealthy ones are kept as a last resort.
+        """
+        def sort_key(item):
+            order, provider = item
+            health = self.health[id(provider)]
+            p50 = health.percentile(0.5)
+            degraded = health.error_rate() > self.max_error_rate
+            return (degraded, p50 is None, p50 if p50 is not None else 0.0, order)
+
+        indexed = list(enumerate(self.providers))
+        healthy = [item for item in indexed if self.health[id(item[1])].is_healthy()]
+        cooling = [item for item in indexed if not self.health[id(item[1])].is_healthy()]
+        return [p for _, p in sorted(healthy, key=sort_key)] + [p for _, p in cooling]
+
+    def available(self) -> bool:
+        """True if at least one provider is not cooling down."""
+        return any(health.is_healthy() for health in self.health.values())
+
+    def _call(self, provider: LLMProvider, messages: List[Dict], deadline: Deadline) -> Dict:
+        deadline.check()
+        started = time.monotonic()
+        try:
+            result = provider.chat(messages, deadline=deadline)
+        except DeadlineExceeded:
+            raise  # the request gave up, the provider is not to blame
+        except Exception:
+            self.health[id(provider)].record_failure()
+            raise
+        latency = time.monotonic() - started
+        self.health[id(provider)].record_success(latency)
+        result["provider"] = provider.name
+        result["model"] = provider.model
+        result["latency_s"] = latency
+        return result
+
+    def _hedge_delay(self, provider: LLMProvider) -> float:
+        p95 = self.health[id(provider)].percentile(0.95)
+        return max(self.hedge_min_delay, p95 or 0.0)
+
+    def complete(self, messages: List[Dict], deadline: Optional[Deadline] = None) -> Dict:
+        """Run a chat completion with failover, optional hedging and retries within the deadline."""
+        deadline = deadline or Deadline()
+        self.retry_budget.record_request()
+        errors = []
+
+        for attempt in range(self.max_attempts):
+            result, transient = self._complete_round(messages, deadline, errors)
+            if result is not None:
+                return result
+            if not transient or attempt + 1 >= self.max_attempts:
+                break
+
+            delay = jittered_backoff(attempt, base=self.backoff_base)
+            if delay >= deadline.remaining():
+                break
+            if not self.retry_budget.try_retry():
+                logger.warning("LLM retry budget exhausted, not retrying")
+                break
+            logger.info(f"All providers failed transiently, retrying in {delay:.2f}s (attempt {attempt + 2})")
+            time.sleep(delay)
+
+        deadline.check()
+        raise NoHealthyProviderError("All LLM providers failed: " + "; ".join(errors))
+
+    def _complete_round(self, messages: List[Dict], deadline: Deadline, errors: List[str]):
+        """One pass over the ranked providers: (result, None) or (None, all_errors_transient)."""
+        candidates = self.ranked_providers()
+        transient = True
+
+        while candidates:
+            primary = candidates.pop(0)
+            if not self.hedge or not candidates:
+                try:
+                    return self._call(primary, messages, deadline), None
+                except DeadlineExceeded:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Provider {primary} failed, failing over: {e}")
+                    errors.append(f"{primary}: {e}")
+                    transient = transient and is_transient_error(e)
+                    continue
+
+            # Each leg gets its own child deadline so the loser can be cancelled
+            legs = {}
+            primary_deadline = deadline.child()
+            pending = {self._executor.submit(self._call, primary, messages, primary_deadline): primary}
+            legs[primary] = primary_deadline
+            done, _ = wait(pending, timeout=min(self._hedge_delay(primary), deadline.remaining()))
+            if not done and not deadline.expired:
+                backup = candidates.pop(0)
+                self.hedged_requests += 1
+                logger.info(f"Hedging: {primary} slower than p95, also starting {backup}")
+                legs[backup] = deadline.child()
+                pending[self._executor.submit(self._call, backup, messages, legs[backup])] = backup
+
+            while pending:
+                done, _ = wait(pending, timeout=deadline.timeout(), return_when=FIRST_COMPLETED)
+                if not done:
+                    for leg_deadline in legs.values():
+                        leg_deadline.cancel()
+                    deadline.check()
+                for future in done:
+                    provider = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except DeadlineExceeded:
+                        deadline.check()
+                        continue
+                    except Exception as e:
+                        logger.warning(f"Provider {provider} failed, failing over: {e}")
+                        errors.append(f"{provider}: {e}")
+                        transient = transient and is_transient_error(e)
+                        continue
+                    # Stop the slower leg
+                    for leg_provider, leg_deadline in legs.items():
+                        if leg_provider is not provider:
+                            leg_deadline.cancel()
+                    return result, None
+
+        return None, transient
+
+    def stats(self) -> Dict:
+        return {
+            "providers": {repr(p): self.health[id(p)].snapshot() for p in self.providers},
+            "hedged_requests": self.hedged_requests,
+            "retry_budget": self.retry_budget.stats(),
+        }
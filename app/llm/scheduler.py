@@ -0,0 +1,230 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, Optional
+from dotenv import load_dotenv
+from app.utils.logger import setup_logger
+
+load_dotenv()
+logger = setup_logger(__name__)
+
+# Классы приоритета: меньше значение — выше приоритет
+INTERACTIVE = 0
+BACKGROUND = 1
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+
+class _Job:
+    def __init__(self, future: "ScheduledFuture", fn: Callable, args, kwargs, priority: int,
+                 fair_key: Optional[Hashable] = None):
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.fair_key = fair_key
+        self.enqueued_at = time.monotonic()
+
+
+class _FairQueue:
+    """Round-robin over per-key FIFO queues, so one user cannot monopolise a priority class."""
+
+    def __init__(self):
+        self._queues = OrderedDict()  # fair_key -> deque of jobs
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, job: _Job) -> None:
+        self._queues.setdefault(job.fair_key, deque()).append(job)
+        self._size += 1
+
+    def insert_by_arrival(self, job: _Job) -> None:
+        queue = self._queues.setdefault(job.fair_key, deque())
+        position = len(queue)
+        while position > 0 and queue[position - 1].enqueued_at > job.enqueued_at:
+            position -= 1
+        queue.insert(position, job)
+        self._size += 1
+
+    def remove(self, job: _Job) -> bool:
+        queue = self._queues.get(job.fair_key)
+        if queue is None or job not in queue:
+            return False
+        queue.remove(job)
+        self._size -= 1
+        if not queue:
+            del self._queues[job.fair_key]
+        return True
+
+    def popleft(self) -> Optional[_Job]:
+        """Next job of the next key in turn, skipping cancelled ones."""
+        while self._queues:
+            key, queue = next(iter(self._queues.items()))
+            job = queue.popleft()
+            self._size -= 1
+            if queue:
+                self._queues.move_to_end(key)
+            else:
+                del self._queues[key]
+            if not job.future.cancelled():
+                return job
+        return None
+
+    def prune(self) -> None:
+        """Drop cancelled jobs (abandoned by every waiter)."""
+        for key in list(self._queues):
+            queue = self._queues[key]
+            alive = deque(job for job in queue if not job.future.cancelled())
+            self._size -= len(queue) - len(alive)
+            if alive:
+                self._queues[key] = alive
+            else:
+                del self._queues[key]
+
+    def keys(self) -> int:
+        return len(self._queues)
+
+
+class ScheduledFuture(Future):
+    """Future of a scheduled LLM job; a queued job can be promoted to a higher priority."""
+
+    def __init__(self, scheduler: "LLMScheduler"):
+        super().__init__()
+        self._scheduler = scheduler
+        self._job = None
+
+    def promote(self, priority: int) -> None:
+        if self._job is not None:
+            self._scheduler._promote(self._job, priority)
+
+
+class LLMScheduler:
+    """
+    Планировщик LLM-задач с приоритетами.
+
+    Вопросы пользователей (interactive) обгоняют ожидающие фоновые задачи
+    (прогрев, отчеты, пакетные расчеты). Чтобы фон не голодал, свободный слот
+    распределяется взвешенным round-robin между классами с задачами в очереди.
+    Фоновый класс ограничен своим лимитом параллелизма, поэтому для вопросов
+    пользователей всегда остаются свободные слоты. Внутри класса задачи разных
+    пользователей (fair_key) обслуживаются по кругу.
+    """
+
+    def __init__(self, max_concurrency: int = 4, limits: Optional[Dict[int, int]] = None,
+                 weights: Optional[Dict[int, int]] = None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.limits = {INTERACTIVE: self.max_concurrency, BACKGROUND: max(1, self.max_concurrency // 2)}
+        self.limits.update(limits or {})
+        self.weights = {INTERACTIVE: 4, BACKGROUND: 1}
+        self.weights.update(weights or {})
+
+        self._queues = {priority: _FairQueue() for priority in PRIORITY_NAMES}
+        self._running = {priority: 0 for priority in PRIORITY_NAMES}
+        self._credits = {priority: 0 for priority in PRIORITY_NAMES}
+        self._waits = {priority: deque(maxlen=500) for priority in PRIORITY_NAMES}
+        self._completed = {priority: 0 for priority in PRIORITY_NAMES}
+        self._cond = threading.Condition()
+
+        for i in range(self.max_concurrency):
+            threading.Thread(target=self._worker, daemon=True, name=f"llm-scheduler-{i}").start()
+
+    def submit(self, fn: Callable, *args, priority: int = INTERACTIVE, fair_key: Optional[Hashable] = None,
+               **kwargs) -> ScheduledFuture:
+        """Queue fn(*args, **kwargs) with the given priority class; fair_key identifies the user."""
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority: {priority}")
+        future = ScheduledFuture(self)
+        job = _Job(future, fn, args, kwargs, priority, fair_key)
+        future._job = job
+        with self._cond:
+            self._queues[priority].append(job)
+            self._cond.notify()
+        return future
+
+    def _promote(self, job: _Job, priority: int) -> None:
+        with self._cond:
+            if priority >= job.priority or not self._queues[job.priority].remove(job):
+                return
+            job.priority = priority
+            # Keep its place by arrival time among the jobs of the new class
+            self._queues[priority].insert_by_arrival(job)
+            self._cond.notify()
+        logger.info(f"Promoted queued LLM job to '{PRIORITY_NAMES[priority]}'")
+
+    def _pick(self) -> Optional[_Job]:
+        """Smooth weighted round-robin over classes that have queued work and a free slot."""
+        for queue in self._queues.values():
+            queue.prune()
+
+        eligible = [p for p, queue in self._queues.items() if queue and self._running[p] < self.limits[p]]
+        if not eligible:
+            return None
+        if len(eligible) == 1:
+            chosen = eligible[0]
+        else:
+            total = 0
+            for priority in eligible:
+                self._credits[priority] += self.weights[priority]
+                total += self.weights[priority]
+            # Ties go to the higher priority (lower value)
+            chosen = max(eligible, key=lambda p: (self._credits[p], -p))
+            self._credits[chosen] -= total
+        return self._queues[chosen].popleft()
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                job = self._pick()
+                while job is None:
+                    self._cond.wait()
+                    job = self._pick()
+                self._running[job.priority] += 1
+                priority = job.priority
+                self._waits[priority].append(time.monotonic() - job.enqueued_at)
+
+            try:
+                if job.future.set_running_or_notify_cancel():
+                    try:
+                        job.future.set_result(job.fn(*job.args, **job.kwargs))
+                    except BaseException as e:
+                        job.future.set_exception(e)
+            finally:
+                job.future._job = None
+                with self._cond:
+                    self._running[priority] -= 1
+                    self._completed[priority] += 1
+                    self._cond.notify_all()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            result = {}
+            for priority, name in PRIORITY_NAMES.items():
+                waits = sorted(self._waits[priority])
+                result[name] = {
+                    "queued": len(self._queues[priority]),
+                    "queued_users": self._queues[priority].keys(),
+                    "running": self._running[priority],
+                    "limit": self.limits[priority],
+                    "completed": self._completed[priority],
+                    "queue_wait_p50_s": round(waits[len(waits) // 2], 3) if waits else None,
+                    "queue_wait_p95_s": round(waits[min(len(waits) - 1, int(0.95 * len(waits)))], 3) if waits else None,
+                }
+            return result
+
+
+def create_llm_scheduler_from_env() -> LLMScheduler:
+    """LLM_MAX_CONCURRENCY total slots, LLM_BACKGROUND_CONCURRENCY for background jobs."""
+    max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", 4))
+    limits = {}
+    if os.getenv("LLM_BACKGROUND_CONCURRENCY"):
+        limits[BACKGROUND] = max(1, int(os.getenv("LLM_BACKGROUND_CONCURRENCY")))
+    return LLMScheduler(
+        max_concurrency=max_concurrency,
+        limits=limits,
+        weights={INTERACTIVE: int(os.getenv("LLM_INTERACTIVE_WEIGHT", 4)), BACKGROUND: 1},
+    )
@@ -0,0 +1,218 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEmbedder:
+    """
+    Deterministic stand-in for an embedding model (tests, no Ollama): words and
+    their 5-letter stems hashed into a fixed number of signed buckets.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def embed(self, texts: List[str]):
+        import numpy as np
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in _WORD.findall(text.lower()):
+                for token in {word, word[:5]}:
+                    digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+                    bucket = int.from_bytes(digest[:4], "little") % self.dim
+                    vectors[row, bucket] += 1.0 if digest[4] & 1 else -1.0
+        return vectors
+
+
+class OllamaEmbedder:
+    """Embeddings from a local Ollama model (e.g. nomic-embed-text), through the shared host pool."""
+
+    def __init__(self, pool, model: str):
+        self.pool = pool
+        self.model = model
+        self.name = f"ollama:{model}"
+
+    def embed(self, texts: List[str]):
+        import numpy as np
+        host = self.pool.acquire(self.model)
+        try:
+            response = host.client.embed(model=self.model, input=texts)
+        except Exception:
+            self.pool.release(host, success=False)
+            raise
+        self.pool.release(host, success=True)
+        return np.asarray(response["embeddings"], dtype=np.float32)
+
+
+class VectorIndex:
+    """
+    Векторный индекс фрагментов на диске.
+
+    Векторы (float32, нормированные) дописываются в vectors.f32 и читаются
+    через np.memmap, в ids.json хранится соответствие id фрагмента -> строка
+    матрицы и текст. Фрагмент с тем же id повторно не эмбеддится; sync()
+    помечает отсутствующие в новом наборе строки как неактуальные, а при их
+    избытке файлы перезаписываются. Синхронизации выполняются по одной, чтобы
+    набор актуальных строк не перезаписала более ранняя версия. Поиск top-k —
+    одно умножение матрицы на вектор запроса и argpartition.
+    """
+
+    def __init__(self, root: str, embedder, batch_size: int = 32):
+        self.root = root
+        self.embedder = embedder
+        self.batch_size = batch_size
+        self.vectors_path = os.path.join(root, "vectors.f32")
+        self.ids_path = os.path.join(root, "ids.json")
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()     # one sync at a time; searches only take _lock
+        self._dim: Optional[int] = None
+        self._rows: Dict[str, int] = {}      # passage id -> matrix row
+        self._texts: Dict[str, str] = {}
+        self._live_ids: Optional[set] = None  # ids of the last sync (None: every mapped passage)
+        self._row_ids: List[Optional[str]] = []
+        self._live = None                     # bool mask over the matrix rows
+        self._matrix = None
+        self._load()
+
+    def _load(self) -> None:
+        meta = None
+        if os.path.exists(self.ids_path):
+            try:
+                with open(self.ids_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (json.JSONDecodeError, OSError) as e:
+                logger.error(f"Vector index map unreadable, starting over: {e}")
+        if meta is not None and meta.get("embedder") != self.embedder.name:
+            logger.info(f"Vector index was built with {meta.get('embedder')}, re-embedding with {self.embedder.name}")
+            meta = None
+        if meta is None:
+            # Vectors without a usable map cannot be matched to passages
+            if os.path.exists(self.vectors_path):
+                os.remove(self.vectors_path)
+            return
+        self._dim = meta["dim"]
+        self._rows = {passage_id: row for passage_id, row, _, _ in meta["passages"]}
+        self._texts = {passage_id: text for passage_id, _, text, _ in meta["passages"]}
+        self._live_ids = {passage_id for passage_id, _, _, live in meta["passages"] if live}
+        self._reopen()
+
+    def _reopen(self) -> None:
+        import numpy as np
+        if not self._dim or not os.path.exists(self.vectors_path):
+            self._matrix, self._row_ids, self._live = None, [], None
+            return
+        row_bytes = 4 * self._dim
+        size = os.path.getsize(self.vectors_path)
+        if size % row_bytes:
+            # A row cut short by a crash: drop it
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(size - size % row_bytes)
+            size -= size % row_bytes
+        rows = size // row_bytes
+        self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self._dim)) if rows else None
+        self._rows = {passage_id: row for passage_id, row in self._rows.items() if row < rows}
+        self._row_ids = [None] * rows
+        for passage_id, row in self._rows.items():
+            self._row_ids[row] = passage_id
+        # Rows without an id (superseded, or written before a crash) never match
+        live = self._rows if self._live_ids is None else self._live_ids
+        self._live = np.array([passage_id is not None and passage_id in live for passage_id in self._row_ids], dtype=bool)
+
+    def _save_map(self) -> None:
+        meta = {
+            "embedder": self.embedder.name,
+            "dim": self._dim,
+            "passages": [[passage_id, row, self._texts[passage_id], bool(self._live[row])]
+                         for passage_id, row in self._rows.items()],
+        }
+        tmp_path = self.ids_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, self.ids_path)
+
+    def _embed(self, texts: List[str]):
+        import numpy as np
+        vectors = np.asarray(self.embedder.embed(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1.0)
+
+    def sync(self, passages: Dict[str, str]) -> int:
+        """Make the index hold exactly these passages (id -> text); returns how many were embedded."""
+        with self._sync_lock:
+            with self._lock:
+                missing = [(passage_id, text) for passage_id, text in passages.items() if passage_id not in self._rows]
+
+            embedded = 0
+            for start in range(0, len(missing), self.batch_size):
+                batch = missing[start:start + self.batch_size]
+                vectors = self._embed([text for _, text in batch])
+                with self._lock:
+                    if self._dim is None:
+                        self._dim = int(vectors.shape[1])
+                    first_row = len(self._matrix) if self._matrix is not None else 0
+                    with open(self.vectors_path, "ab") as f:
+                        f.write(vectors.tobytes())
+                    for offset, (passage_id, text) in enumerate(batch):
+                        self._rows[passage_id] = first_row + offset
+                        self._texts[passage_id] = text
+                    self._reopen()
+                embedded += len(batch)
+
+            with self._lock:
+                if self._matrix is not None and len(self._matrix) > 2 * max(len(passages), 500):
+                    self._compact(passages)
+                self._live_ids = set(passages)
+                self._reopen()
+                self._save_map()
+        if embedded:
+            logger.info(f"Vector index: embedded {embedded} passages, {len(passages)} live")
+        return embedded
+
+    def _compact(self, keep: Dict[str, str]) -> None:
+        """Rewrite the matrix with only the kept rows (caller holds the lock)."""
+        import numpy as np
+        kept = [passage_id for passage_id in keep if passage_id in self._rows]
+        vectors = np.array(self._matrix[[self._rows[passage_id] for passage_id in kept]], dtype=np.float32)
+        self._matrix = None
+        tmp_path = self.vectors_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(vectors.tobytes())
+        os.replace(tmp_path, self.vectors_path)
+        self._rows = {passage_id: row for row, passage_id in enumerate(kept)}
+        self._texts = {passage_id: self._texts[passage_id] for passage_id in kept}
+        self._reopen()
+        logger.info(f"Vector index compacted to {len(kept)} rows")
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[float, str, str]]:
+        """Top-k live passages by cosine similarity: (score, id, text), best first."""
+        import numpy as np
+        with self._lock:
+            matrix, live, row_ids, texts = self._matrix, self._live, self._row_ids, self._texts
+        if matrix is None or not live.any():
+            return []
+        query_vector = self._embed([query])[0]
+        scores = np.where(live, matrix @ query_vector, -np.inf)
+        k = min(k, int(live.sum()))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[row]), row_ids[row], texts[row_ids[row]]) for row in top.tolist()]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "embedder": self.embedder.name,
+                "rows": len(self._matrix) if self._matrix is not None else 0,
+                "live": int(self._live.sum()) if self._live is not None else 0,
+                "dim": self._dim,
+            }
@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from app.context_sections import ContextData
+from app.data.forecast import compact_report_context, get_baseline_forecaster, recent_decisions
+from app.llm.answer_cache import normalize_question
+from app.llm.scheduler import BACKGROUND
+from app.utils.logger import setup_logger
+
+load_dotenv()
+logger = setup_logger(__name__)
+
+REPORT_NAMES = ("analyze_key_rate", "predict_rate_change", "predict_next_meeting_rate")
+
+DEFAULT_WARMUP_QUESTIONS = [
+    "Какая сейчас ключевая ставка?",
+    "Когда следующее заседание ЦБ РФ?",
+    "Какой прогноз по ключевой ставке?",
+    "Что влияет на инфляцию в России?",
+]
+
+
+class AnswerWarmer:
+    """
+    Прогрев ответов после каждого успешного обновления контекста.
+
+    В фоновом потоке генерирует ответы на частые вопросы и стандартные
+    аналитические отчеты, чтобы первый пользователь не ждал генерации.
+    Работает с низким приоритетом: задачи идут в планировщик LLM как фоновые,
+    и вопросы пользователей их обгоняют.
+    """
+
+    def __init__(self, qa_service, question_log, questions: List[str] = None, top_n: int = 10):
+        self.qa_service = qa_service
+        self.question_log = question_log
+        self.questions = questions if questions is not None else list(DEFAULT_WARMUP_QUESTIONS)
+        self.top_n = top_n
+        self.precomputed: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._version = None
+
+    def warmup_questions(self) -> List[str]:
+        """Configured questions followed by the most frequent logged ones, without duplicates."""
+        seen = set()
+        result = []
+        for question in self.questions + self.question_log.top(self.top_n):
+            key = normalize_question(question)
+            if key and key not in seen:
+                seen.add(key)
+                result.append(question)
+        return result
+
+    def schedule(self, version: str) -> None:
+        """Start warming up for a new context version (context listener)."""
+        with self._lock:
+            self._version = version
+        thread = threading.Thread(target=self._run, args=(version,), daemon=True, name="answer-warmup")
+        thread.start()
+
+    def _is_current(self, version: str) -> bool:
+        with self._lock:
+            return self._version == version
+
+    def _run(self, version: str) -> None:
+        started = time.time()
+        warmed = 0
+        self.question_log.save()
+
+        for question in self.warmup_questions():
+            if not self._is_current(version):
+                logger.info(f"Warm-up for version {version} superseded, stopping")
+                return
+            try:
+                if self.qa_service.warm(question, version):
+                    warmed += 1
+            except Exception as e:
+                logger.error(f"Warm-up failed for question '{question}': {e}")
+
+        for name in REPORT_NAMES:
+            if not self._is_current(version):
+                logger.info(f"Warm-up for version {version} superseded, stopping")
+                return
+            # Precomputed with background priority; a user request for the same report promotes it
+            if self.get(name, version) is None and self.qa_service.report(name, priority=BACKGROUND):
+                warmed += 1
+
+        logger.info(f"Warm-up for version {version} finished: {warmed} answers in {time.time() - started:.1f}s")
+
+    def generate_report(self, name: str, system_context: str, version: Optional[str] = None,
+                        data: Optional[ContextData] = None) -> Optional[str]:
+        """Run one of the standard LLMAnalyzer reports over the system context.
+
+        Forecast reports get the baseline model signals in place of the long histories.
+        """
+        analyzer = self.qa_service.analyzer
+        if name == "analyze_key_rate":
+            return analyzer.analyze_key_rate(data_text=system_context)
+
+        data = data or ContextData.from_context(system_context)
+        forecast = get_baseline_forecaster().get(system_context, version or str(hash(system_context)), data)
+        data_text = compact_report_context(system_context, forecast, data)
+        if name == "predict_rate_change":
+            return analyzer.predict_rate_change(data_text)
+        if name == "predict_next_meeting_rate":
+            meetings = data.calendar.as_dict(datetime.now().date())
+            return analyzer.predict_next_meeting_rate(
+                data_text, meetings["next"] or "Не указана (см. контекст)", meetings["upcoming"],
+                recent_decisions(data.key_rates)
+            )
+        raise ValueError(f"Unknown report: {name}")
+
+    def store(self, name: str, version: str, result: str) -> None:
+        with self._lock:
+            self.precomputed[name] = {
+                "version": version,
+                "generated_at": datetime.now().isoformat(timespec="seconds"),
+                "result": result,
+            }
+
+    def get(self, name: str, version: str) -> Optional[Dict]:
+        """Precomputed report for the given context version, if ready."""
+        with self._lock:
+            entry = self.precomputed.get(name)
+        if entry and entry["version"] == version:
+            return entry
+        return None
+
+
+def warmup_settings_from_env() -> Dict:
+    """WARMUP_* environment settings."""
+    questions = os.getenv("WARMUP_QUESTIONS")
+    return {
+        "enabled": (os.getenv("WARMUP_ENABLED") or "true").lower() in ("true", "1", "yes", "on"),
+        "questions": [q.strip() for q in questions.split("|") if q.strip()] if questions else None,
+        "top_n": int(os.getenv("WARMUP_TOP_N", 10)),
+    }
@@ -1,4 +1,6 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from app.utils.logger import setup_logger
 from app.webhook import router
@@ -8,7 +10,18 @@ from dotenv import load_dotenv
 load_dotenv()
 logger = setup_logger(__name__)
 
-app = FastAPI(title="CBR Key Rate Analysis MVP")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """TELEGRAM_MODE=webhook: the bot runs inside FastAPI and receives updates on /telegram-webhook."""
+    from app.telegram_bot import telegram_mode, init_telegram_bot, stop_telegram_bot
+    webhook_mode = telegram_mode() == "webhook"
+    if webhook_mode:
+        await init_telegram_bot().start_webhook()
+    yield
+    if webhook_mode:
+        await stop_telegram_bot()
+
+app = FastAPI(title="CBR Key Rate Analysis MVP", lifespan=lifespan)
 app.include_router(router)
 
 
@@ -17,6 +30,68 @@ app.include_router(router)
 def read_root():
     return {"message": "CBR Analysis System MVP", "version": "1.0.0", "status": "running"}
 
+@app.get("/ready")
+def ready():
+    """Readiness probe: 200 once a context (from the snapshot or a refresh) is available, with its freshness."""
+    from app.context_manager import get_context_manager
+    status = get_context_manager().readiness()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get("/meeting-dates")
+def meeting_dates():
+    """Даты заседаний Совета директоров ЦБ РФ: следующее, предстоящие и прошедшие."""
+    from datetime import date
+    from app.context_manager import get_context_manager
+    from app.data.meetings import MeetingCalendar
+    _, version, data = get_context_manager().get_versioned_data()
+    calendar = data.calendar if data is not None else MeetingCalendar()
+    return {**calendar.as_dict(date.today()), "context_version": version}
+
+@app.get("/forecast")
+def forecast():
+    """Базовый количественный прогноз (правило Тейлора, тренд, инерция) без обращения к LLM."""
+    from app.context_manager import get_context_manager
+    from app.data.forecast import get_baseline_forecaster
+    system_context, version, data = get_context_manager().get_versioned_data()
+    result = get_baseline_forecaster().get(system_context, version, data)
+    if result is None:
+        raise HTTPException(status_code=503, detail="Key rate history is not available")
+    return {**result, "context_version": version}
+
+@app.get("/answer-cache/stats")
+def answer_cache_stats():
+    """Hit-rate metrics of the LLM answer cache."""
+    from app.qa_service import get_qa_service
+    return get_qa_service().answer_cache.stats()
+
+def _report_response(name: str):
+    from app.qa_service import get_qa_service
+    report = get_qa_service().report(name)
+    if report is None:
+        raise HTTPException(status_code=503, detail="LLM analysis is not available")
+    return report
+
+@app.post("/analyze")
+def analyze():
+    """Анализ текущей ключевой ставки (предрассчитан после обновления контекста)."""
+    return _report_response("analyze_key_rate")
+
+@app.post("/predict-change")
+def predict_change():
+    """Прогноз изменения ставки (предрассчитан после обновления контекста)."""
+    return _report_response("predict_rate_change")
+
+@app.post("/predict-next-meeting")
+def predict_next_meeting():
+    """Прогноз ставки после следующего заседания (предрассчитан после обновления контекста)."""
+    return _report_response("predict_next_meeting_rate")
+
+@app.get("/qa/stats")
+def qa_stats():
+    """Answer cache and in-flight coalescing metrics."""
+    from app.qa_service import get_qa_service
+    return get_qa_service().stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,242 @@
+import asyncio
+import time
+from typing import Optional
+from app.context_manager import get_context_manager
+from app.context_sections import ContextData
+from app.data.forecast import get_baseline_forecaster
+from app.llm.analyzer import LLMAnalyzer
+from app.llm.answer_cache import create_answer_cache_from_env, normalize_question
+from app.llm.question_log import QuestionLog
+from app.llm.warmup import AnswerWarmer, warmup_settings_from_env
+from app.llm.residency import create_residency_manager_from_env
+from app.llm.complexity import create_complexity_router_from_env, ANALYTICAL, SIMPLE
+from app.llm.direct_answer import create_direct_answer_engine_from_env
+from app.llm.retrieval import create_retriever_from_env
+from app.llm.scheduler import create_llm_scheduler_from_env, INTERACTIVE, BACKGROUND
+from app.utils.singleflight import SingleFlight
+from app.utils.deadline import Deadline, DeadlineExceeded
+from app.utils.rate_limit import create_rate_limiter_from_env
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class QAService:
+    """
+    Единая точка ответа на вопросы пользователей для бота и webhook.
+    Проверяет кэш ответов перед обращением к LLM и объединяет одинаковые
+    вопросы, которые уже генерируются (single-flight). После каждого обновления
+    контекста прогревает ответы на частые вопросы. Вызовы LLM идут через
+    планировщик: вопросы пользователей обгоняют фоновый прогрев.
+
+    Запрос может нести Deadline: по его истечении ожидание прерывается с
+    DeadlineExceeded, а генерация, которую больше никто не ждет, отменяется.
+    """
+
+    def __init__(self, context_manager=None, analyzer: LLMAnalyzer = None):
+        self.context_manager = context_manager or get_context_manager()
+        self.analyzer = analyzer or LLMAnalyzer()
+        self.answer_cache = create_answer_cache_from_env()
+        # LLM_MAX_CONCURRENCY слотов, вопросы пользователей важнее фоновых задач
+        self.scheduler = create_llm_scheduler_from_env()
+        self.in_flight = SingleFlight(submit=self.scheduler.submit)
+        # Лимиты запросов на пользователя и чат (проверяются ботом и webhook до постановки в очередь)
+        self.rate_limiter = create_rate_limiter_from_env()
+
+        self.question_log = QuestionLog()
+        # Простые фактические вопросы -> маленькая модель с сокращенным контекстом
+        self.complexity = create_complexity_router_from_env()
+        # Фактические вопросы о ключевой ставке отвечаются по ряду ставок без LLM
+        self.direct_answers = create_direct_answer_engine_from_env()
+
+        # Сбрасываем кэш ответов при публикации новой версии контекста
+        self.context_manager.add_listener(self.answer_cache.invalidate)
+        # Базовый количественный прогноз пересчитывается при каждом обновлении контекста
+        self.forecaster = get_baseline_forecaster()
+        self.context_manager.add_listener(self._update_forecast)
+
+        # Сводки новостей моделью (NEWS_SUMMARIZER=llm) — тем же анализатором, в фоне планировщика
+        fetcher = getattr(self.context_manager, "fetcher", None)
+        if getattr(fetcher, "news_digest", None) is not None:
+            fetcher.news_digest.attach_llm(self.analyzer, self.scheduler.submit)
+
+        # Векторный индекс новостей и статей: релевантные фрагменты добавляются к вопросу
+        self.retriever = create_retriever_from_env(post_log=getattr(fetcher, "post_log", None))
+        if self.retriever:
+            self.context_manager.add_listener(self._sync_retriever)
+            if self.context_manager.context_version:
+                self._sync_retriever(self.context_manager.context_version)
+
+        # Модели Ollama держим загруженными: прогрев при запуске и после обновления контекста
+        self.residency = create_residency_manager_from_env(self.analyzer, submit=self.scheduler.submit)
+        if self.residency:
+            self.context_manager.add_listener(self._warm_models)
+            # Без контекста не ждем первого обновления: прогрев запустит слушатель
+            if self.context_manager.context_version:
+                self._warm_models(self.context_manager.context_version)
+
+        # Прогрев частых вопросов и стандартных отчетов после обновления контекста
+        warmup_settings = warmup_settings_from_env()
+        self.warmer = AnswerWarmer(self, self.question_log, questions=warmup_settings["questions"],
+                                   top_n=warmup_settings["top_n"])
+        if warmup_settings["enabled"]:
+            self.context_manager.add_listener(self.warmer.schedule)
+            if self.context_manager.context_version:
+                self.warmer.schedule(self.context_manager.context_version)
+
+    def answer(self, user_question: str, chat_id: Optional[int] = None,
+               deadline: Optional[Deadline] = None, user_id: Optional[int] = None) -> Optional[str]:
+        """Answer a question, serving repeat questions from the answer cache."""
+        deadline = deadline or Deadline()
+        self.question_log.record(user_question)
+        system_context, version, data = self.context_manager.get_versioned_data()
+
+        direct = self.direct_answers.answer(user_question, system_context, version, data=data)
+        if direct is not None:
+            return direct
+
+        cached = self.answer_cache.get(user_question, version, chat_id=chat_id)
+        if cached is not None:
+            logger.info(f"Answer cache hit (version {version})")
+            return cached
+
+        key, store = self._flight_key(version, user_question, chat_id)
+        try:
+            return self.in_flight.do(key, self._generate, system_context, version, user_question, data,
+                                     deadline=deadline, store=store, priority=INTERACTIVE,
+                                     fair_key=user_id if user_id is not None else chat_id)
+        except DeadlineExceeded:
+            raise
+        except TimeoutError as e:
+            raise DeadlineExceeded("Request deadline exceeded") from e
+
+    async def answer_async(self, user_question: str, chat_id: Optional[int] = None,
+                           deadline: Optional[Deadline] = None, user_id: Optional[int] = None) -> Optional[str]:
+        """Async variant for the aiogram handler and the webhook: LLM work runs off the event loop."""
+        deadline = deadline or Deadline()
+        self.question_log.record(user_question)
+        try:
+            system_context, version, data = await asyncio.wait_for(
+                asyncio.to_thread(self.context_manager.get_versioned_data), timeout=deadline.timeout()
+            )
+
+            direct = self.direct_answers.answer(user_question, system_context, version, data=data)
+            if direct is not None:
+                return direct
+
+            cached = self.answer_cache.get(user_question, version, chat_id=chat_id)
+            if cached is not None:
+                logger.info(f"Answer cache hit (version {version})")
+                return cached
+
+            key, store = self._flight_key(version, user_question, chat_id)
+            return await asyncio.wait_for(
+                self.in_flight.do_async(key, self._generate, system_context, version, user_question, data,
+                                        deadline=deadline, store=store, priority=INTERACTIVE,
+                                        fair_key=user_id if user_id is not None else chat_id),
+                timeout=deadline.timeout(),
+            )
+        except DeadlineExceeded:
+            raise
+        except asyncio.TimeoutError as e:
+            raise DeadlineExceeded("Request deadline exceeded") from e
+
+    def _flight_key(self, version: str, user_question: str, chat_id: Optional[int]) -> tuple:
+        """(single-flight key, whether the answer goes into the answer cache) for this chat."""
+        if chat_id is not None and self.answer_cache.is_bypassed(chat_id):
+            # Opted out of caching (/nocache): a key of its own, so it neither joins nor is joined
+            # by a shared generation, and its answer is not stored
+            return ("no-cache", chat_id, object()), False
+        return (version, normalize_question(user_question)), True
+
+    def _generate(self, system_context: str, version: str, user_question: str, data: Optional[ContextData] = None,
+                  deadline: Optional[Deadline] = None, store: bool = True) -> Optional[str]:
+        route = self.complexity.route(user_question)
+        small = self.analyzer.small_router
+        if route == SIMPLE and (small is None or not small.available()):
+            # The trimmed context only pays off with the small model: the main model gets the full one
+            route = ANALYTICAL
+        started = time.monotonic()
+        passages = self.retriever.passages(user_question, deadline) if self.retriever else None
+        if route == SIMPLE:
+            answer = self.analyzer.answer_with_system_context(
+                self.complexity.simple_context(system_context, version, data), user_question,
+                context_version=f"{version}:simple", fast=True, deadline=deadline, passages=passages
+            )
+        else:
+            answer = self.analyzer.answer_with_system_context(system_context, user_question, context_version=version,
+                                                              deadline=deadline, passages=passages)
+        self.complexity.record(route, time.monotonic() - started)
+        if answer and store:
+            self.answer_cache.set(user_question, version, answer)
+        return answer
+
+    def _update_forecast(self, version: str) -> None:
+        system_context, current_version, data = self.context_manager.get_versioned_data()
+        if current_version == version:
+            self.forecaster.get(system_context, version, data)
+
+    def _sync_retriever(self, version: str) -> None:
+        system_context, current_version, data = self.context_manager.get_versioned_data()
+        if current_version == version:
+            self.retriever.sync_in_background(system_context, version, data)
+
+    def _warm_models(self, version: str) -> None:
+        system_context, current_version, data = self.context_manager.get_versioned_data()
+        if current_version == version:
+            self.residency.warm_in_background(system_context, version,
+                                              self.complexity.simple_context(system_context, version, data))
+
+    def warm(self, user_question: str, version: str) -> bool:
+        """Precompute an answer for the given context version; False if it was already cached."""
+        system_context, current_version, data = self.context_manager.get_versioned_data()
+        if current_version != version or self.answer_cache.contains(user_question, version):
+            return False
+
+        key = (version, normalize_question(user_question))
+        return bool(self.in_flight.do(key, self._generate, system_context, version, user_question, data,
+                                      priority=BACKGROUND))
+
+    def report(self, name: str, priority: int = INTERACTIVE) -> Optional[dict]:
+        """Standard report (analyze_key_rate, predict_rate_change, predict_next_meeting_rate) for the current context.
+
+        Served from the warm-up results; generated on demand if warm-up has not reached it yet.
+        """
+        system_context, version, data = self.context_manager.get_versioned_data()
+        entry = self.warmer.get(name, version)
+        if entry is not None:
+            return entry
+
+        result = self.in_flight.do(("report", version, name), self.warmer.generate_report, name, system_context,
+                                   version, data, priority=priority)
+        if not result:
+            return None
+        self.warmer.store(name, version, result)
+        return self.warmer.get(name, version)
+
+    def stats(self) -> dict:
+        return {
+            "answer_cache": self.answer_cache.stats(),
+            "single_flight": self.in_flight.stats(),
+            "llm_scheduler": self.scheduler.stats(),
+            "rate_limits": self.rate_limiter.stats(),
+            "prompt_prefix": self.analyzer.prefix_stats.stats(),
+            "llm_router": self.analyzer.router.stats(),
+            "complexity_routes": self.complexity.stats(),
+            "direct_answers": self.direct_answers.stats(),
+            "retrieval": self.retriever.stats() if self.retriever else None,
+            "ollama_residency": self.residency.stats() if self.residency else None,
+            "ollama_hosts": {
+                provider.model: provider.pool.stats()
+                for provider in self.analyzer.router.providers if hasattr(provider, "pool")
+            },
+        }
+
+# Глобальный экземпляр
+qa_service = None
+
+def get_qa_service():
+    """Получить глобальный сервис ответов."""
+    global qa_service
+    if qa_service is None:
+        qa_service = QAService()
+    return qa_service
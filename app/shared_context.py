@@ -0,0 +1,149 @@
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Header: magic, context version (sha256[:16]), publish time (unix), payload length;
+# the payload may be followed by the structured data of the version (JSON)
+HEADER = struct.Struct("<8s16sdQ")
+MAGIC = b"CBRCTX01"
+
+
+def default_shared_context_path() -> str:
+    """Shared memory on Linux (/dev/shm), the temp directory elsewhere."""
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, "cbr_system_context")
+
+
+class SharedContextWriter:
+    """
+    Публикует системный контекст в файл для других процессов.
+
+    Новая версия пишется во временный файл и атомарно подменяет старый
+    (os.replace), поэтому читатели никогда не видят частично записанный контекст,
+    а уже отображенная старая версия остается валидной до перехода на новую.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, context: str, version: str, published_at: Optional[float] = None,
+              data: Optional[Dict] = None) -> None:
+        payload = context.encode("utf-8")
+        sidecar = json.dumps(data, ensure_ascii=False).encode("utf-8") if data is not None else b""
+        header = HEADER.pack(MAGIC, version.encode("ascii")[:16].ljust(16, b"\0"),
+                             published_at if published_at is not None else datetime.now().timestamp(),
+                             len(payload))
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".context-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(header)
+                f.write(payload)
+                f.write(sidecar)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        logger.info(f"Published shared context version {version} ({len(payload)} bytes) to {self.path}")
+
+
+class SharedContextReader:
+    """
+    Read-only memory mapping of the context published by SharedContextWriter.
+
+    Every worker maps the same file, so the published bytes live once in the
+    page cache (/dev/shm) however many workers run, instead of one read buffer
+    per process. refresh() is cheap when nothing changed (one stat call); on a
+    new version it only maps the file. The str the prompt path needs is decoded
+    from the mapping on first use, once per version, and the structured data is
+    parsed on first get_data().
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file_id = None
+        self._mmap = None
+        self._length = 0
+        self._context: Optional[str] = ""
+        self._version = None
+        self._published_at = None
+        self._data: Optional[Dict] = None
+        self._data_loaded = True
+
+    def refresh(self) -> bool:
+        """Pick up a newly published file; True if the context version changed."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            if file_id == self._file_id:
+                return False
+            if stat.st_size < HEADER.size:
+                return False
+
+            # The writer replaces the file atomically, so one mapping sees one complete version
+            with open(self.path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, published_at, length = HEADER.unpack_from(mapped, 0)
+            if magic != MAGIC or HEADER.size + length > len(mapped):
+                mapped.close()
+                logger.error(f"Invalid shared context file: {self.path}")
+                return False
+
+            version = version.rstrip(b"\0").decode("ascii")
+            changed = version != self._version
+            if changed:
+                old, self._mmap = self._mmap, mapped
+                self._length = length
+                self._context = None        # decoded on first get()
+                self._data_loaded = False   # parsed on first get_data()
+                self._version = version
+                self._published_at = datetime.fromtimestamp(published_at)
+            else:
+                old = mapped
+            self._file_id = file_id
+        if old is not None:
+            old.close()
+        return changed
+
+    def _decode(self, start: int, end: Optional[int] = None) -> str:
+        """Text of the mapped bytes [start:end] (caller holds the lock); no intermediate bytes copy."""
+        view = memoryview(self._mmap)[start:end]
+        try:
+            return str(view, "utf-8")
+        finally:
+            view.release()  # an exported buffer would keep the mapping from closing
+
+    def get(self) -> Tuple[str, Optional[str], Optional[datetime]]:
+        """(context, version, published_at) of the last read version."""
+        with self._lock:
+            if self._context is None:
+                self._context = self._decode(HEADER.size, HEADER.size + self._length)
+            return self._context, self._version, self._published_at
+
+    def get_data(self) -> Optional[Dict]:
+        """Structured data published with the last read version (None for files written without it)."""
+        with self._lock:
+            if not self._data_loaded:
+                self._data_loaded = True
+                sidecar = self._decode(HEADER.size + self._length)
+                try:
+                    self._data = json.loads(sidecar) if sidecar else None
+                except ValueError as e:
+                    logger.error(f"Unreadable structured data in {self.path}: {e}")
+                    self._data = None
+            return self._data
@@ -1,19 +1,52 @@
 import asyncio
+import hmac
+from collections import OrderedDict
+from typing import Optional
 from aiogram import Bot, Dispatcher, types
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
 from aiogram.filters import Command
 import os
 from dotenv import load_dotenv
-from app.llm.analyzer import LLMAnalyzer
-from app.context_manager import get_context_manager
-from app.data.fetcher import DataFetcher
-from app.data.cache import DataCache
+from app.qa_service import get_qa_service
+from app.utils.deadline import Deadline, DeadlineExceeded
+from app.utils.rate_limit import rate_limit_message
+from app.telegram_sender import get_telegram_sender
 from app.utils.logger import setup_logger
 
 load_dotenv()
 logger = setup_logger(__name__)
 
+def telegram_mode() -> str:
+    """TELEGRAM_MODE: 'polling' (default) or 'webhook'."""
+    return (os.getenv("TELEGRAM_MODE") or "polling").strip().lower()
+
+class SeenUpdates:
+    """Bounded LRU set of update_ids already handed to the dispatcher."""
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._ids = OrderedDict()
+
+    def contains(self, update_id: int) -> bool:
+        if update_id in self._ids:
+            self._ids.move_to_end(update_id)
+            return True
+        return False
+
+    def add(self, update_id: int) -> None:
+        self._ids[update_id] = None
+        self._ids.move_to_end(update_id)
+        if len(self._ids) > self.maxsize:
+            self._ids.popitem(last=False)
+
+    def seen(self, update_id: int) -> bool:
+        """Record update_id; True if it was already there."""
+        if self.contains(update_id):
+            return True
+        self.add(update_id)
+        return False
+
 class TelegramAnalyzerBot:
     def __init__(self):
         self.bot_token = os.getenv("TELEGRAM_BOT_TOKEN", "")
@@ -32,41 +65,82 @@ class TelegramAnalyzerBot:
         self.dp = Dispatcher()
 
         # Initialize components
-        self.context_manager = get_context_manager()  # System context manager
-        self.analyzer = LLMAnalyzer(
-            model=os.getenv("OPENROUTER_MODEL", "mistralai/mistral-7b-instruct:free"),
-            host=None  # For OpenRouter, no local host needed
-        )
+        self.qa_service = get_qa_service()  # Answer cache + LLM over system context
+        self.context_manager = self.qa_service.context_manager  # System context manager
+        self.analyzer = self.qa_service.analyzer
+        # End-to-end budget for answering one question (context + LLM + Telegram send)
+        self.request_deadline = float(os.getenv("REQUEST_DEADLINE", 90))
 
-        # Register handlers (only for polling mode - no webhooks)
+        # Register handlers (same handlers for polling and webhook mode)
         self.dp.message.register(self.handle_start_command, Command(commands=["start"]))
         self.dp.message.register(self.handle_help_command, Command(commands=["help"]))
+        self.dp.message.register(self.handle_nocache_command, Command(commands=["nocache"]))
         self.dp.message.register(self.handle_text_message)  # Fallback for other messages
 
         # Start background task for Telegram data updates
         self._telegram_update_task = None
 
-    def setup_webhook(self):
-        """Set up webhook for production deployment."""
-        if not self.production_webhook_url:
-            return
+        # Webhook mode (TELEGRAM_MODE=webhook): public base URL, secret token and
+        # the update_ids already seen, so Telegram's retried deliveries are dropped
+        self.webhook_url = os.getenv("TELEGRAM_WEBHOOK_URL", "")
+        self.webhook_secret = os.getenv("TELEGRAM_WEBHOOK_SECRET", "")
+        self.seen_updates = SeenUpdates(int(os.getenv("TELEGRAM_UPDATE_DEDUP_SIZE", 10000)))
+        self._webhook_tasks = set()
 
-        import requests
-        webhook_url = f"{self.production_webhook_url}/telegram-webhook"
-        telegram_api_url = f"https://api.telegram.org/bot{self.bot_token}/setWebhook"
+    async def setup_webhook(self) -> bool:
+        """Register the webhook with Telegram (TELEGRAM_WEBHOOK_URL + /telegram-webhook)."""
+        if not self.webhook_url:
+            logger.error("TELEGRAM_WEBHOOK_URL is not set, cannot use webhook mode")
+            return False
 
+        webhook_url = f"{self.webhook_url.rstrip('/')}/telegram-webhook"
         try:
-            response = requests.post(telegram_api_url, data={"url": webhook_url})
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("ok"):
-                    logger.info(f"Webhook set successfully to: {webhook_url}")
-                else:
-                    logger.error(f"Failed to set webhook: {data.get('description')}")
-            else:
-                logger.error(f"HTTP error setting webhook: {response.status_code}")
+            await self.bot.set_webhook(
+                webhook_url,
+                secret_token=self.webhook_secret or None,
+                allowed_updates=self.dp.resolve_used_update_types(),
+            )
+            logger.info(f"Webhook set successfully to: {webhook_url}")
+            return True
         except Exception as e:
             logger.error(f"Error setting webhook: {e}")
+            return False
+
+    def _start_data_updates(self):
+        # Subscribers read the context published by one refresher process and do not fetch data themselves
+        if self._telegram_update_task or self.context_manager.mode == "subscriber":
+            return
+        self._telegram_update_task = asyncio.create_task(self._update_telegram_data_background())
+        logger.info("Started background Telegram update task")
+
+    async def start_webhook(self):
+        """Webhook mode: updates arrive through FastAPI (see app/webhook.py) instead of long polling."""
+        self._start_data_updates()
+        await self.setup_webhook()
+
+    def check_secret(self, token: Optional[str]) -> bool:
+        """Compare the X-Telegram-Bot-Api-Secret-Token header with TELEGRAM_WEBHOOK_SECRET."""
+        if not self.webhook_secret:
+            return True
+        return token is not None and hmac.compare_digest(token, self.webhook_secret)
+
+    async def feed_update(self, data: dict) -> bool:
+        """Hand a webhook update to the dispatcher; False if it is a retried delivery already seen."""
+        update_id = data.get("update_id")
+        if update_id is not None and self.seen_updates.contains(update_id):
+            logger.info(f"Dropping duplicate update {update_id}")
+            return False
+
+        update = types.Update.model_validate(data, context={"bot": self.bot})
+        # Answer Telegram right away; the LLM answer is sent by the handler later
+        task = asyncio.create_task(self.dp.feed_update(self.bot, update))
+        self._webhook_tasks.add(task)
+        task.add_done_callback(self._webhook_tasks.discard)
+        # Marked only once the update is accepted: if validation raises, the webhook
+        # answers 500 and Telegram's retry of the same update is processed
+        if update_id is not None:
+            self.seen_updates.add(update_id)
+        return True
 
     async def handle_start_command(self, message: types.Message):
         """Handle /start command."""
@@ -98,6 +172,16 @@ class TelegramAnalyzerBot:
         )
         await message.reply(welcome_text, parse_mode=ParseMode.MARKDOWN)
 
+    async def handle_nocache_command(self, message: types.Message):
+        """Toggle answer cache bypass for the current chat."""
+        answer_cache = self.qa_service.answer_cache
+        bypass = not answer_cache.is_bypassed(message.chat.id)
+        answer_cache.set_bypass(message.chat.id, bypass)
+        if bypass:
+            await message.reply("Кэш ответов отключен для этого чата: каждый вопрос будет обработан заново.")
+        else:
+            await message.reply("Кэш ответов снова включен для этого чата.")
+
     async def handle_text_message(self, message: types.Message):
         """Handle general text messages (questions)."""
         user_question = message.text.strip()
@@ -106,27 +190,43 @@ class TelegramAnalyzerBot:
 
         logger.info(f"Received question from user {message.from_user.id}: {user_question}")
 
+        # Per-user and per-chat limits: reject before anything is queued for the LLM
+        retry_after = self.qa_service.rate_limiter.check(message.from_user.id, message.chat.id)
+        if retry_after > 0:
+            logger.info(f"Rate limit exceeded for user {message.from_user.id} in chat {message.chat.id}")
+            await message.reply(rate_limit_message(retry_after))
+            return
+
+        deadline = Deadline(self.request_deadline)
+
         # Send "thinking" message
         thinking_msg = await message.reply("🤔 Думаю над вашим вопросом...")
 
         try:
-            # Get current system context (automatically updated every CACHE_TTL seconds)
-            system_context = self.context_manager.get_context()
-
-            # Answer using efficient system context approach
-            answer = self.analyzer.answer_with_system_context(system_context, user_question)
+            # Answer using system context (automatically updated every CACHE_TTL seconds),
+            # repeat questions are served from the answer cache and identical
+            # in-flight questions share one generation
+            answer = await self.qa_service.answer_async(user_question, chat_id=message.chat.id, deadline=deadline,
+                                                        user_id=message.from_user.id)
 
             if answer:
-                # Limit message length for Telegram (4096 chars)
-                if len(answer) > 4000:
-                    answer = answer[:4000] + "\n\n[Ответ сокращен для Telegram]"
-                await message.reply(f"💡 {answer}")
+                # Long answers are split into several messages; sends respect Telegram limits.
+                # The answer is ready: give the send at least a few seconds even if the budget is nearly spent
+                await get_telegram_sender().send(
+                    message.chat.id, f"💡 {answer}", reply_to_message_id=message.message_id,
+                    timeout=max(5.0, deadline.timeout(cap=30))
+                )
             else:
                 await message.reply(
                     "❌ Извините, не удалось обработать ваш вопрос. "
                     "Возможно, проблема с подключением к ИИ. Попробуйте позже."
                 )
 
+        except DeadlineExceeded:
+            logger.warning(f"Question from user {message.from_user.id} exceeded the {self.request_deadline:.0f}s deadline")
+            await message.reply(
+                "⏳ Ответ готовится слишком долго. Попробуйте задать вопрос позже или сформулировать его короче."
+            )
         except Exception as e:
             logger.error(f"Error processing message: {e}")
             await message.reply(
@@ -145,18 +245,15 @@ class TelegramAnalyzerBot:
         while True:
             try:
                 logger.info("Starting scheduled Telegram data update...")
-                # Force update of Telegram data
-                cache = DataCache(ttl=update_interval)
-                fetcher = DataFetcher(
-                    news_api_key=os.getenv("NEWS_API_KEY", ""),
-                    economic_api_key=os.getenv("ECONOMIC_DATA_API_KEY", ""),
-                    cache=cache,
-                    telegram_api_id=int(os.getenv("TELEGRAM_API_ID", 0)) if os.getenv("TELEGRAM_API_ID") else None,
-                    telegram_api_hash=os.getenv("TELEGRAM_API_HASH", "")
-                )
+                # The context manager's fetcher: one PostLog writer per segment directory
+                fetcher = self.context_manager.fetcher
+                if fetcher is None:
+                    logger.warning("No data fetcher in this process, stopping Telegram updates")
+                    return
 
                 # Preload Telegram data (similar to preload_telegram_data.py)
-                result = fetcher._fetch_news_from_telegram()
+                # Blocking (runs its own event loop for Telethon): off the bot's loop
+                result = await asyncio.to_thread(fetcher._fetch_news_from_telegram)
                 if result and "centralbank_russia" in result:
                     logger.info("Scheduled Telegram data update successful")
                 else:
@@ -173,9 +270,7 @@ class TelegramAnalyzerBot:
         logger.info("Starting Telegram bot polling...")
 
         # Start background task for Telegram updates
-        if not self._telegram_update_task:
-            self._telegram_update_task = asyncio.create_task(self._update_telegram_data_background())
-            logger.info("Started background Telegram update task")
+        self._start_data_updates()
 
         try:
             await self.dp.start_polling(self.bot)
@@ -193,6 +288,10 @@ class TelegramAnalyzerBot:
                 pass
             logger.info("Telegram background update task cancelled")
 
+        for task in list(self._webhook_tasks):
+            task.cancel()
+
+        await get_telegram_sender().close()
         await self.bot.session.close()
         logger.info("Telegram bot stopped")
 
@@ -206,6 +305,10 @@ def init_telegram_bot():
         telegram_bot = TelegramAnalyzerBot()
     return telegram_bot
 
+def get_telegram_bot() -> Optional[TelegramAnalyzerBot]:
+    """The initialized bot or None."""
+    return telegram_bot
+
 async def start_telegram_bot():
     """Start the telegram bot (for background task)."""
     global telegram_bot
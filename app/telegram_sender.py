@@ -0,0 +1,317 @@
+import asyncio
+import os
+import time
+import weakref
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+import aiohttp
+from dotenv import load_dotenv
+from app.utils.logger import setup_logger
+from app.utils.retry import jittered_backoff
+
+load_dotenv()
+logger = setup_logger(__name__)
+
+TELEGRAM_API_URL = "https://api.telegram.org/bot{token}/{method}"
+MAX_MESSAGE_LENGTH = 4096
+
+
+def split_message(text: str, limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    """Split a long answer into Telegram-sized parts at paragraph, line or word boundaries."""
+    parts = []
+    while len(text) > limit:
+        cut = -1
+        for separator in ("\n\n", "\n", " "):
+            cut = text.rfind(separator, 0, limit)
+            if cut > limit // 2:
+                break
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text:
+        parts.append(text)
+    return parts
+
+
+class AsyncRateLimiter:
+    """Async token bucket; pause() stops all sends for Telegram's retry_after."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+
+# Outcomes of one send attempt
+SENT, RETRY, FAILED = "sent", "retry", "failed"
+
+
+class _Message:
+    """One answer to deliver: its parts are sent in order, one attempt at a time."""
+
+    def __init__(self, chat_id: int, parts: List[str], parse_mode: Optional[str], reply_to: Optional[int],
+                 expires_at: float, future: asyncio.Future):
+        self.chat_id = chat_id
+        self.parts = parts
+        self.parse_mode = parse_mode
+        self.reply_to = reply_to
+        self.expires_at = expires_at
+        self.future = future
+        self.index = 0
+        self.attempt = 0
+
+
+class _ChatState:
+    def __init__(self):
+        self.pending = deque()   # messages of this chat, in order
+        self.next_at = 0.0       # earliest time the next part may go out
+        self.scheduled = False   # waiting in the ready queue or on a timer
+
+
+class TelegramSender:
+    """
+    Асинхронная отправка ответов в Telegram через общий пул соединений aiohttp.
+
+    У каждого чата своя очередь сообщений; чат попадает в общую очередь
+    готовых, когда наступает его next_at (интервал между сообщениями в чате),
+    поэтому воркеры никогда не спят ради одного чата и многочастные ответы
+    не задерживают остальные чаты. Глобальный лимит (~30 сообщений/с) берется
+    непосредственно перед запросом. Ответ 429 приостанавливает отправку на
+    retry_after и не считается попыткой, ошибка разбора Markdown приводит к
+    повторной отправке простым текстом, длинные ответы делятся на части вместо
+    обрезания. Ожидание доставки ограничено timeout (send_timeout по
+    умолчанию): не доставленное к этому времени сообщение снимается с очереди.
+    """
+
+    def __init__(self, bot_token: str, global_rate: float = 30.0, chat_interval: float = 1.0,
+                 workers: int = 4, max_retries: int = 3, pool_size: int = 20, max_chats: int = 10000,
+                 send_timeout: float = 120.0):
+        self.bot_token = bot_token
+        self.global_limit = AsyncRateLimiter(global_rate)
+        self.chat_interval = chat_interval
+        self.workers = workers
+        self.max_retries = max_retries
+        self.pool_size = pool_size
+        self.max_chats = max_chats
+        self.send_timeout = send_timeout
+        self._chats = OrderedDict()
+        self._ready: Optional[asyncio.Queue] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._tasks = []
+        self.sent = 0
+        self.failed = 0
+        self.throttled = 0
+        self.plain_fallbacks = 0
+
+    def _start(self) -> None:
+        if self._ready is not None:
+            return
+        self._ready = asyncio.Queue()
+        if self._session is None:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.pool_size))
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def send(self, chat_id: int, text: str, parse_mode: Optional[str] = None,
+                   reply_to_message_id: Optional[int] = None, timeout: Optional[float] = None) -> bool:
+        """Queue a message (split into parts if needed) and wait until it is delivered, dropped or timed out."""
+        parts = split_message(text)
+        if not parts:
+            return True
+        self._start()
+        timeout = timeout if timeout is not None else self.send_timeout
+        future = asyncio.get_running_loop().create_future()
+        state = self._chat(chat_id)
+        state.pending.append(_Message(chat_id, parts, parse_mode, reply_to_message_id,
+                                      time.monotonic() + timeout, future))
+        self._schedule(chat_id, state)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            if not future.done():
+                # The worker drops it when the chat comes up
+                future.set_result(False)
+                self.failed += 1
+                logger.warning(f"Message to chat {chat_id} not delivered within {timeout:.0f}s, dropped")
+            return future.result()
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        # Nobody will send the queued messages anymore: release their callers
+        for state in self._chats.values():
+            for message in state.pending:
+                if not message.future.done():
+                    message.future.set_result(False)
+            state.pending.clear()
+            state.scheduled = False
+        if self._session is not None:
+            await self._session.close()
+        self._session = None
+        self._ready = None
+
+    def _chat(self, chat_id: int) -> _ChatState:
+        state = self._chats.get(chat_id)
+        if state is None:
+            state = self._chats[chat_id] = _ChatState()
+            # Bounded: forget idle chats first
+            for key in list(self._chats):
+                if len(self._chats) <= self.max_chats:
+                    break
+                if not self._chats[key].pending and not self._chats[key].scheduled:
+                    del self._chats[key]
+        self._chats.move_to_end(chat_id)
+        return state
+
+    def _schedule(self, chat_id: int, state: _ChatState) -> None:
+        """Put the chat into the ready queue at its next_at (at most once at a time, so parts stay in order)."""
+        if state.scheduled or not state.pending:
+            return
+        state.scheduled = True
+        delay = state.next_at - time.monotonic()
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self._make_ready, chat_id)
+        else:
+            self._make_ready(chat_id)
+
+    def _make_ready(self, chat_id: int) -> None:
+        if self._ready is not None:
+            self._ready.put_nowait(chat_id)
+
+    async def _worker(self) -> None:
+        while True:
+            chat_id = await self._ready.get()
+            state = self._chats.get(chat_id)
+            if state is None or not state.pending:
+                if state is not None:
+                    state.scheduled = False
+                continue
+            message = state.pending[0]
+            if message.future.done():
+                # Timed out while waiting for its turn
+                state.pending.popleft()
+                state.scheduled = False
+                self._schedule(chat_id, state)
+                continue
+            try:
+                outcome = await self._send_part(state, message)
+            except Exception as e:
+                logger.error(f"Error sending message to chat {chat_id}: {e}")
+                outcome = FAILED
+
+            if outcome == SENT:
+                message.index += 1
+                message.attempt = 0
+                if message.index == len(message.parts):
+                    self._finish(state, True)
+            elif outcome == FAILED:
+                self.failed += 1
+                self._finish(state, False)
+            state.scheduled = False
+            self._schedule(chat_id, state)
+
+    @staticmethod
+    def _finish(state: _ChatState, delivered: bool) -> None:
+        message = state.pending.popleft()
+        if not message.future.done():
+            message.future.set_result(delivered)
+
+    async def _send_part(self, state: _ChatState, message: _Message) -> str:
+        """One attempt to send the current part; on RETRY state.next_at says when to try again."""
+        if message.attempt > self.max_retries:
+            return FAILED
+        payload = {"chat_id": message.chat_id, "text": message.parts[message.index]}
+        if message.parse_mode:
+            payload["parse_mode"] = message.parse_mode
+        if message.reply_to and message.index == 0:
+            payload["reply_parameters"] = {"message_id": message.reply_to, "allow_sending_without_reply": True}
+
+        # The global token is taken right before the request, never ahead of an idle wait
+        await self.global_limit.acquire()
+        state.next_at = time.monotonic() + self.chat_interval
+        try:
+            async with self._session.post(
+                TELEGRAM_API_URL.format(token=self.bot_token, method="sendMessage"),
+                json=payload, timeout=aiohttp.ClientTimeout(total=min(30.0, max(1.0, message.expires_at - time.monotonic())))
+            ) as response:
+                data = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            message.attempt += 1
+            logger.warning(f"Telegram send to chat {message.chat_id} failed ({e}), attempt {message.attempt}")
+            state.next_at = max(state.next_at, time.monotonic() + jittered_backoff(message.attempt))
+            return RETRY
+
+        if data.get("ok"):
+            self.sent += 1
+            return SENT
+
+        code = data.get("error_code")
+        description = data.get("description", "")
+        if code == 429:
+            retry_after = (data.get("parameters") or {}).get("retry_after", 1)
+            self.throttled += 1
+            logger.warning(f"Telegram flood limit, pausing sends for {retry_after}s")
+            # Absorbed by pausing: not an attempt, the send wait (timeout) bounds it
+            self.global_limit.pause(retry_after)
+            return RETRY
+        if code == 400 and message.parse_mode and "parse" in description.lower():
+            # Broken Markdown in the LLM answer: send the same text without formatting
+            logger.warning(f"Telegram could not parse entities, sending plain text: {description}")
+            self.plain_fallbacks += 1
+            message.parse_mode = None
+            return RETRY
+        if code is not None and code >= 500:
+            message.attempt += 1
+            state.next_at = max(state.next_at, time.monotonic() + jittered_backoff(message.attempt))
+            return RETRY
+
+        logger.error(f"Failed to send message to chat {message.chat_id}: {code} {description}")
+        return FAILED
+
+    def stats(self) -> Dict:
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "throttled": self.throttled,
+            "plain_fallbacks": self.plain_fallbacks,
+            "queued": sum(len(state.pending) for state in self._chats.values()),
+        }
+
+
+# aiohttp sessions and asyncio queues belong to one event loop: one sender per loop
+_senders = weakref.WeakKeyDictionary()
+
+def get_telegram_sender() -> TelegramSender:
+    """Sender for the running event loop (bot polling or FastAPI webhook)."""
+    loop = asyncio.get_running_loop()
+    sender = _senders.get(loop)
+    if sender is None:
+        sender = _senders[loop] = TelegramSender(
+            os.getenv("TELEGRAM_BOT_TOKEN", ""),
+            global_rate=float(os.getenv("TELEGRAM_GLOBAL_RATE", 30)),
+            chat_interval=float(os.getenv("TELEGRAM_CHAT_INTERVAL", 1.0)),
+            workers=int(os.getenv("TELEGRAM_SENDER_WORKERS", 4)),
+            send_timeout=float(os.getenv("TELEGRAM_SEND_TIMEOUT", 120)),
+        )
+    return sender
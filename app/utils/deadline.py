@@ -0,0 +1,69 @@
+import threading
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request deadline passed or the work was cancelled."""
+
+
+class Deadline:
+    """
+    End-to-end deadline of one user request.
+
+    Created in the bot/webhook handler and passed down through context
+    retrieval, LLM generation and the Telegram send. Long-running work checks
+    it between steps (e.g. between streamed chunks) and stops when it expires
+    or when cancel() is called because nobody waits for the result anymore.
+    """
+
+    def __init__(self, timeout: Optional[float] = None, expires_at: Optional[float] = None,
+                 parent: Optional["Deadline"] = None):
+        if expires_at is None:
+            expires_at = time.monotonic() + timeout if timeout is not None else float("inf")
+        self.expires_at = expires_at
+        self.parent = parent
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    def child(self) -> "Deadline":
+        """Deadline that can be cancelled on its own but also ends with this one."""
+        return Deadline(parent=self)
+
+    def remaining(self) -> float:
+        """Seconds left (0 when expired or cancelled, inf without a limit)."""
+        if self.cancelled:
+            return 0.0
+        remaining = max(0.0, self.expires_at - time.monotonic())
+        if self.parent is not None:
+            remaining = min(remaining, self.parent.remaining())
+        return remaining
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: Optional[float] = None) -> Optional[float]:
+        """Remaining time usable as a network timeout (None = no limit)."""
+        remaining = self.remaining()
+        if remaining == float("inf"):
+            return cap
+        return min(remaining, cap) if cap is not None else remaining
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise DeadlineExceeded("Request cancelled")
+        if self.expired:
+            raise DeadlineExceeded("Request deadline exceeded")
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set() or (self.parent is not None and self.parent.cancelled)
+
+    def extend_to(self, expires_at: float) -> None:
+        """Push the deadline later (shared work keeps the latest deadline of its waiters)."""
+        with self._lock:
+            self.expires_at = max(self.expires_at, expires_at)
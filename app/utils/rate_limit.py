@@ -0,0 +1,114 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class RateLimiter:
+    """
+    Token bucket per key (user or chat): `rate` tokens per second, up to `burst`.
+
+    Buckets live in a bounded LRU, so memory stays flat with many users; an
+    evicted key simply starts again with a full bucket.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+
+    def _tokens(self, key: Hashable, now: float) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return self.burst
+        tokens, updated_at = bucket
+        return min(self.burst, tokens + (now - updated_at) * self.rate)
+
+    def wait_time(self, key: Hashable, now: float) -> float:
+        """Seconds until one token is available (0 = allowed now)."""
+        tokens = self._tokens(key, now)
+        if tokens >= 1.0:
+            return 0.0
+        return (1.0 - tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def consume(self, key: Hashable, now: float) -> None:
+        self._buckets[key] = (self._tokens(key, now) - 1.0, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class UserRateLimiter:
+    """
+    Лимиты запросов к LLM на пользователя и на чат.
+
+    Запрос проходит, только если токен есть в обоих ведрах; при отказе ни одно
+    ведро не списывается, а пользователь сразу получает время ожидания.
+    """
+
+    def __init__(self, user_rate: float, user_burst: float, chat_rate: float, chat_burst: float,
+                 max_keys: int = 10000, enabled: bool = True):
+        self.enabled = enabled
+        self.users = RateLimiter(user_rate, user_burst, max_keys)
+        self.chats = RateLimiter(chat_rate, chat_burst, max_keys)
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+
+    def check(self, user_id: Optional[int], chat_id: Optional[int]) -> float:
+        """Consume a request for the user and chat; returns 0 if allowed, else seconds to wait."""
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            wait = 0.0
+            if user_id is not None:
+                wait = max(wait, self.users.wait_time(user_id, now))
+            if chat_id is not None:
+                wait = max(wait, self.chats.wait_time(chat_id, now))
+            if wait > 0:
+                self.rejected += 1
+                return wait
+
+            if user_id is not None:
+                self.users.consume(user_id, now)
+            if chat_id is not None:
+                self.chats.consume(chat_id, now)
+            self.allowed += 1
+            return 0.0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "allowed": self.allowed,
+                "rejected": self.rejected,
+                "tracked_users": len(self.users),
+                "tracked_chats": len(self.chats),
+            }
+
+
+def rate_limit_message(retry_after: float) -> str:
+    """Reply for a user who went over the limit."""
+    return f"⏳ Слишком много запросов. Попробуйте снова через {max(1, math.ceil(retry_after))} сек."
+
+
+def create_rate_limiter_from_env() -> UserRateLimiter:
+    """RATE_LIMIT_* settings; rates are given per minute."""
+    return UserRateLimiter(
+        user_rate=float(os.getenv("RATE_LIMIT_USER_PER_MINUTE", 6)) / 60.0,
+        user_burst=float(os.getenv("RATE_LIMIT_USER_BURST", 3)),
+        chat_rate=float(os.getenv("RATE_LIMIT_CHAT_PER_MINUTE", 20)) / 60.0,
+        chat_burst=float(os.getenv("RATE_LIMIT_CHAT_BURST", 10)),
+        max_keys=int(os.getenv("RATE_LIMIT_MAX_KEYS", 10000)),
+        enabled=(os.getenv("RATE_LIMIT_ENABLED") or "true").lower() in ("true", "1", "yes", "on"),
+    )
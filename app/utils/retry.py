@@ -0,0 +1,56 @@
+import random
+import threading
+
+
+def jittered_backoff(attempt: int, base: float = 0.5, cap: float = 8.0) -> float:
+    """Full-jitter exponential backoff: random delay in [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Errors worth retrying: timeouts, connection problems, 429 and 5xx responses."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+
+    status = getattr(error, "status_code", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+
+    name = type(error).__name__.lower()
+    return any(marker in name for marker in ("timeout", "connect", "ratelimit", "unavailable"))
+
+
+class RetryBudget:
+    """
+    Limits retries to a fraction of regular requests so that a provider outage
+    does not multiply the load (token bucket: every request deposits `ratio`
+    tokens, every retry withdraws one).
+    """
+
+    def __init__(self, ratio: float = 0.2, min_tokens: float = 5.0, max_tokens: float = 50.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = min_tokens
+        self.retries = 0
+        self.denied = 0
+        self._lock = threading.Lock()
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_retry(self) -> bool:
+        with self._lock:
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                self.retries += 1
+                return True
+            self.denied += 1
+            return False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"tokens": round(self.tokens, 2), "retries": self.retries, "denied": self.denied}
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Hashable, Optional
+from app.utils.deadline import Deadline
+
+
+class _Call:
+    def __init__(self, future: Future, deadline: Optional[Deadline]):
+        self.future = future
+        self.deadline = deadline
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+
+    The first caller starts the work; callers arriving while it is in flight
+    wait for the same result instead of starting another call. Works from
+    threads and from any asyncio event loop.
+
+    With a deadline, the work receives a shared Deadline that lasts as long as
+    the latest waiter's deadline and is cancelled when every waiter gave up.
+    A priority and fair_key (the user) are passed to the submit function (e.g.
+    LLMScheduler.submit); a queued call is promoted when a higher-priority
+    caller joins it.
+    """
+
+    def __init__(self, submit: Optional[Callable[..., Future]] = None, max_workers: int = 8):
+        self._lock = threading.Lock()
+        self._calls = {}
+        if submit is None:
+            submit = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="singleflight").submit
+        self._submit = submit
+        self.started = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    def _join(self, key: Hashable, fn: Callable, args, kwargs, deadline: Optional[Deadline],
+              priority: Optional[int] = None, fair_key: Optional[Hashable] = None) -> _Call:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                if call.deadline is not None:
+                    call.deadline.extend_to(deadline.expires_at if deadline else float("inf"))
+                if priority is not None and hasattr(call.future, "promote"):
+                    call.future.promote(priority)
+            else:
+                shared = None
+                if deadline is not None:
+                    shared = Deadline(expires_at=deadline.expires_at)
+                    kwargs = dict(kwargs, deadline=shared)
+                submit_kwargs = {}
+                if priority is not None:
+                    submit_kwargs["priority"] = priority
+                if fair_key is not None:
+                    submit_kwargs["fair_key"] = fair_key
+                call = _Call(self._submit(fn, *args, **submit_kwargs, **kwargs), shared)
+                self._calls[key] = call
+                self.started += 1
+            call.waiters += 1
+
+        call.future.add_done_callback(lambda _: self._forget(key, call))
+        return call
+
+    def _leave(self, call: _Call) -> None:
+        with self._lock:
+            call.waiters -= 1
+            abandoned = call.waiters == 0 and not call.future.done()
+            if abandoned:
+                self.abandoned += 1
+        if abandoned:
+            # Nobody waits for the result anymore: stop the work
+            if call.deadline is not None:
+                call.deadline.cancel()
+            call.future.cancel()
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+
+    def future(self, key: Hashable, fn: Callable, *args, priority: Optional[int] = None, **kwargs) -> Future:
+        """Return the in-flight future for key, starting fn if nothing is running (not counted as a waiter)."""
+        call = self._join(key, fn, args, kwargs, None, priority)
+        with self._lock:
+            call.waiters -= 1
+        return call.future
+
+    def do(self, key: Hashable, fn: Callable, *args, deadline: Optional[Deadline] = None,
+           priority: Optional[int] = None, fair_key: Optional[Hashable] = None, **kwargs):
+        """Blocking variant."""
+        call = self._join(key, fn, args, kwargs, deadline, priority, fair_key)
+        try:
+            return call.future.result(timeout=deadline.timeout() if deadline else None)
+        finally:
+            self._leave(call)
+
+    async def do_async(self, key: Hashable, fn: Callable, *args, deadline: Optional[Deadline] = None,
+                       priority: Optional[int] = None, fair_key: Optional[Hashable] = None, **kwargs):
+        """Await the shared result without blocking the event loop."""
+        call = self._join(key, fn, args, kwargs, deadline, priority, fair_key)
+        try:
+            # shield: a cancelled waiter must not cancel the call shared with others
+            return await asyncio.shield(asyncio.wrap_future(call.future))
+        finally:
+            self._leave(call)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "started": self.started,
+                "coalesced": self.coalesced,
+                "abandoned": self.abandoned,
+            }
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Backtest of the next-meeting rate prediction over past Bank of Russia meetings.
+
+Meetings come from the full calendar (the structured data published with the
+context, or the latest calendar in the snapshot store). For every past meeting
+the system context is rebuilt from the source inputs stored before it
+(SNAPSHOT_STORE_PATH), or cut back from the stored context (the snapshot by
+default) when the store does not reach that far. The predict_next_meeting_rate
+prompt is run against the chosen provider in parallel, and the predicted rate
+is scored against the realized decision. Completed runs are cached in a JSONL
+file keyed by provider, model and settings, so changing nothing re-scores
+instantly and an interrupted run resumes.
+
+    python backtest.py --provider hold                 # local stub, no LLM
+    python backtest.py --provider llm --workers 8      # LLMAnalyzer with the .env configuration
+    python backtest.py --provider llm --since 2022-01-01 --context saved_context.txt
+"""
+import argparse
+import functools
+import json
+import os
+import sys
+from datetime import date, datetime
+from dotenv import load_dotenv
+from app.context_manager import context_from_store
+from app.context_sections import ContextData
+from app.data.meetings import MeetingCalendar
+from app.data.snapshot_store import SnapshotStore
+from app.shared_context import SharedContextReader, default_shared_context_path
+from app.llm.backtest import BacktestRunner, baseline_provider, hold_provider, replay_meetings
+
+load_dotenv()
+
+
+def load_context(path: str):
+    """(context, ContextData) from a plain text file, or a snapshot/shared context file written by SharedContextWriter."""
+    if not path.endswith(".txt"):
+        reader = SharedContextReader(path)
+        if reader.refresh():
+            context = reader.get()[0]
+            data = reader.get_data()
+            return context, ContextData.from_dict(data) if data else ContextData.from_context(context)
+    with open(path, "r", encoding="utf-8") as f:
+        context = f.read()
+    return context, ContextData.from_context(context)
+
+
+def load_store():
+    path = os.getenv("SNAPSHOT_STORE_PATH", "app/data/cache/snapshots")
+    return SnapshotStore(path) if path and os.path.isdir(path) else None
+
+
+def make_provider(name: str):
+    """(provider, settings that go into the result cache key)."""
+    if name == "hold":
+        return hold_provider, None
+    if name == "baseline":
+        return baseline_provider, None
+    if name == "llm":
+        from app.llm.analyzer import LLMAnalyzer
+        analyzer = LLMAnalyzer()
+        # Provider failures must reach the runner as errors, so a resumed run retries them
+        return (functools.partial(analyzer.predict_next_meeting_rate, raise_errors=True),
+                [provider.config() for provider in analyzer.router.providers])
+    raise ValueError(f"Unknown provider: {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--provider", choices=["hold", "baseline", "llm"], default="hold")
+    parser.add_argument("--context", default=None,
+                        help="stored context (default: CONTEXT_SNAPSHOT_PATH, then the shared context)")
+    parser.add_argument("--since", type=date.fromisoformat, default=None)
+    parser.add_argument("--until", type=date.fromisoformat, default=None)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("BACKTEST_WORKERS", 4)))
+    parser.add_argument("--results", default=os.getenv("BACKTEST_RESULTS_PATH", "app/data/cache/backtest_results.jsonl"))
+    args = parser.parse_args()
+
+    candidates = [args.context] if args.context else [
+        os.getenv("CONTEXT_SNAPSHOT_PATH", "app/data/cache/context_snapshot.bin"),
+        os.getenv("SHARED_CONTEXT_PATH") or default_shared_context_path(),
+    ]
+    context_path = next((path for path in candidates if path and os.path.exists(path)), None)
+    if context_path is None:
+        print(f"No stored context found ({', '.join(filter(None, candidates))}); run the bot or API once first")
+        return 1
+
+    system_context, data = load_context(context_path)
+    store = load_store()
+    if store is not None:
+        # Contexts published before the structured data carry only the rendered calendar window
+        latest = store.as_of("meetings", datetime.now())
+        calendar = MeetingCalendar.from_input(latest[2]) if latest else None
+        if calendar is not None and len(calendar) > len(data.calendar):
+            data.calendar = calendar
+
+    meetings = replay_meetings(system_context, since=args.since, until=args.until, data=data)
+    if not meetings:
+        print("No past meetings with a known decision in the stored context")
+        return 1
+
+    provider, provider_config = make_provider(args.provider)
+    history = (lambda moment: context_from_store(store, moment)) if store is not None else None
+    runner = BacktestRunner(provider, args.provider, args.results, workers=args.workers,
+                            provider_config=provider_config, history=history)
+    report = runner.run(system_context, meetings, data)
+    print(json.dumps({"provider": args.provider, "context": context_path, **report}, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
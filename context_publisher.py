@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Single refresher process for multi-worker deployments.
+
+Fetches data, builds the system context every CACHE_TTL seconds and publishes
+each version to SHARED_CONTEXT_PATH. API workers and bot replicas started with
+CONTEXT_MODE=subscriber map that file instead of fetching data themselves.
+"""
+import signal
+import sys
+import threading
+from dotenv import load_dotenv
+from app.context_manager import SystemContextManager
+from app.utils.logger import setup_logger
+
+load_dotenv()
+logger = setup_logger(__name__)
+
+def main():
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+
+    manager = SystemContextManager(mode="publisher")
+    digest = getattr(manager.fetcher, "news_digest", None)
+    if digest is not None and digest.uses_llm:
+        # No QA service here: the publisher's own analyzer summarizes in the background of its scheduler
+        from app.llm.analyzer import LLMAnalyzer
+        from app.llm.scheduler import create_llm_scheduler_from_env
+        digest.attach_llm(LLMAnalyzer(), create_llm_scheduler_from_env().submit)
+    logger.info(f"Context publisher running (version {manager.context_version}, interval {manager.update_interval}s)")
+    stop.wait()
+    logger.info("Context publisher stopped")
+
+if __name__ == "__main__":
+    sys.exit(main())
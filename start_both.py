@@ -7,9 +7,10 @@ import asyncio
 import sys
 import signal
 import threading
+import os
 from dotenv import load_dotenv
 from app.main import app
-from app.telegram_bot import init_telegram_bot, start_telegram_bot, stop_telegram_bot
+from app.telegram_bot import init_telegram_bot, start_telegram_bot, stop_telegram_bot, telegram_mode
 from app.utils.logger import setup_logger
 import uvicorn
 
@@ -21,7 +22,7 @@ async def run_fastapi():
     config = uvicorn.Config(
         app=app,
         host="0.0.0.0",
-        port=8000,
+        port=int(os.getenv("PORT", 8000)),
         reload=False,
         log_level="info"
     )
@@ -38,7 +39,14 @@ async def run_bot():
         raise
 
 async def main():
-    """Main function to run bot with polling (simpler approach for Railway)."""
+    """Main function to run the bot: long polling (default) or webhook mode inside FastAPI."""
+    if telegram_mode() == "webhook":
+        # The FastAPI startup hook initializes the bot and registers the webhook;
+        # several instances can run behind a load balancer
+        logger.info("Starting CBR Analysis Bot in webhook mode...")
+        await run_fastapi()
+        return
+
     logger.info("Starting CBR Analysis Bot with polling...")
 
     # Initialize bot and start polling
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: import time of the entry modules, measured with `python -X importtime`.
+
+Each module is imported in a fresh interpreter. The script reports the total
+import time, the slowest imports and whether heavy libraries that must load
+lazily (on first use of the provider or source that needs them) were
+imported at startup. Exits with status 1 if they were.
+
+    python startup_benchmark.py
+    python startup_benchmark.py app.telegram_bot --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ENTRY_MODULES = ["app.main", "app.webhook", "app.telegram_bot"]
+LAZY_MODULES = ["ollama", "openai", "telethon", "bs4", "pandas"]
+
+
+def measure(module: str, repeat: int = 3):
+    """Best of `repeat` runs: {module_name: (self_us, cumulative_us)} and the total in microseconds."""
+    best = None
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+        timings = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            timings[name.strip()] = (int(self_us), int(cumulative_us))
+        total = timings.get(module, (0, 0))[1]
+        if best is None or total < best[1]:
+            best = (timings, total)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=ENTRY_MODULES)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to show")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    eager = False
+    for module in args.modules:
+        timings, total = measure(module, args.repeat)
+        print(f"\n{module}: {total / 1000:.0f} ms")
+        slowest = sorted(timings.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (_, cumulative) in [item for item in slowest if item[0] != module][:args.top]:
+            print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+        loaded = [name for name in LAZY_MODULES if name in timings]
+        if loaded:
+            eager = True
+            print(f"  ! imported at startup (should be lazy): {', '.join(loaded)}")
+
+    return 1 if eager else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+from app.llm.answer_cache import AnswerCache, normalize_question
+
+def test_normalize_question():
+    """Punctuation, case and ё differences share a key."""
+    assert normalize_question("Какая сейчас ключевая ставка?") == normalize_question("  какая  сейчас ключевая ставка ")
+    assert normalize_question("Ещё 16.5% ставка?") == "еще 16.5% ставка"
+
+def test_cache_hit_and_version_invalidation():
+    """Answers are served only for the context version they were generated with."""
+    cache = AnswerCache()
+    cache.set("Какая ставка?", "v1", "16%")
+
+    assert cache.get("какая ставка", "v1") == "16%"
+    assert cache.get("какая ставка", "v2") is None
+
+    cache.invalidate("v2")
+    assert cache.get("какая ставка", "v1") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["entries"] == 0
+
+def test_chat_bypass():
+    """Bypassed chats never receive cached answers."""
+    cache = AnswerCache()
+    cache.set("Какая ставка?", "v1", "16%")
+    cache.set_bypass(42)
+
+    assert cache.get("Какая ставка?", "v1", chat_id=42) is None
+    assert cache.get("Какая ставка?", "v1", chat_id=7) == "16%"
+    assert cache.stats()["bypassed"] == 1
+
+
+def test_question_log_saves_off_the_calling_thread(tmp_path, monkeypatch):
+    import json
+    import threading
+    import time
+    from app.llm import question_log
+    from app.llm.question_log import QuestionLog
+
+    writers = []
+    real_dump = json.dump
+
+    def recording_dump(*args, **kwargs):
+        writers.append(threading.current_thread().name)
+        return real_dump(*args, **kwargs)
+
+    monkeypatch.setattr(question_log.json, "dump", recording_dump)
+    path = tmp_path / "question_log.json"
+    log = QuestionLog(str(path), save_every=2)
+    log.record("Какая ставка?")
+    log.record("какая ставка")
+    for _ in range(100):
+        if path.exists():
+            break
+        time.sleep(0.01)
+
+    assert writers == ["question-log-save"]
+    assert json.loads(path.read_text(encoding="utf-8"))["какая ставка"]["count"] == 2
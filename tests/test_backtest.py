@@ -0,0 +1,111 @@
+import threading
+from datetime import date
+from app.context_manager import SystemContextManager
+from app.context_sections import ContextData, ContextSections
+from app.data.key_rates import KeyRateSeries
+from app.data.meetings import MeetingCalendar
+from app.llm.backtest import BacktestRunner, context_as_of, hold_provider, parse_predicted_rate, replay_meetings
+from tests.test_forecast import CONTEXT
+
+CALENDAR_CONTEXT = CONTEXT.replace("НАУЧНЫЕ СТАТЬИ:", """ЗАСЕДАНИЯ СОВЕТА ДИРЕКТОРОВ ПО КЛЮЧЕВОЙ СТАВКЕ:
+Следующее заседание: 13.09.2024
+Предстоящие: 13.09.2024
+Прошедшие: 26.07.2024, 07.06.2024, 26.04.2024, 15.12.2023
+Источник: локальный календарь (meeting_calendar.txt)
+
+НАУЧНЫЕ СТАТЬИ:""")
+
+
+def test_context_as_of_hides_the_future():
+    as_of = context_as_of(CALENDAR_CONTEXT, date(2024, 7, 26))
+
+    assert "- 18.12.2023: 16.00%" in as_of and "- 29.07.2024: 18.00%" not in as_of
+    assert "повысил ключевую ставку до 18%" not in as_of
+    assert "- 2023: 7.4%" in as_of
+    assert "Следующее заседание: 26.07.2024" in as_of
+
+
+def test_replay_scores_and_resumes(tmp_path):
+    meetings = replay_meetings(CALENDAR_CONTEXT, today=date(2024, 9, 1))
+    assert [(m["date"], m["rate_before"], m["rate_after"]) for m in meetings] == [
+        (date(2023, 12, 15), 12.0, 16.0), (date(2024, 4, 26), 16.0, 16.0),
+        (date(2024, 6, 7), 16.0, 16.0), (date(2024, 7, 26), 16.0, 18.0),
+    ]
+
+    calls = []
+    lock = threading.Lock()
+
+    def provider(*args):
+        with lock:
+            calls.append(args[1])
+        return hold_provider(*args)
+
+    results = str(tmp_path / "results.jsonl")
+    report = BacktestRunner(provider, "hold", results, workers=4).run(CALENDAR_CONTEXT, meetings)
+    assert report["run"] == len(meetings) and report["unparsed"] == 0
+    assert report["direction_accuracy"] == 0.5  # both holds right, both hikes missed
+    assert report["mae_pp"] == 1.5
+
+    again = BacktestRunner(provider, "hold", results, workers=4).run(CALENDAR_CONTEXT, meetings)
+    assert again["cached"] == len(meetings) and len(calls) == len(meetings)
+
+
+def test_parse_predicted_rate():
+    assert parse_predicted_rate("1. Прогнозная ставка после заседания: **17,5%**") == 17.5
+    # A percentage outside the expected answer line is not a prediction
+    assert parse_predicted_rate("Инфляция 7,4%, ставку вероятно сохранят") is None
+    assert parse_predicted_rate(None) is None
+
+
+def test_replay_uses_the_full_calendar_with_holds():
+    data = ContextData.from_context(CONTEXT)
+    # Twelve meetings in 2023-2024, more than the rendered calendar shows
+    data.calendar = MeetingCalendar([date(2023, 2, 10), date(2023, 3, 17), date(2023, 4, 28), date(2023, 6, 9),
+                                     date(2023, 7, 21), date(2023, 8, 15), date(2023, 9, 15), date(2023, 10, 27),
+                                     date(2023, 12, 15), date(2024, 2, 16), date(2024, 3, 22), date(2024, 4, 26)])
+    meetings = replay_meetings(CONTEXT, today=date(2024, 9, 1), data=data)
+    assert len(meetings) == 7  # meetings before the first known rate are skipped
+    assert sum(m["rate_before"] == m["rate_after"] for m in meetings) == 5
+
+
+def test_history_and_provider_config_shape_the_replay(tmp_path):
+    sections = ContextSections()
+    sections.update({"key_rates": "ИСТОРИЯ ИЗМЕНЕНИЙ КЛЮЧЕВОЙ СТАВКИ:\n- 18.12.2023: 16.00%\n"
+                                  "Источник: Банк России", "news": "- 20.07.2024 | Новость из архива"})
+    asked = []
+
+    def history(moment):
+        asked.append(moment)
+        context, data = SystemContextManager._render(sections, moment)
+        return context, sections.version(), data
+
+    meeting = {"date": date(2024, 7, 26), "rate_before": 16.0, "rate_after": 18.0}
+    results = str(tmp_path / "results.jsonl")
+    runner = BacktestRunner(hold_provider, "hold", results, history=history)
+    prepared = runner.prepare(CALENDAR_CONTEXT, meeting)
+    assert prepared["context"] == "history" and asked[0].date() == date(2024, 7, 26)
+    assert "Новость из архива" in prepared["inputs"]["data_text"]
+    assert prepared["inputs"]["upcoming_dates"] == ["26.07.2024", "13.09.2024"]
+
+    other_model = BacktestRunner(hold_provider, "hold", results, provider_config=[{"model": "qwen3:8b"}])
+    assert other_model.prepare(CALENDAR_CONTEXT, meeting)["key"] != BacktestRunner(
+        hold_provider, "hold", results, provider_config=[{"model": "qwen3:14b"}]).prepare(CALENDAR_CONTEXT, meeting)["key"]
+
+
+def test_empty_answers_are_errors_and_run_again(tmp_path):
+    meetings = replay_meetings(CALENDAR_CONTEXT, today=date(2024, 9, 1))
+    calls = []
+    lock = threading.Lock()
+
+    def outage(*args):
+        with lock:
+            calls.append(args[1])
+        return None
+
+    results = str(tmp_path / "results.jsonl")
+    report = BacktestRunner(outage, "llm", results).run(CALENDAR_CONTEXT, meetings)
+    assert report["run"] == len(meetings) and report["errors"] == len(meetings)
+
+    resumed = BacktestRunner(hold_provider, "llm", results).run(CALENDAR_CONTEXT, meetings)
+    assert len(calls) == len(meetings)
+    assert resumed["cached"] == 0 and resumed["unparsed"] == 0
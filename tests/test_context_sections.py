@@ -0,0 +1,151 @@
+from datetime import date
+from app.context_manager import SystemContextManager
+from app.context_sections import ContextData, ContextSections, fetch_section_inputs
+from app.data.fetcher import DataFetcher
+from app.data.meetings import MeetingCalendar
+
+
+class FakeFetcher:
+    def __init__(self):
+        self.news = "- Новость 1\nОбновлено: 2024-05-01 10:00:00"
+        self.key_rates = "ИСТОРИЯ ИЗМЕНЕНИЙ КЛЮЧЕВОЙ СТАВКИ:\n- 2024-04-26: 16.00%"
+        self.calendar = MeetingCalendar()
+
+    def fetch_news_data(self):
+        return self.news
+
+    def _fetch_cbr_key_rates_history(self):
+        return self.key_rates
+
+    def _fetch_inflation_history(self):
+        return "- 2023: 7.4%"
+
+    def _fetch_gdp_history(self):
+        return "- 2023: $2021 млрд"
+
+    def fetch_meeting_calendar(self):
+        return self.calendar
+
+    def fetch_scientific_articles(self):
+        return ""
+
+
+def test_only_changed_sections_are_rerendered():
+    sections = ContextSections()
+    inputs = {"news": "- a\nОбновлено: 2024-05-01 10:00:00", "key_rates": "- 16%", "inflation": "- 7%", "gdp": "- 2", "articles": ""}
+    assert len(sections.update(inputs)) == 5
+    version = sections.version()
+
+    # A new fetch stamp alone is not a change
+    assert sections.update({**inputs, "news": "- a\nОбновлено: 2024-05-01 11:00:00"}) == []
+    assert sections.version() == version
+
+    assert sections.update({**inputs, "key_rates": "- 18%"}) == ["key_rates"]
+    assert sections.version() != version
+    assert "- 18%" in sections.render()
+
+
+def test_refresh_publishes_only_when_a_section_changes(tmp_path, monkeypatch):
+    monkeypatch.setenv("CONTEXT_SNAPSHOT_PATH", str(tmp_path / "snapshot.bin"))
+    monkeypatch.setenv("SNAPSHOT_STORE_PATH", str(tmp_path / "snapshots"))
+    monkeypatch.setenv("CONTEXT_MODE", "standalone")
+    monkeypatch.setattr(SystemContextManager, "_start_auto_update_thread", lambda self: None)
+
+    manager = SystemContextManager()
+    manager.fetcher = FakeFetcher()
+    published = []
+    manager.add_listener(published.append)
+
+    manager._update_context()
+    context, version = manager.get_versioned_context()
+    assert "ИСТОРИЧЕСКИЕ ЭКОНОМИЧЕСКИЕ ДАННЫЕ:" in context and "- 2024-04-26: 16.00%" in context
+
+    manager.fetcher.news = "- Новость 1\nОбновлено: 2024-05-01 11:00:00"
+    manager._update_context()
+    assert manager.get_versioned_context() == (context, version)
+
+    manager.fetcher.key_rates = "- 2024-07-26: 18.00%"
+    manager._update_context()
+    assert manager.context_version != version
+    assert published == [version, manager.context_version]
+
+    # The first context can be rebuilt from the stored inputs
+    first_at = manager.store.history("key_rates")[0][0]
+    rebuilt, rebuilt_version, rebuilt_data = manager.context_as_of(first_at)
+    assert rebuilt_version == version and "- 2024-04-26: 16.00%" in rebuilt
+    assert rebuilt_data.key_rates.latest() == (date(2024, 4, 26), 16.0)
+
+
+def test_source_failing_after_restart_keeps_its_stored_rendering(tmp_path, monkeypatch):
+    monkeypatch.setenv("CONTEXT_SNAPSHOT_PATH", str(tmp_path / "snapshot.bin"))
+    monkeypatch.setenv("SNAPSHOT_STORE_PATH", str(tmp_path / "snapshots"))
+    monkeypatch.setenv("CONTEXT_MODE", "standalone")
+    monkeypatch.setattr(SystemContextManager, "_start_auto_update_thread", lambda self: None)
+
+    manager = SystemContextManager()
+    manager.fetcher = FakeFetcher()
+    manager._update_context()
+    version = manager.context_version
+
+    class FailingFetcher(FakeFetcher):
+        def _fetch_cbr_key_rates_history(self):
+            raise ConnectionError("cbr.ru is down")
+
+    restarted = SystemContextManager()
+    restarted.fetcher = FailingFetcher()
+    restarted._update_context()
+    assert "- 2024-04-26: 16.00%" in restarted.system_context
+    assert "Нет исторических данных\n\nИнфляция" not in restarted.system_context
+    assert restarted.context_version == version
+
+
+def test_structured_data_is_published_with_the_context(tmp_path, monkeypatch):
+    monkeypatch.setenv("CONTEXT_SNAPSHOT_PATH", str(tmp_path / "snapshot.bin"))
+    monkeypatch.setenv("SNAPSHOT_STORE_PATH", "")
+    monkeypatch.setenv("SHARED_CONTEXT_PATH", str(tmp_path / "shared"))
+    monkeypatch.setattr(SystemContextManager, "_start_auto_update_thread", lambda self: None)
+    monkeypatch.setattr(SystemContextManager, "_start_subscriber_thread", lambda self, interval: None)
+
+    publisher = SystemContextManager(mode="publisher")
+    publisher.fetcher = FakeFetcher()
+    # Twelve past meetings: the rendered section shows eight, the data keeps them all
+    publisher.fetcher.calendar = MeetingCalendar([date(2023 + i // 12, 1 + i % 12, 15) for i in range(12)]
+                                                 + [date(2030, 2, 14)], source="cbr.ru")
+    publisher._update_context()
+    context, version, data = publisher.get_versioned_data()
+    assert len(data.calendar) == 13 and data.key_rates.latest() == (date(2024, 4, 26), 16.0)
+    assert data.inflation == [(2023, 7.4)]
+    assert data.section(context, "key_rates").startswith("ИСТОРИЧЕСКИЕ ЭКОНОМИЧЕСКИЕ ДАННЫЕ:")
+    assert data.section(context, "meetings").startswith("ЗАСЕДАНИЯ СОВЕТА ДИРЕКТОРОВ")
+
+    # A subscriber gets the same data with the version instead of re-parsing the text
+    monkeypatch.setattr(ContextData, "from_context", classmethod(lambda cls, text: None))
+    subscriber = SystemContextManager(mode="subscriber")
+    _, subscribed_version, subscribed = subscriber.get_versioned_data()
+    assert subscribed_version == version
+    assert subscribed.calendar.dates == data.calendar.dates and subscribed.spans == data.spans
+
+
+def test_failed_calendar_fetch_keeps_the_last_calendar(tmp_path, monkeypatch):
+    import pytest
+    import requests
+    from types import SimpleNamespace
+
+    def down(*args, **kwargs):
+        raise requests.ConnectionError("cbr.ru is down")
+
+    monkeypatch.setattr(requests, "get", down)
+    fetcher = FakeFetcher()
+    fetcher.meeting_calendar_file = str(tmp_path / "missing.txt")
+    fetcher.meeting_calendar_url = "https://www.cbr.ru/dkp/cal_mp/"
+    fetcher.meeting_calendar_cache = SimpleNamespace(get=lambda key: None, set=lambda key, value: None)
+    fetcher.fetch_meeting_calendar = lambda: DataFetcher.fetch_meeting_calendar(fetcher)
+    with pytest.raises(requests.ConnectionError):
+        fetcher.fetch_meeting_calendar()
+
+    sections = ContextSections()
+    sections.update({"meetings": MeetingCalendar([date(2024, 9, 13)], source="cbr.ru").dump()})
+    inputs = fetch_section_inputs(fetcher)
+    assert "meetings" not in inputs
+    assert "meetings" not in sections.update(inputs)
+    assert sections.data().calendar.dates == [date(2024, 9, 13)]
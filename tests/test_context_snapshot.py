@@ -0,0 +1,16 @@
+from app.context_manager import SystemContextManager
+
+def test_restart_serves_snapshot_before_refresh(tmp_path, monkeypatch):
+    """A restarted manager serves the persisted context immediately, refresh runs in the background."""
+    monkeypatch.setenv("CONTEXT_SNAPSHOT_PATH", str(tmp_path / "snapshot.bin"))
+    monkeypatch.setenv("SNAPSHOT_STORE_PATH", str(tmp_path / "snapshots"))
+    monkeypatch.setenv("CONTEXT_MODE", "standalone")
+    monkeypatch.setattr(SystemContextManager, "_start_auto_update_thread", lambda self: None)
+
+    first = SystemContextManager()
+    first._publish("Ключевая ставка: 16%")
+
+    restarted = SystemContextManager()
+    assert restarted.get_versioned_context() == ("Ключевая ставка: 16%", first.context_version)
+    assert restarted.readiness()["ready"]
+    assert restarted.readiness()["source"] == "snapshot"
@@ -0,0 +1,65 @@
+from datetime import date
+from app.data.key_rates import KeyRateSeries
+from app.llm.direct_answer import DirectAnswerEngine
+
+CONTEXT = """=== НОВОСТИ И ЭКОНОМИЧЕСКИЕ ДАННЫЕ ===
+ИСТОРИЧЕСКИЕ ЭКОНОМИЧЕСКИЕ ДАННЫЕ:
+
+Исторические данные ЦБ РФ:
+КЛЮЧЕВЫЕ СТАВКИ ЦБ РФ (из интерактивного графика на cbr.ru):
+
+ТЕКУЩАЯ СТАВКА: 18.00% (29.07.2024)
+
+ИСТОРИЯ ИЗМЕНЕНИЙ КЛЮЧЕВОЙ СТАВКИ (только даты изменения):
+- 30.10.2023: 15.00%
+- 18.12.2023: 16.00%
+- 29.07.2024: 18.00%
+Источник: Банк России - интерактивный график ключевых ставок
+
+Инфляция (история):
+- 2023: 7.4%
+"""
+TODAY = date(2024, 9, 1)
+
+
+def test_as_of_lookup():
+    series = KeyRateSeries.from_history_text(CONTEXT)
+    assert len(series) == 3  # inflation lines are not part of the series
+    assert series.as_of(date(2024, 3, 1)) == (date(2023, 12, 18), 16.0)
+    assert series.as_of(date(2023, 12, 18)) == (date(2023, 12, 18), 16.0)
+    assert series.as_of(date(2023, 1, 1)) is None
+
+
+def test_factual_questions_are_answered_directly():
+    engine = DirectAnswerEngine()
+    assert "16.00%" in engine.answer("Какая ставка была 1 марта 2024?", CONTEXT, "v1", today=TODAY)
+    assert "15.00%" in engine.answer("ключевая ставка на 01.11.2023", CONTEXT, "v1", today=TODAY)
+    assert "18.00%" in engine.answer("Какая текущая ключевая ставка?", CONTEXT, "v1", today=TODAY)
+
+
+def test_other_questions_fall_through():
+    engine = DirectAnswerEngine()
+    for question in ("Какая ставка будет после следующего заседания?", "Почему ЦБ повысил ставку?",
+                     "Какая ставка по ипотеке сейчас?", "Какая ставка была в марте 2024?",
+                     "Какая ставка была 1 марта 2030?", "Какая ставка была 1 марта 2010?"):
+        assert engine.answer(question, CONTEXT, "v1", today=TODAY) is None
+    assert engine.answer("Какая текущая ключевая ставка?", "контекст без истории", "v2", today=TODAY) is None
+
+
+MEETINGS_CONTEXT = CONTEXT + """
+ЗАСЕДАНИЯ СОВЕТА ДИРЕКТОРОВ ПО КЛЮЧЕВОЙ СТАВКЕ:
+Следующее заседание: 13.09.2024
+Предстоящие: 13.09.2024, 25.10.2024, 20.12.2024
+Прошедшие: 26.07.2024, 07.06.2024
+Источник: локальный календарь (meeting_calendar.txt)
+"""
+
+
+def test_next_meeting_is_answered_from_the_calendar():
+    engine = DirectAnswerEngine()
+    answer = engine.answer("Когда следующее заседание ЦБ?", MEETINGS_CONTEXT, "v1", today=TODAY)
+    assert "13.09.2024" in answer and "25.10.2024" in answer
+    # The next meeting is computed at question time, not taken from the rendered line
+    answer = engine.answer("Когда следующее заседание ЦБ?", MEETINGS_CONTEXT, "v1", today=date(2024, 9, 14))
+    assert answer.startswith("Следующее заседание") and "— 25.10.2024" in answer
+    assert engine.answer("Какое решение примут на следующем заседании?", MEETINGS_CONTEXT, "v1", today=TODAY) is None
@@ -0,0 +1,58 @@
+from datetime import date
+from app.data.forecast import BaselineForecaster, compact_report_context, render_forecast
+
+CONTEXT = """=== НОВОСТИ И ЭКОНОМИЧЕСКИЕ ДАННЫЕ ===
+ПОСЛЕДНИЕ НОВОСТИ:
+- 26.07.2024 | Банк России повысил ключевую ставку до 18%
+
+ИСТОРИЧЕСКИЕ ЭКОНОМИЧЕСКИЕ ДАННЫЕ:
+
+Исторические данные ЦБ РФ:
+ИСТОРИЯ ИЗМЕНЕНИЙ КЛЮЧЕВОЙ СТАВКИ (только даты изменения):
+- 24.07.2023: 8.50%
+- 15.08.2023: 12.00%
+- 18.12.2023: 16.00%
+- 29.07.2024: 18.00%
+Источник: Банк России - интерактивный график ключевых ставок
+
+Инфляция (история):
+- 2022: 13.8%
+- 2023: 7.4%
+
+ВВП (если доступно):
+Темпы роста ВВП Г/Г (%):
+- 2021: +5.9%
+- 2022: -1.2%
+- 2023: +3.6%
+
+Источник: World Bank API
+
+НАУЧНЫЕ СТАТЬИ:
+Нет статей
+"""
+
+
+def test_baseline_signals_and_probabilities():
+    forecast = BaselineForecaster().compute(CONTEXT, date(2024, 8, 10))
+
+    assert forecast["current_rate"] == 18.0
+    assert forecast["last_change_pp"] == 2.0
+    assert forecast["changes_last_12m"] == 3
+    assert forecast["inflation"] == 7.4 and forecast["inflation_year"] == 2023
+    # 2.5 + 7.4 + 0.5 * (7.4 - 4) + 0.5 * output gap
+    assert abs(forecast["taylor_rate"] - (2.5 + 7.4 + 0.5 * 3.4 + 0.5 * forecast["output_gap_pp"])) < 0.02
+    probabilities = forecast["probabilities"]
+    assert abs(sum(probabilities.values()) - 1.0) < 0.01
+    # Fresh hike: momentum outweighs the lagging annual inflation in the rule
+    assert forecast["momentum"] > 0
+    assert probabilities["hike"] > probabilities["cut"]
+
+
+def test_reports_get_compact_context():
+    forecast = BaselineForecaster().compute(CONTEXT, date(2024, 8, 10))
+    compact = compact_report_context(CONTEXT, forecast)
+
+    assert "БАЗОВАЯ КОЛИЧЕСТВЕННАЯ МОДЕЛЬ:" in compact and "- 15.08.2023: 12.00%" not in compact
+    assert "Банк России повысил ключевую ставку" in compact and "НАУЧНЫЕ СТАТЬИ:" in compact
+    assert len(render_forecast(forecast).splitlines()) == 5
+    assert BaselineForecaster().compute("без истории ставок", date(2024, 8, 10)) is None
@@ -0,0 +1,141 @@
+import time
+import pytest
+from app.llm.providers import LLMProvider
+from app.llm.router import LLMRouter, NoHealthyProviderError
+
+class FakeProvider(LLMProvider):
+    def __init__(self, name, delay=0.0, fail=False):
+        super().__init__("fake-model")
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    def chat(self, messages, deadline=None):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError(f"{self.name} is down")
+        return {"content": f"ответ от {self.name}"}
+
+def test_failover_to_next_provider():
+    down = FakeProvider("down", fail=True)
+    up = FakeProvider("up")
+    router = LLMRouter([down, up])
+
+    assert router.complete([])["content"] == "ответ от up"
+    assert router.health[id(down)].error_rate() == 1.0
+
+def test_prefers_fastest_provider():
+    slow = FakeProvider("slow", delay=0.05)
+    fast = FakeProvider("fast")
+    router = LLMRouter([slow, fast])
+    router.complete([])  # both have no samples yet: configured order
+    router.health[id(fast)].record_success(0.001)
+
+    assert router.ranked_providers()[0] is fast
+
+def test_unsampled_fallback_stays_behind_the_primary():
+    primary = FakeProvider("primary")
+    fallback = FakeProvider("fallback")
+    router = LLMRouter([primary, fallback])
+    router.complete([])
+
+    assert router.ranked_providers() == [primary, fallback]
+    assert fallback.calls == 0
+
+def test_provider_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        LLMProvider("model")
+
+def test_hedged_request_returns_first_answer():
+    slow = FakeProvider("slow", delay=0.5)
+    fast = FakeProvider("fast")
+    router = LLMRouter([slow, fast], hedge=True, hedge_min_delay=0.05)
+
+    assert router.complete([])["content"] == "ответ от fast"
+    assert router.hedged_requests == 1
+
+def test_all_providers_down():
+    router = LLMRouter([FakeProvider("a", fail=True), FakeProvider("b", fail=True)])
+    with pytest.raises(NoHealthyProviderError):
+        router.complete([])
+
+def test_ollama_pool_balances_and_evicts():
+    from app.llm.ollama_pool import OllamaPool
+    pool = OllamaPool(["http://h1:11434", "http://h2:11434"], health_interval=0)
+
+    first = pool.acquire("m")
+    second = pool.acquire("m")
+    assert {first.url, second.url} == {"http://h1:11434", "http://h2:11434"}
+
+    pool.release(first, success=False)
+    pool.release(pool.acquire("m"), success=False)  # least loaded host is `first` again
+    assert not first.healthy
+    assert pool.acquire("m") is second
+
+def test_ollama_pool_model_affinity():
+    from app.llm.ollama_pool import OllamaPool, parse_affinity
+    affinity = parse_affinity("big=http://h2:11434")
+    pool = OllamaPool(["http://h1:11434", "http://h2:11434"], affinity=affinity, health_interval=0)
+
+    assert all(pool.acquire("big").url == "http://h2:11434" for _ in range(3))
+
+def test_complexity_classifier():
+    from app.llm.complexity import classify_question, SIMPLE, ANALYTICAL
+    assert classify_question("Какая текущая ставка?")[0] == SIMPLE
+    assert classify_question("Когда следующее заседание?")[0] == SIMPLE
+    assert classify_question("Спрогнозируй решение на следующем заседании с учётом инфляции")[0] == ANALYTICAL
+    assert classify_question("Почему ЦБ повысил ставку?")[0] == ANALYTICAL
+
+def test_expired_deadline_does_not_mark_provider_unhealthy():
+    from app.utils.deadline import Deadline, DeadlineExceeded
+    provider = FakeProvider("up")
+    router = LLMRouter([provider])
+
+    with pytest.raises(DeadlineExceeded):
+        router.complete([], deadline=Deadline(0))
+    assert provider.calls == 0
+    assert router.health[id(provider)].error_rate() == 0.0
+
+def test_simple_questions_fall_back_to_the_main_router():
+    from app.llm.analyzer import LLMAnalyzer
+    from app.llm.prompt_cache import PrefixCacheStats, SystemPromptCache
+
+    small_down = FakeProvider("small", fail=True)
+    main = FakeProvider("main")
+    analyzer = LLMAnalyzer.__new__(LLMAnalyzer)
+    analyzer.system_prompts = SystemPromptCache()
+    analyzer.prefix_stats = PrefixCacheStats()
+    analyzer.router = LLMRouter([main])
+    analyzer.small_router = LLMRouter([small_down], max_attempts=1)
+
+    assert analyzer.answer_with_system_context("контекст", "Какая ставка?", "v1", fast=True) == "ответ от main"
+    assert small_down.calls == 1
+
+    # Once the small model is cooling down it is not tried at all
+    for _ in range(2):
+        analyzer.small_router.health[id(small_down)].record_failure()
+    assert analyzer.answer_with_system_context("контекст", "Какая ставка?", "v1", fast=True) == "ответ от main"
+    assert small_down.calls == 1
+
+def test_ollama_host_that_never_answers_is_cut_off_at_the_deadline():
+    import socket
+    from app.llm.ollama_pool import OllamaPool
+    from app.llm.providers import OllamaProvider
+    from app.utils.deadline import Deadline, DeadlineExceeded
+
+    # Accepts the connection but never sends a byte (hung host, or a long prompt eval)
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(4)
+    try:
+        pool = OllamaPool([f"http://127.0.0.1:{server.getsockname()[1]}"], health_interval=0, request_timeout=120)
+        provider = OllamaProvider(pool, "m")
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            LLMRouter([provider], max_attempts=1).complete([{"role": "user", "content": "?"}], deadline=Deadline(0.3))
+        assert time.monotonic() - started < 2.0
+        assert pool.hosts[0].consecutive_failures == 0 and pool.hosts[0].outstanding == 0
+    finally:
+        server.close()
@@ -0,0 +1,53 @@
+from datetime import date
+from app.context_sections import ContextData
+from app.data.meetings import MeetingCalendar, load_calendar_file, parse_calendar_page
+
+
+def test_calendar_override_file(tmp_path):
+    path = tmp_path / "meeting_calendar.txt"
+    path.write_text("# 2024\n25.10.2024\n2024-09-13\n20.12.2024  # последнее в году\nне дата\n", encoding="utf-8")
+    calendar = load_calendar_file(str(path))
+
+    assert calendar.as_dict(date(2024, 9, 13)) == {
+        "next": "13.09.2024", "upcoming": ["13.09.2024", "25.10.2024", "20.12.2024"], "past": [],
+    }
+    assert calendar.past(date(2024, 11, 1)) == [date(2024, 10, 25), date(2024, 9, 13)]
+    assert calendar.next(date(2024, 12, 21)) is None
+
+
+def test_calendar_input_keeps_every_date():
+    dates = [date(2020 + i // 8, 1 + i % 8, 10) for i in range(40)]
+    calendar = MeetingCalendar(dates, source="cbr.ru")
+    restored = MeetingCalendar.from_input(calendar.dump())
+    assert restored.dates == calendar.dates and restored.source == "cbr.ru"
+    assert len(calendar.render(date(2024, 1, 1)).split("Прошедшие: ")[1].split(",")) == 8
+
+
+def test_rendered_calendar_round_trips_through_the_context():
+    calendar = MeetingCalendar([date(2024, 9, 13), date(2024, 10, 25), date(2024, 7, 26)], source="cbr.ru")
+    text = "ЗАСЕДАНИЯ СОВЕТА ДИРЕКТОРОВ ПО КЛЮЧЕВОЙ СТАВКЕ:\n" + calendar.render(date(2024, 9, 1))
+    assert ContextData.from_context(text).calendar.dates == calendar.dates
+
+
+def test_calendar_page_dates_are_limited_to_a_window():
+    page = ("13 сентября 2024 Заседание Совета директоров по ключевой ставке "
+            "25.10.2024 Заседание Совета директоров по ключевой ставке "
+            "1 января 2013 Заседание Совета директоров по ключевой ставке")
+    assert parse_calendar_page(page, today=date(2024, 9, 1)) == [date(2024, 9, 13), date(2024, 10, 25)]
+
+
+def test_calendar_page_keeps_only_key_rate_meeting_rows():
+    page = ("Календарь Банка России. Обновлено 2 сентября 2024 "
+            "13 сентября 2024 Заседание Совета директоров по ключевой ставке "
+            "25 сентября 2024 Публикация Резюме обсуждения ключевой ставки "
+            "16 октября 2024 Комментарий к проекту Основных направлений ДКП "
+            "25 октября 2024 Опорное заседание Совета директоров по ключевой ставке")
+    assert parse_calendar_page(page, today=date(2024, 9, 1)) == [date(2024, 9, 13), date(2024, 10, 25)]
+
+
+def test_empty_calendar_does_not_pick_up_dates_of_the_next_section():
+    text = ("ЗАСЕДАНИЯ СОВЕТА ДИРЕКТОРОВ ПО КЛЮЧЕВОЙ СТАВКЕ:\nКалендарь заседаний недоступен\n\n"
+            "НАУЧНЫЕ СТАТЬИ:\n=== Обзор ДКП ===\nРешение от 14 февраля 2027 года")
+    calendar = ContextData.from_context(text).calendar
+    assert calendar.dates == []
+    assert calendar.next(date(2026, 10, 1)) is None
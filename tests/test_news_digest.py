@@ -0,0 +1,105 @@
+from concurrent.futures import Future
+from datetime import date, datetime, timedelta
+from app.data.news_digest import LLMSummarizer, NewsDigest, extractive_summary
+from app.llm.scheduler import BACKGROUND
+from app.data.post_log import normalize_post
+
+TODAY = date(2024, 7, 31)
+
+
+class CountingSummarizer:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, text, kind):
+        self.calls.append(kind)
+        return f"{kind}: {extractive_summary(text, kind)}"
+
+
+def _posts(days_back, per_day=2, start_id=1):
+    posts, message_id = [], start_id
+    for back in days_back:
+        day = datetime.combine(TODAY - timedelta(days=back), datetime.min.time())
+        for i in range(per_day):
+            posts.append(normalize_post(message_id, day + timedelta(hours=10 + i),
+                                        f"Новость {message_id}. Подробности ниже."))
+            message_id += 1
+    return posts
+
+
+def test_extractive_summary_takes_the_first_sentence_of_each_line():
+    assert extractive_summary("Ставка 18%. Дальше детали.\nИнфляция 9%! Еще.", "day") == "Ставка 18%; Инфляция 9%!"
+    assert len(extractive_summary("а" * 1000, "post")) == 300
+
+
+def test_render_layers_weekly_daily_and_recent_posts(tmp_path):
+    digest = NewsDigest(str(tmp_path), summarize=CountingSummarizer(), daily_days=3, recent_posts=2)
+    text = digest.render(_posts([20, 19, 2, 1, 0]), today=TODAY)
+
+    assert "Сводки по неделям:\n- 11.07.2024–12.07.2024 (4 пост.): week:" in text
+    assert "- 29.07.2024 (2 пост.): day:" in text
+    assert text.endswith("- 31.07.2024 11:00 | Новость 10. Подробности ниже.")
+    assert "Новость 8. Подробности" not in text
+
+
+def test_only_new_posts_and_their_windows_are_summarized_again(tmp_path):
+    summarizer = CountingSummarizer()
+    posts = _posts([20, 19, 2, 1, 0])
+    NewsDigest(str(tmp_path), summarize=summarizer, daily_days=3).render(posts, today=TODAY)
+    assert summarizer.calls.count("post") == 10
+
+    # Restarted process, one new post today: one post summary and one day digest
+    summarizer.calls.clear()
+    restarted = NewsDigest(str(tmp_path), summarize=summarizer, daily_days=3)
+    restarted.render(posts + _posts([0], per_day=1, start_id=11), today=TODAY)
+    assert summarizer.calls == ["post", "day"]
+
+
+def test_failed_summarizer_falls_back_to_the_extractive_summary(tmp_path):
+    def broken(text, kind):
+        raise RuntimeError("model is down")
+
+    text = NewsDigest(str(tmp_path), summarize=broken, daily_days=1).render(_posts([0]), today=TODAY)
+    assert "- 31.07.2024 (2 пост.): Новость 1; Новость 2" in text
+
+
+class DeferredScheduler:
+    """submit() queues the job like LLMScheduler; run() executes what is queued."""
+
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, fn, *args, priority=None, **kwargs):
+        future = Future()
+        self.jobs.append((future, fn, args, priority))
+        return future
+
+    def run(self):
+        jobs, self.jobs = self.jobs, []
+        for future, fn, args, _ in jobs:
+            future.set_result(fn(*args))
+
+
+class FakeAnalyzer:
+    def summarize_news(self, text, kind):
+        return f"LLM {kind}"
+
+
+def test_llm_summaries_run_in_the_background_and_are_picked_up_later(tmp_path):
+    scheduler = DeferredScheduler()
+    digest = NewsDigest(str(tmp_path), summarize=LLMSummarizer(), daily_days=1, recent_posts=0)
+    digest.attach_llm(FakeAnalyzer(), scheduler.submit)
+    posts = _posts([0], per_day=1)
+
+    # The refresh does not wait for the model: extractive summary for now, the job is queued
+    assert "Новость 1" in digest.render(posts, today=TODAY)
+    assert [priority for _, _, _, priority in scheduler.jobs] == [BACKGROUND]
+    assert digest.render(posts, today=TODAY) and len(scheduler.jobs) == 1
+
+    scheduler.run()
+    assert "LLM post" in digest.render(posts, today=TODAY)
+    # Persisted: a restarted process does not ask the model again
+    restarted = NewsDigest(str(tmp_path), summarize=LLMSummarizer(), daily_days=1, recent_posts=0)
+    restarted.attach_llm(FakeAnalyzer(), scheduler.submit)
+    assert "LLM post" in restarted.render(posts, today=TODAY)
+    assert scheduler.jobs == []
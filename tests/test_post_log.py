@@ -0,0 +1,54 @@
+from datetime import date, datetime, timedelta
+from app.data.post_log import INDEX_EVERY, PostLog, normalize_post
+
+
+def _post(message_id, posted_at, text="Ключевая ставка сохранена"):
+    return normalize_post(message_id, posted_at, text)
+
+
+def test_normalize_post_collapses_whitespace_and_skips_empty():
+    post = _post(7, datetime(2024, 7, 26, 13, 30), "  Решение\n\nпо   ставке \r ")
+    assert post == {"id": 7, "date": "2024-07-26T13:30:00", "text": "Решение по ставке"}
+    assert _post(8, datetime(2024, 7, 26), "   ") is None
+
+
+def test_append_skips_ids_already_stored(tmp_path):
+    log = PostLog(str(tmp_path))
+    start = datetime(2024, 7, 1, 9, 0)
+    for i in range(1, INDEX_EVERY * 3):
+        assert log.append(_post(i, start + timedelta(minutes=i)))
+
+    assert not log.append(_post(5, start + timedelta(minutes=5)))
+    assert not log.append(_post(INDEX_EVERY * 2 + 1, start + timedelta(minutes=INDEX_EVERY * 2 + 1)))
+    assert log.stats()["posts"] == INDEX_EVERY * 3 - 1
+    assert log.max_id() == INDEX_EVERY * 3 - 1
+
+
+def test_scan_reads_only_the_requested_days(tmp_path):
+    log = PostLog(str(tmp_path))
+    for i, day in enumerate([date(2024, 6, 30), date(2024, 7, 1), date(2024, 7, 2), date(2024, 7, 3)], 1):
+        log.append(_post(i, datetime(day.year, day.month, day.day, 12, 0), f"пост {i}"))
+
+    posts = list(log.scan(since=date(2024, 7, 1), until=date(2024, 7, 2)))
+    assert [post["text"] for post in posts] == ["пост 2", "пост 3"]
+
+
+def test_restart_resumes_after_the_last_id_even_without_a_flush(tmp_path):
+    log = PostLog(str(tmp_path))
+    log.append(_post(1, datetime(2024, 7, 1, 10, 0)))
+    log.flush()
+    log.append(_post(2, datetime(2024, 7, 2, 10, 0)))  # not flushed: the index on disk is behind
+
+    reopened = PostLog(str(tmp_path))
+    assert reopened.max_id() == 2
+    assert not reopened.append(_post(2, datetime(2024, 7, 2, 10, 0)))
+    assert [post["id"] for post in reopened.scan()] == [1, 2]
+
+
+def test_prune_drops_old_segments(tmp_path):
+    log = PostLog(str(tmp_path))
+    log.append(_post(1, datetime.now() - timedelta(days=400)))
+    log.append(_post(2, datetime.now()))
+
+    assert log.prune(keep_days=365) == 1
+    assert [post["id"] for post in PostLog(str(tmp_path)).scan()] == [2]
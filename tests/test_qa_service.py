@@ -0,0 +1,62 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from app.llm.answer_cache import AnswerCache
+from app.llm.complexity import ANALYTICAL
+from app.qa_service import QAService
+from app.utils.singleflight import SingleFlight
+
+
+class SlowAnalyzer:
+    small_router = None
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def answer_with_system_context(self, system_context, question, context_version=None, deadline=None, passages=None):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        time.sleep(0.1)
+        return f"ответ {call}"
+
+
+def _service():
+    service = QAService.__new__(QAService)
+    service.answer_cache = AnswerCache()
+    pool = ThreadPoolExecutor(max_workers=4)
+    # Like LLMScheduler.submit, minus the scheduling
+    service.in_flight = SingleFlight(submit=lambda fn, *args, priority=None, fair_key=None, **kwargs:
+                                     pool.submit(fn, *args, **kwargs))
+    service.analyzer = SlowAnalyzer()
+    service.retriever = None
+    service.question_log = SimpleNamespace(record=lambda question: None)
+    service.direct_answers = SimpleNamespace(answer=lambda *args, **kwargs: None)
+    service.complexity = SimpleNamespace(route=lambda question: ANALYTICAL, record=lambda route, latency: None)
+    service.context_manager = SimpleNamespace(get_versioned_data=lambda: ("контекст", "v1", None))
+    return service
+
+
+def test_opted_out_chat_neither_joins_a_shared_generation_nor_fills_the_cache():
+    service = _service()
+    service.answer_cache.set_bypass(2)
+    answers = {}
+
+    def ask(chat_id):
+        answers[chat_id] = service.answer("Какой прогноз ставки?", chat_id=chat_id)
+
+    threads = [threading.Thread(target=ask, args=(chat_id,)) for chat_id in (1, 2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert service.analyzer.calls == 2 and answers[1] != answers[2]
+    assert service.answer_cache.get("Какой прогноз ставки?", "v1") == answers[1]
+
+    # Its own answers are never stored either
+    service.answer_cache.invalidate("v2")
+    assert service.answer("Какой прогноз ставки?", chat_id=2) == "ответ 3"
+    assert service.answer_cache.get("Какой прогноз ставки?", "v1") is None
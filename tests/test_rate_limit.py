@@ -0,0 +1,19 @@
+from app.utils.rate_limit import RateLimiter, UserRateLimiter
+
+def test_burst_then_reject_with_retry_after():
+    limiter = UserRateLimiter(user_rate=1.0, user_burst=2, chat_rate=100.0, chat_burst=100)
+
+    assert limiter.check(1, 10) == 0
+    assert limiter.check(1, 10) == 0
+    assert limiter.check(1, 10) > 0  # over the burst
+    assert limiter.check(2, 10) == 0  # other users are not affected
+    assert limiter.stats()["rejected"] == 1
+
+def test_buckets_are_bounded_lru():
+    limiter = RateLimiter(rate=1.0, burst=1, max_keys=2)
+    for key in range(5):
+        limiter.consume(key, now=0.0)
+
+    assert len(limiter) == 2
+    assert limiter.wait_time(4, now=0.0) > 0
+    assert limiter.wait_time(0, now=0.0) == 0  # evicted: starts with a full bucket
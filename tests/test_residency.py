@@ -0,0 +1,57 @@
+from types import SimpleNamespace
+from app.llm.ollama_pool import OllamaPool
+from app.llm.providers import OllamaProvider, parse_keep_alive
+from app.llm.residency import NUM_CTX_STEP, ModelResidencyManager, estimate_num_ctx
+from app.llm.scheduler import BACKGROUND
+
+
+class FakeClient:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.chats = []
+
+    def chat(self, **kwargs):
+        if self.fail:
+            raise ConnectionError("host is down")
+        self.chats.append(kwargs)
+        return {"message": {"content": "да"}}
+
+
+def test_estimate_num_ctx_rounds_up_to_steps_and_caps():
+    assert estimate_num_ctx(0) == 2 * NUM_CTX_STEP  # reserve only
+    assert estimate_num_ctx(30000) % NUM_CTX_STEP == 0
+    assert estimate_num_ctx(30000) >= 30000 // 3
+    assert estimate_num_ctx(10_000_000, max_num_ctx=16384) == 16384
+
+
+def test_parse_keep_alive():
+    assert parse_keep_alive(None) is None
+    assert parse_keep_alive("-1") == -1.0
+    assert parse_keep_alive("300") == 300.0
+    assert parse_keep_alive("30m") == "30m"
+    assert parse_keep_alive(60) == 60
+
+
+def test_warm_up_goes_through_the_pool_as_background_jobs():
+    pool = OllamaPool(["http://h1:11434", "http://h2:11434"], health_interval=0)
+    pool.hosts[0]._client = FakeClient()
+    pool.hosts[1]._client = FakeClient(fail=True)
+    analyzer = SimpleNamespace(
+        router=SimpleNamespace(providers=[OllamaProvider(pool, "m")]),
+        small_router=None,
+        system_prompts=SimpleNamespace(render=lambda context, version: f"system {context}"),
+    )
+    submitted = []
+
+    def submit(fn, *args, priority, **kwargs):
+        submitted.append(priority)
+        result = fn(*args, **kwargs)
+        return SimpleNamespace(result=lambda: result)
+
+    manager = ModelResidencyManager(analyzer, submit=submit)
+    manager.warm("контекст", "v1")
+
+    assert submitted == [BACKGROUND, BACKGROUND]
+    assert pool.hosts[0].completed == 1 and pool.hosts[0].outstanding == 0
+    assert pool.hosts[1].consecutive_failures == 1 and pool.hosts[1].outstanding == 0
+    assert list(manager.stats()) == ["m@http://h1:11434"]
@@ -0,0 +1,45 @@
+from app.shared_context import SharedContextReader, SharedContextWriter
+
+def test_subscriber_picks_up_published_versions(tmp_path):
+    path = str(tmp_path / "context")
+    writer = SharedContextWriter(path)
+    reader = SharedContextReader(path)
+
+    assert not reader.refresh()  # nothing published yet
+
+    writer.write("Ключевая ставка: 16%", "v1")
+    assert reader.refresh()
+    assert reader.get()[:2] == ("Ключевая ставка: 16%", "v1")
+    assert not reader.refresh()  # unchanged file: not read again
+
+    writer.write("Ключевая ставка: 17%", "v2")
+    assert reader.refresh()
+    assert reader.get()[:2] == ("Ключевая ставка: 17%", "v2")
+
+
+def test_structured_data_travels_with_the_version(tmp_path):
+    path = str(tmp_path / "context")
+    SharedContextWriter(path).write("Ключевая ставка: 16%", "v1", data={"key_rates": [["2024-04-26", 16.0]]})
+    reader = SharedContextReader(path)
+    assert reader.refresh()
+    assert reader.get()[0] == "Ключевая ставка: 16%"
+    assert reader.get_data() == {"key_rates": [["2024-04-26", 16.0]]}
+
+
+def test_reader_maps_the_file_and_decodes_on_first_use(tmp_path):
+    path = str(tmp_path / "context")
+    writer = SharedContextWriter(path)
+    reader = SharedContextReader(path)
+    writer.write("Ключевая ставка: 16%", "v1")
+    assert reader.refresh()
+    first_mapping = reader._mmap
+
+    # A republished file with the same version keeps the current mapping
+    writer.write("Ключевая ставка: 16%", "v1")
+    assert not reader.refresh() and reader._mmap is first_mapping
+
+    writer.write("Ключевая ставка: 17%", "v2", data={"inflation": []})
+    assert reader.refresh()
+    assert first_mapping.closed and reader._context is None
+    assert reader.get()[:2] == ("Ключевая ставка: 17%", "v2")
+    assert reader.get_data() == {"inflation": []}
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+import time
+from app.utils.singleflight import SingleFlight
+
+def test_concurrent_calls_are_coalesced():
+    """Callers with the same key share one execution."""
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def generate():
+        calls.append(1)
+        release.wait(5)
+        return "ответ"
+
+    async def run():
+        waiters = [asyncio.ensure_future(flight.do_async("key", generate)) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(*waiters)
+
+    results = asyncio.run(run())
+
+    assert results == ["ответ"] * 5
+    assert len(calls) == 1
+    assert flight.stats()["coalesced"] == 4
+    assert flight.in_flight() == 0
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+    assert flight.stats()["started"] == 2
+
+def test_abandoned_call_is_cancelled():
+    """When the last waiter gives up, the shared deadline passed to the work is cancelled."""
+    from app.utils.deadline import Deadline, DeadlineExceeded
+    flight = SingleFlight()
+    stopped = threading.Event()
+
+    def generate(deadline):
+        while not deadline.cancelled:
+            time.sleep(0.01)
+        stopped.set()
+        raise DeadlineExceeded("cancelled")
+
+    async def run():
+        await asyncio.wait_for(flight.do_async("key", generate, deadline=Deadline(5)), timeout=0.05)
+
+    try:
+        asyncio.run(run())
+    except asyncio.TimeoutError:
+        pass
+
+    assert stopped.wait(1)
+    assert flight.stats()["abandoned"] == 1
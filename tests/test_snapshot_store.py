@@ -0,0 +1,25 @@
+from datetime import datetime
+from app.data.snapshot_store import SnapshotStore
+
+
+def test_identical_payloads_are_stored_once(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    first = store.put("key_rates", "- 18.12.2023: 16.00%", fetched_at=datetime(2024, 1, 1))
+    again = store.put("key_rates", "- 18.12.2023: 16.00%", fetched_at=datetime(2024, 1, 2))
+    store.put("key_rates", "- 29.07.2024: 18.00%", fetched_at=datetime(2024, 8, 1))
+    store.put("news", "- 18.12.2023: 16.00%", fetched_at=datetime(2024, 1, 1))
+
+    assert first == again
+    stats = store.stats()
+    assert stats["blobs"] == 2 and stats["versions"] == {"key_rates": 2, "news": 1}
+
+
+def test_as_of_query_survives_a_restart(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.put("gdp", "v1", fetched_at=datetime(2024, 1, 1))
+    store.put("gdp", "v2", fetched_at=datetime(2024, 6, 1))
+
+    reopened = SnapshotStore(str(tmp_path))
+    assert reopened.as_of("gdp", datetime(2023, 12, 31)) is None
+    assert reopened.as_of("gdp", datetime(2024, 3, 1))[2] == "v1"
+    assert reopened.as_of("gdp", datetime(2024, 6, 1))[2] == "v2"
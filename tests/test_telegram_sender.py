@@ -0,0 +1,113 @@
+import asyncio
+import time
+from app.telegram_sender import TelegramSender, split_message
+
+def test_short_message_is_not_split():
+    assert split_message("Ключевая ставка 16%") == ["Ключевая ставка 16%"]
+
+def test_long_message_is_split_at_paragraphs_without_losing_text():
+    paragraphs = [f"Абзац {i}: " + "слово " * 150 for i in range(10)]
+    text = "\n\n".join(paragraphs)
+
+    parts = split_message(text, limit=2000)
+
+    assert len(parts) > 1
+    assert all(len(part) <= 2000 for part in parts)
+    assert all(part.startswith("Абзац") for part in parts)
+    assert " ".join(" ".join(parts).split()) == " ".join(text.split())
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def json(self, content_type=None):
+        return self.data
+
+
+class FakeSession:
+    def __init__(self, responses=None):
+        self.posts = []
+        self.responses = list(responses or [])
+
+    def post(self, url, json=None, timeout=None):
+        self.posts.append((time.monotonic(), json["chat_id"], json["text"], json.get("parse_mode")))
+        return FakeResponse(self.responses.pop(0) if self.responses else {"ok": True})
+
+    async def close(self):
+        pass
+
+
+def _sender(session, **kwargs):
+    sender = TelegramSender("token", **kwargs)
+    sender._session = session
+    return sender
+
+
+def test_multi_part_answer_does_not_hold_back_other_chats():
+    async def scenario():
+        session = FakeSession()
+        sender = _sender(session, workers=1, chat_interval=0.2)
+        long_answer = "\n\n".join(["а" * 3000] * 3)
+        results = await asyncio.gather(sender.send(1, long_answer), sender.send(2, "короткий ответ"))
+        await sender.close()
+        return results, session.posts
+
+    results, posts = asyncio.run(scenario())
+    assert results == [True, True]
+    chats = [chat_id for _, chat_id, _, _ in posts]
+    assert chats.index(2) < 2  # goes out while chat 1 waits between its parts
+    first_chat = [at for at, chat_id, _, _ in posts if chat_id == 1]
+    assert len(first_chat) == 3
+    assert all(b - a >= 0.19 for a, b in zip(first_chat, first_chat[1:]))
+
+
+def test_broken_markdown_is_resent_as_plain_text():
+    async def scenario():
+        session = FakeSession([{"ok": False, "error_code": 400, "description": "Bad Request: can't parse entities"}])
+        sender = _sender(session, chat_interval=0.0)
+        delivered = await sender.send(1, "*ставка", parse_mode="Markdown")
+        await sender.close()
+        return delivered, session.posts
+
+    delivered, posts = asyncio.run(scenario())
+    assert delivered
+    assert [parse_mode for _, _, _, parse_mode in posts] == ["Markdown", None]
+
+
+def test_flood_limit_is_absorbed_by_pausing():
+    async def scenario():
+        flood = {"ok": False, "error_code": 429, "parameters": {"retry_after": 0.01}}
+        session = FakeSession([flood] * 5)
+        sender = _sender(session, chat_interval=0.0, max_retries=1)
+        delivered = await sender.send(1, "ставка")
+        await sender.close()
+        return delivered, session.posts, sender.stats()
+
+    delivered, posts, stats = asyncio.run(scenario())
+    assert delivered and len(posts) == 6
+    assert stats["throttled"] == 5 and stats["failed"] == 0
+
+
+def test_send_wait_is_bounded_and_close_releases_queued_messages():
+    async def scenario():
+        session = FakeSession()
+        sender = _sender(session, chat_interval=0.0)
+        sender.global_limit.pause(60)
+        started = time.monotonic()
+        timed_out = await sender.send(1, "первый", timeout=0.1)
+        waited = time.monotonic() - started
+        queued = asyncio.create_task(sender.send(2, "второй"))
+        await asyncio.sleep(0.05)
+        await sender.close()
+        return timed_out, waited, await asyncio.wait_for(queued, 1), session.posts
+
+    timed_out, waited, queued, posts = asyncio.run(scenario())
+    assert timed_out is False and waited < 1
+    assert queued is False and posts == []
@@ -0,0 +1,162 @@
+import threading
+import time
+from app.llm.retrieval import ContextRetriever, context_passages
+from app.llm.vector_index import HashingEmbedder, VectorIndex
+from app.utils.deadline import Deadline
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__(dim=64)
+        self.embedded = 0
+
+    def embed(self, texts):
+        self.embedded += len(texts)
+        return super().embed(texts)
+
+
+PASSAGES = {
+    "a": "Банк России снизил ключевую ставку на 100 б.п.",
+    "b": "Инфляция в июне замедлилась до 8,6% г/г",
+    "c": "Курс рубля укрепился на фоне роста цен на нефть",
+}
+
+CONTEXT = """=== НОВОСТИ И ЭКОНОМИЧЕСКИЕ ДАННЫЕ ===
+ПОСЛЕДНИЕ НОВОСТИ:
+- 26.07.2024 13:30 | Совет директоров повысил ключевую ставку до 18%
+- 30.07.2024 (2 пост.): Обзор рисков финансовой стабильности
+
+ИСТОРИЧЕСКИЕ ЭКОНОМИЧЕСКИЕ ДАННЫЕ:
+- 29.07.2024: 18.00%
+
+НАУЧНЫЕ СТАТЬИ:
+Научные статьи (загрузите статьи в папку articles/):
+
+=== taylor.txt ===
+Правило Тейлора связывает ставку с инфляцией.
+
+Второй абзац статьи.
+"""
+
+
+def test_search_ranks_the_matching_passage_first(tmp_path):
+    index = VectorIndex(str(tmp_path), HashingEmbedder(dim=64))
+    index.sync(PASSAGES)
+    score, passage_id, text = index.search("снижение ключевой ставки", k=2)[0]
+    assert passage_id == "a" and text == PASSAGES["a"] and score > 0
+
+
+def test_sync_embeds_only_new_passages_and_survives_a_restart(tmp_path):
+    embedder = CountingEmbedder()
+    index = VectorIndex(str(tmp_path), embedder, batch_size=2)
+    assert index.sync(PASSAGES) == 3
+    assert index.sync(PASSAGES) == 0
+
+    reopened = VectorIndex(str(tmp_path), embedder)
+    assert reopened.sync({**PASSAGES, "d": "Минфин разместил ОФЗ"}) == 1
+    assert embedder.embedded == 4
+    assert reopened.stats()["rows"] == 4
+
+
+def test_passages_dropped_from_the_set_are_not_returned(tmp_path):
+    index = VectorIndex(str(tmp_path), HashingEmbedder(dim=64))
+    index.sync(PASSAGES)
+    index.sync({"b": PASSAGES["b"], "c": PASSAGES["c"]})
+
+    assert "a" not in [passage_id for _, passage_id, _ in index.search("ключевая ставка", k=3)]
+    assert VectorIndex(str(tmp_path), HashingEmbedder(dim=64)).stats()["live"] == 2
+
+
+def test_a_different_embedder_rebuilds_the_index(tmp_path):
+    VectorIndex(str(tmp_path), HashingEmbedder(dim=64)).sync(PASSAGES)
+
+    class OtherEmbedder(HashingEmbedder):
+        name = "other"
+
+    index = VectorIndex(str(tmp_path), OtherEmbedder(dim=32))
+    assert index.stats()["rows"] == 0
+    assert index.sync(PASSAGES) == 3 and index.stats()["dim"] == 32
+
+
+def test_context_passages_split_news_lines_and_article_chunks():
+    passages = sorted(context_passages(CONTEXT, chunk_chars=50).values())
+    assert passages == [
+        "26.07.2024 13:30 | Совет директоров повысил ключевую ставку до 18%",
+        "30.07.2024 (2 пост.): Обзор рисков финансовой стабильности",
+        "[taylor.txt] Второй абзац статьи.",
+        "[taylor.txt] Правило Тейлора связывает ставку с инфляцией.",
+    ]
+
+
+def test_retriever_returns_relevant_lines(tmp_path):
+    retriever = ContextRetriever(VectorIndex(str(tmp_path), HashingEmbedder(dim=64)), top_k=1, min_score=0.1)
+    assert retriever.passages("ставка") is None
+
+    retriever.sync(CONTEXT, "v1")
+    assert retriever.passages("Что известно о правиле Тейлора?") == \
+        "- [taylor.txt] Правило Тейлора связывает ставку с инфляцией.\nВторой абзац статьи."
+    assert retriever.stats()["searches"] == 2
+
+
+class SlowEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__(dim=64)
+        self.release = threading.Event()
+        self.slow = False
+
+    def embed(self, texts):
+        if self.slow:
+            self.release.wait(5)
+        return super().embed(texts)
+
+
+def test_slow_embedder_is_skipped_within_the_deadline(tmp_path):
+    embedder = SlowEmbedder()
+    retriever = ContextRetriever(VectorIndex(str(tmp_path), embedder), min_score=0.0, timeout=5.0, workers=1)
+    retriever.sync(CONTEXT, "v1")
+    embedder.slow = True
+
+    started = time.monotonic()
+    assert retriever.passages("ставка", Deadline(timeout=0.2)) is None
+    assert time.monotonic() - started < 1.0
+    # The worker is still busy with the slow embedding: the next question does not wait at all
+    assert retriever.passages("ставка", Deadline(timeout=5.0)) is None
+    assert retriever.stats()["skipped"] == 2
+
+    embedder.release.set()
+    embedder.slow = False
+    for _ in range(50):
+        if retriever.passages("ставка") is not None:
+            break
+        time.sleep(0.02)
+    assert retriever.stats()["searches"] >= 1
+
+
+def test_background_syncs_run_one_at_a_time_and_skip_stale_versions(tmp_path):
+    class GatedIndex(VectorIndex):
+        def __init__(self, *args):
+            super().__init__(*args)
+            self.gate = threading.Event()
+            self.synced = []
+
+        def sync(self, passages):
+            self.gate.wait(5)
+            self.synced.append(set(passages))
+            return super().sync(passages)
+
+    index = GatedIndex(str(tmp_path), HashingEmbedder(dim=64))
+    retriever = ContextRetriever(index)
+    newer = CONTEXT.replace("Обзор рисков", "Решение по ставке")
+    retriever.sync_in_background(CONTEXT, "v1")
+    time.sleep(0.05)
+    retriever.sync_in_background(newer, "v2")
+    retriever.sync_in_background(CONTEXT, "v3")
+    index.gate.set()
+    for _ in range(100):
+        if retriever.stats()["synced_version"] == "v3" and len(index.synced) >= 2:
+            break
+        time.sleep(0.02)
+
+    # v1 was already running; v2 was superseded by v3 before it started
+    assert retriever.stats()["synced_version"] == "v3"
+    assert index.synced == [set(context_passages(CONTEXT))] * 2
@@ -39,3 +39,28 @@ def test_root_endpoint():
     assert response.status_code == 200
     data = response.json()
     assert "CBR Analysis System MVP" in data["message"]
+
+def test_telegram_webhook_without_bot_asks_to_retry():
+    """Without a bot in webhook mode Telegram gets 503 and redelivers later."""
+    response = client.post("/telegram-webhook", json={"update_id": 1})
+    assert response.status_code == 503
+
+def test_retried_updates_are_detected():
+    from app.telegram_bot import SeenUpdates
+    seen = SeenUpdates(maxsize=2)
+
+    assert not seen.seen(1)
+    assert seen.seen(1)
+    seen.seen(2)
+    seen.seen(3)
+    assert not seen.seen(1)  # evicted from the bounded set
+
+def test_update_that_fails_validation_is_not_marked_seen():
+    import asyncio
+    from types import SimpleNamespace
+    from app.telegram_bot import SeenUpdates, TelegramAnalyzerBot
+
+    bot = SimpleNamespace(seen_updates=SeenUpdates(), bot=None, dp=None, _webhook_tasks=set())
+    with pytest.raises(Exception):
+        asyncio.run(TelegramAnalyzerBot.feed_update(bot, {"update_id": 7, "message": "not a message"}))
+    assert not bot.seen_updates.contains(7)